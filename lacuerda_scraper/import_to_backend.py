@@ -81,17 +81,96 @@ def main():
 if __name__ == "__main__":
     main()
 
+import argparse
 import json
 import getpass
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from songtools.bulkimport import AdaptiveThrottle, send_with_backoff
+from songtools.httpclient import create_session
+from songtools.metrics import Metrics
+from songtools.profiling import add_profile_arguments, start_profiling
 
 API_BASE = "http://localhost:5014"
 ENDPOINT = "/api/songs"
 INPUT_FILE = "lacuerda_songs.json"
 
+# How tags reach the backend:
+#   "inline"     - sent with the song in the create request (CreateSongRequest.Tags), no extra requests
+#   "concurrent" - one POST /songs/{id}/tags per tag, several in flight on the shared session
+#                  (for backends that ignore Tags on create)
+TAG_MODE = "inline"
+TAG_WORKERS = 8
+PROGRESS_EVERY = 100  # songs between progress lines with --quiet
+
+
+def song_tags(song):
+    """Distinct, normalized tag names for a song, in first-seen order."""
+    tags = list(song.get("tags", []))
+    if "Música Católica" in song.get("artist", ""):
+        tags.append("música católica")
+    names = {}
+    for tag in tags:
+        name = tag.strip().lower()
+        if name:
+            names[name] = None
+    return list(names)
+
+
+class TagAttacher:
+    """Attaches tags to created songs in the background, TAG_WORKERS requests at a time."""
+
+    def __init__(self, session, workers=TAG_WORKERS, metrics=None):
+        self.session = session
+        self.metrics = metrics
+        self.throttle = AdaptiveThrottle(workers)
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.pending = []
+
+    def attach(self, song_id, title, tags):
+        for tag in tags:
+            self.pending.append(self.pool.submit(self._post_tag, song_id, title, tag))
+
+    def _post_tag(self, song_id, title, tag):
+        resp = send_with_backoff(
+            self.session, "POST", f"{API_BASE}{ENDPOINT}/{song_id}/tags", self.throttle,
+            metrics=self.metrics, stage="tag_post",
+            json={"tagName": tag},
+            timeout=10
+        )
+        return title, tag, resp.status_code
+
+    def finish(self):
+        """Wait for every queued tag; returns (added, failed)."""
+        added = failed = 0
+        for future in as_completed(self.pending):
+            try:
+                title, tag, status = future.result()
+            except Exception as e:
+                print(f"  - Failed to add a tag: {e}")
+                failed += 1
+                continue
+            if status in [200, 201, 204]:
+                added += 1
+            else:
+                print(f"  - Failed to add tag '{tag}' to '{title}': HTTP {status}")
+                failed += 1
+        self.pool.shutdown()
+        return added, failed
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Import laCuerda songs into a local ChoirApp backend")
+    parser.add_argument("--quiet", action="store_true",
+                        help=f"No per-song lines; progress every {PROGRESS_EVERY} songs (failures are still shown)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write stage timings, retries and bytes at the end (.prom: Prometheus text, else JSON)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args, "import_to_backend")
     # Get authentication token
     print("Please enter your authentication token:")
     token = getpass.getpass("Bearer token: ")
@@ -103,14 +182,25 @@ def main():
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
+    session = create_session(headers, pool_size=TAG_WORKERS + 1)
 
-    with open(INPUT_FILE, "r", encoding="utf-8") as f:
+    metrics = Metrics("import_to_backend")
+    with metrics.time("read"), open(INPUT_FILE, "r", encoding="utf-8") as f:
         songs = json.load(f)
 
+    # Tags are collected up front, so each song's set is deduplicated and the
+    # whole batch can be attached without waiting on one request per tag
+    tags_by_song = [song_tags(song) for song in songs]
+    distinct_tags = {tag for tags in tags_by_song for tag in tags}
+    print(f"{len(songs)} songs, {sum(map(len, tags_by_song))} tag links, "
+          f"{len(distinct_tags)} distinct tags (mode: {TAG_MODE})")
+
+    tagger = TagAttacher(session, metrics=metrics) if TAG_MODE == "concurrent" else None
     success_count = 0
     error_count = 0
     
     for i, song in enumerate(songs):
+        tags = tags_by_song[i]
         # Map the song data to the new API format
         payload = {
             "title": song.get("title", "").strip(),
@@ -118,64 +208,67 @@ def main():
             "content": song.get("chordpro", "").strip(),
             "visibility": 1  # 0=Private, 1=PublicAll, 2=PublicChoirs
         }
-        print(f"[{i+1}/{len(songs)}] Importing: {payload['title']} ...", end=" ")
+        if TAG_MODE == "inline" and tags:
+            payload["tags"] = tags
+        line = f"[{i+1}/{len(songs)}] Importing: {payload['title']} ..."
+        if not args.quiet:
+            print(line, end=" ")
+
+        def report(outcome, failed=False):
+            # Quiet mode keeps only the failures, with the song they belong to
+            if not args.quiet:
+                print(outcome)
+            elif failed:
+                print(f"{line} {outcome}")
+
         try:
-            resp = requests.post(
-                API_BASE + ENDPOINT,
-                headers=headers,
-                json=payload,
-                timeout=10
-            )
+            with metrics.time("http_post"):
+                resp = session.post(
+                    API_BASE + ENDPOINT,
+                    json=payload,
+                    timeout=10
+                )
+            metrics.count("http_post_bytes_sent", len(resp.request.body or b""))
+            metrics.count("http_post_bytes_received", len(resp.content))
             if resp.status_code == 201:
                 song_id = resp.json().get("songId")
-                print("Success ✅")
+                report(f"Success ✅ ({len(tags)} tags)")
                 success_count += 1
                 
-                # Add tags if any
-                tags = song.get("tags", [])
-                if "Música Católica" in song.get("artist", "") and "música católica" not in tags:
-                    tags.append("música católica")
-                
-                for tag in tags:
-                    if tag.strip():
-                        tag_payload = {
-                            "tagName": tag.strip().lower()
-                        }
-                        
-                        tag_resp = requests.post(
-                            f"{API_BASE}{ENDPOINT}/{song_id}/tags",
-                            headers=headers,
-                            json=tag_payload,
-                            timeout=10
-                        )
-                        
-                        if tag_resp.status_code in [200, 201, 204]:
-                            print(f"  - Added tag: {tag} ✅")
-                        else:
-                            print(f"  - Failed to add tag '{tag}': HTTP {tag_resp.status_code}")
+                if tagger and tags:
+                    tagger.attach(song_id, payload["title"], tags)
                 
             elif resp.status_code == 409:
-                print("Duplicate (409), skipping.")
+                report("Duplicate (409), skipping.", failed=True)
                 error_count += 1
             elif resp.status_code == 400:
-                print(f"Bad Request (400): {resp.text}")
+                report(f"Bad Request (400): {resp.text}", failed=True)
                 error_count += 1
             elif resp.status_code == 401:
-                print("Unauthorized (401): Invalid or expired token.")
+                report("Unauthorized (401): Invalid or expired token.", failed=True)
                 sys.exit(1)
             else:
-                print(f"Failed: HTTP {resp.status_code} - {resp.text}")
+                report(f"Failed: HTTP {resp.status_code} - {resp.text}", failed=True)
                 error_count += 1
                 
             # Add a small delay to avoid overwhelming the server
             time.sleep(0.1)
         except Exception as e:
-            print(f"Error: {e}")
+            report(f"Error: {e}", failed=True)
             error_count += 1
+        if args.quiet and (i + 1) % PROGRESS_EVERY == 0:
+            print(f"📊 Progress: {i + 1}/{len(songs)} songs, {success_count} imported")
     
     print(f"\nImport completed!")
     print(f"Successfully imported: {success_count} songs")
     print(f"Failed to import: {error_count} songs")
+    if tagger:
+        added, failed = tagger.finish()
+        print(f"Tags added: {added}, failed: {failed}")
+    metrics.print_summary()
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"Metrics saved to {args.metrics}")
 
 if __name__ == "__main__":
     main()
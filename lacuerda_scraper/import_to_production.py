@@ -12,71 +12,125 @@ IMPORTANT SECURITY NOTES:
 - Delete after use if needed
 
 Usage:
-    python import_to_production.py --token YOUR_JWT_TOKEN [--dry-run] [--limit N] [--start-from N]
+    python import_to_production.py --token YOUR_JWT_TOKEN [--dry-run] [--limit N] [--start-from N] [--workers N] [--no-journal]
 
 Options:
     --token TOKEN   JWT token for authentication (required)
+    --api-url URL   Backend API base URL (default production; point at songtools.mockbackend to test)
+    --input PATH    Songs file, JSON array or JSON Lines (default lacuerda_songs.json)
     --dry-run       Show what would be imported without actually doing it
     --limit N       Import only N songs (useful for testing)
-    --start-from N  Start importing from song number N (useful for resuming)
+    --start-from N  Start importing from song number N
+    --workers N     Maximum requests in flight (default 8, reduced automatically on 429/5xx)
+    --no-journal    Do not read or write the import journal
+    --no-dedup      Send exact duplicates too (normally dropped before any request)
+    --quiet         No per-song lines; progress every 100 songs (failures are still shown)
+    --metrics PATH  Write stage timings, retries and bytes at the end (.prom: Prometheus text, else JSON)
+    --profile       Sample stacks during the run and write profile_import_lacuerda.collapsed for a flame graph
+                    (--profile cprofile for a deterministic .pstats profile of the main thread)
+
+Resuming:
+    Every song sent is recorded in import_journal.sqlite with its payload hash,
+    status and returned songId. Re-running the same command skips songs that
+    were already imported without contacting the server and sends the ones
+    that failed with a 4xx again. A song whose earlier request got no clear
+    answer (a 5xx, a timeout, a run cut off mid-request) may exist already:
+    it is looked up by title and artist first and only sent when it is not
+    found. If the lookup fails too, it is listed for checking by hand.
 """
 
 import requests
-import json
 import os
 import sys
 import argparse
+import threading
 import time
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, Dict, Any, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from songtools.bulkimport import (AdaptiveThrottle, bounded_map, find_song, outcome_unknown, request_not_sent,
+                                  send_with_backoff)
+from songtools.chordpro import extract_key_from_chordpro
+from songtools.dedup import Deduplicator
+from songtools.httpclient import create_session
+from songtools.importjournal import EXISTS, FAILED, IMPORTED, SENT, ImportJournal, payload_hash
+from songtools.jsonl import iter_records
+from songtools.metrics import Metrics
+from songtools.profiling import add_profile_arguments, start_profiling
 
 # --- PRODUCTION CONFIGURATION ---
 PRODUCTION_API_URL = "https://choirapp-backend-b7evgyahfthjf3aa.centralus-01.azurewebsites.net/api"
-CREATE_SONG_ENDPOINT = f"{PRODUCTION_API_URL}/songs"
 SONGS_FILE_PATH = os.path.join(os.path.dirname(__file__), 'lacuerda_songs.json')
+JOURNAL_FILE_PATH = os.path.join(os.path.dirname(__file__), 'import_journal.sqlite')
 
 # Production JWT Token will be provided via command line argument
 
 # Request configuration
 REQUEST_TIMEOUT = 30  # seconds
-DELAY_BETWEEN_REQUESTS = 1  # seconds to avoid overwhelming the server
+MAX_IN_FLIGHT = 8  # concurrent requests; halved once per window of 429/5xx answers, regrown on success
+MAX_RETRIES = 5  # per song, for 429 answers and connections that never opened (a POST is not resent otherwise)
+PROGRESS_EVERY = 100  # songs between progress lines in quiet mode
 
 class SongImporter:
     """Handles the import of songs to the production backend."""
     
-    def __init__(self, jwt_token: str, api_url: str):
+    def __init__(self, jwt_token: str, api_url: str, workers: int = MAX_IN_FLIGHT,
+                 journal: Optional[ImportJournal] = None, metrics: Optional[Metrics] = None,
+                 quiet: bool = False):
         self.jwt_token = jwt_token
         self.api_url = api_url
+        self.create_song_endpoint = f"{api_url.rstrip('/')}/songs"
         self.headers = {
             "Authorization": f"Bearer {jwt_token}",
             "Content-Type": "application/json",
             "User-Agent": "ChoirApp-LaCuerda-Importer/1.0"
         }
+        self.workers = max(1, workers)
+        # One keep-alive connection per worker, shared by every request
+        self.session = create_session(self.headers, pool_size=self.workers)
+        self.throttle = AdaptiveThrottle(self.workers)
+        self.journal = journal
+        # Stage timings (read, convert, journal, http_post) plus retries and bytes
+        self.metrics = metrics or Metrics("import_lacuerda")
+        self.quiet = quiet
         self.stats = {
             "total": 0,
             "success": 0,
             "failed": 0,
-            "skipped": 0
+            "skipped": 0,
+            "journaled": 0,
+            "found": 0,
+            "duplicates": 0,
+            "unconfirmed": 0
         }
+        # Titles whose POST got no clear answer (5xx, read timeout); they may exist on the backend
+        self.unconfirmed: List[str] = []
+        self._stats_lock = threading.Lock()
+    
+    def count(self, key: str) -> None:
+        """Increment a stats counter; import_song runs on several threads."""
+        with self._stats_lock:
+            self.stats[key] += 1
+    
+    def log(self, message: str) -> None:
+        """Per-song output, dropped in quiet mode."""
+        if not self.quiet:
+            print(message)
     
-    def load_songs(self) -> List[Dict[str, Any]]:
-        """Load songs from the JSON file."""
-        print(f"📖 Loading songs from {SONGS_FILE_PATH}...")
+    def load_songs(self, path: str = SONGS_FILE_PATH) -> Iterator[Dict[str, Any]]:
+        """Stream songs from a JSON array or JSONL file, one at a time."""
+        print(f"📖 Streaming songs from {path}...")
         
-        try:
-            with open(SONGS_FILE_PATH, 'r', encoding='utf-8') as f:
-                songs = json.load(f)
-            
-            print(f"✅ Successfully loaded {len(songs)} songs")
-            return songs
-            
-        except FileNotFoundError:
-            print(f"❌ Error: Songs file not found at {SONGS_FILE_PATH}")
-            sys.exit(1)
-        except json.JSONDecodeError as e:
-            print(f"❌ Error: Could not decode JSON from {SONGS_FILE_PATH}: {e}")
+        if not os.path.exists(path):
+            print(f"❌ Error: Songs file not found at {path}")
             sys.exit(1)
-        except Exception as e:
-            print(f"❌ Error loading songs: {e}")
+        
+        try:
+            yield from iter_records(path)
+        except ValueError as e:
+            print(f"❌ Error: Could not decode JSON from {path}: {e}")
             sys.exit(1)
     
     def convert_song_format(self, song: Dict[str, Any]) -> Dict[str, Any]:
@@ -95,24 +149,7 @@ class SongImporter:
     
     def extract_key_from_chordpro(self, chordpro: str) -> str:
         """Try to extract the musical key from ChordPro content."""
-        if not chordpro:
-            return ""
-        
-        # Look for common chord patterns at the start of verses
-        import re
-        
-        # Common chord patterns (simplified detection)
-        chord_patterns = [
-            r'\[([A-G][#b]?(?:m|maj|min|sus|dim|aug)?)\]',  # [C], [Dm], [F#m], etc.
-        ]
-        
-        for pattern in chord_patterns:
-            matches = re.findall(pattern, chordpro)
-            if matches:
-                # Return the first chord found as a guess for the key
-                return matches[0]
-        
-        return ""
+        return extract_key_from_chordpro(chordpro)
     
     def validate_song(self, song: Dict[str, Any]) -> tuple[bool, str]:
         """Validate that a song has required fields."""
@@ -132,36 +169,72 @@ class SongImporter:
     
     def import_song(self, song_data: Dict[str, Any], song_index: int, dry_run: bool = False) -> bool:
         """Import a single song to the backend."""
-        converted_song = self.convert_song_format(song_data)
+        with self.metrics.time("convert"):
+            converted_song = self.convert_song_format(song_data)
         
         # Validate the song
         is_valid, error_msg = self.validate_song(converted_song)
         if not is_valid:
             print(f"⚠️  Song #{song_index + 1} '{converted_song.get('title', 'Unknown')}' - SKIPPED: {error_msg}")
-            self.stats["skipped"] += 1
+            self.count("skipped")
             return False
         
+        key = payload_hash(converted_song)
+        entry = None
+        if self.journal:
+            with self.metrics.time("journal"):
+                entry = self.journal.get(key)
+        if self.journal and self.journal.is_done(entry):
+            self.log(f"⏭️  Song #{song_index + 1} '{converted_song['title']}' - already {entry['status']} (journal)")
+            self.count("journaled")
+            return entry["status"] == IMPORTED
+        
         if dry_run:
-            print(f"🔍 DRY RUN - Would import: '{converted_song['title']}' by {converted_song.get('artist', 'Unknown')}")
+            self.log(f"🔍 DRY RUN - Would import: '{converted_song['title']}' by {converted_song.get('artist', 'Unknown')}")
             return True
         
+        if self.journal and self.journal.needs_check(entry):
+            # An earlier request may have created it; the backend would accept a second copy
+            try:
+                song_id = find_song(self.session, self.api_url, converted_song["title"], converted_song.get("artist"),
+                                    self.throttle, metrics=self.metrics, content=converted_song["content"],
+                                    timeout=REQUEST_TIMEOUT)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                self.report_unconfirmed(key, converted_song["title"], f"Lookup failed: {e}")
+                return False
+            if song_id:
+                self.log(f"🔎 Song #{song_index + 1} '{converted_song['title']}' - found on the backend, not sent again")
+                self.count("found")
+                with self.metrics.time("journal"):
+                    self.journal.finish(key, IMPORTED, song_id=song_id, message="Found by lookup after an unconfirmed send")
+                return True
+        
         try:
-            print(f"📤 Importing #{song_index + 1}: '{converted_song['title']}' by {converted_song.get('artist', 'Unknown')}...")
+            self.log(f"📤 Importing #{song_index + 1}: '{converted_song['title']}' by {converted_song.get('artist', 'Unknown')}...")
             
-            response = requests.post(
-                CREATE_SONG_ENDPOINT,
+            if self.journal:
+                with self.metrics.time("journal"):
+                    self.journal.begin(key, converted_song["title"])
+            response = send_with_backoff(
+                self.session, "POST", self.create_song_endpoint, self.throttle,
+                max_retries=MAX_RETRIES,
+                metrics=self.metrics,
                 json=converted_song,
-                headers=self.headers,
                 timeout=REQUEST_TIMEOUT
             )
             
             if response.status_code == 201:
-                print(f"✅ Successfully imported: '{converted_song['title']}'")
-                self.stats["success"] += 1
+                self.log(f"✅ Successfully imported: '{converted_song['title']}'")
+                self.count("success")
+                self.journal_outcome(key, IMPORTED, response)
                 return True
             elif response.status_code == 409:
-                print(f"⚠️  Song already exists: '{converted_song['title']}' - SKIPPED")
-                self.stats["skipped"] += 1
+                self.log(f"⚠️  Song already exists: '{converted_song['title']}' - SKIPPED")
+                self.count("skipped")
+                self.journal_outcome(key, EXISTS, response)
+                return False
+            elif outcome_unknown(response):
+                self.report_unconfirmed(key, converted_song["title"], f"HTTP {response.status_code}", response)
                 return False
             else:
                 error_detail = ""
@@ -172,30 +245,68 @@ class SongImporter:
                     error_detail = f" - HTTP {response.status_code}"
                 
                 print(f"❌ Failed to import '{converted_song['title']}'{error_detail}")
-                self.stats["failed"] += 1
+                self.count("failed")
+                self.journal_outcome(key, FAILED, response, error_detail.lstrip(" -"))
                 return False
                 
-        except requests.exceptions.Timeout:
-            print(f"❌ Timeout importing '{converted_song['title']}'")
-            self.stats["failed"] += 1
-            return False
         except requests.exceptions.RequestException as e:
+            if not request_not_sent(e):
+                reason = "Timeout" if isinstance(e, requests.exceptions.Timeout) else f"Network error: {e}"
+                self.report_unconfirmed(key, converted_song["title"], reason)
+                return False
             print(f"❌ Network error importing '{converted_song['title']}': {e}")
-            self.stats["failed"] += 1
+            self.count("failed")
+            self.journal_outcome(key, FAILED, message=str(e))
             return False
         except Exception as e:
             print(f"❌ Unexpected error importing '{converted_song['title']}': {e}")
-            self.stats["failed"] += 1
+            self.count("failed")
+            self.journal_outcome(key, FAILED, message=str(e))
             return False
     
+    def report_unconfirmed(self, key: str, title: str, reason: str,
+                           response: Optional[requests.Response] = None) -> None:
+        """
+        A POST that may or may not have created the song (5xx, read timeout,
+        dropped connection). It is not resent: it counts as failed, is listed
+        at the end, and stays "sent" in the journal, so the next run looks it
+        up before sending it again.
+        """
+        print(f"❓ No confirmation for '{title}' ({reason}) - it may have been created, the next run looks it up first")
+        with self._stats_lock:
+            self.stats["failed"] += 1
+            self.stats["unconfirmed"] += 1
+            self.unconfirmed.append(title)
+        self.journal_outcome(key, SENT, response, f"{reason}; outcome unknown")
+    
+    def journal_outcome(self, key: str, status: str, response: Optional[requests.Response] = None,
+                        message: Optional[str] = None) -> None:
+        """Record how a sent song ended, with the songId the backend returned."""
+        if not self.journal:
+            return
+        with self.metrics.time("journal"):
+            self._journal_outcome(key, status, response, message)
+    
+    def _journal_outcome(self, key: str, status: str, response: Optional[requests.Response],
+                         message: Optional[str]) -> None:
+        song_id = None
+        if response is not None and response.status_code == 201:
+            try:
+                song_id = response.json().get("songId")
+            except ValueError:
+                pass
+        self.journal.finish(key, status, song_id=song_id,
+                            http_status=response.status_code if response is not None else None,
+                            message=message)
+    
     def test_connection(self) -> bool:
         """Test connection to the production backend."""
         print("🔌 Testing connection to production backend...")
         
         try:
             # Test with a simple GET request to a health endpoint or similar
-            health_url = f"{PRODUCTION_API_URL.replace('/api', '')}/api/health"
-            response = requests.get(health_url, timeout=10)
+            health_url = f"{self.api_url.rstrip('/')}/health"
+            response = self.session.get(health_url, timeout=10)
             
             if response.status_code == 200:
                 print("✅ Backend connection successful")
@@ -208,47 +319,71 @@ class SongImporter:
             print(f"❌ Backend connection failed: {e}")
             return False
     
-    def import_songs(self, songs: List[Dict[str, Any]], dry_run: bool = False, 
-                    limit: Optional[int] = None, start_from: int = 0) -> None:
-        """Import all songs with optional limits."""
+    def import_songs(self, songs: Iterable[Dict[str, Any]], dry_run: bool = False, 
+                    limit: Optional[int] = None, start_from: int = 0, dedup: bool = True) -> None:
+        """Import all songs with optional limits, streaming them through a bounded window."""
         
         if not self.test_connection():
             print("❌ Cannot connect to backend. Aborting import.")
             return
         
-        # Apply start_from and limit
+        # Apply start_from and limit lazily; songs are never all in memory
         if start_from > 0:
-            songs = songs[start_from:]
             print(f"📍 Starting from song #{start_from + 1}")
         
         if limit:
-            songs = songs[:limit]
             print(f"📊 Limiting import to {limit} songs")
         
-        self.stats["total"] = len(songs)
+        # "read" is the time spent waiting on the songs file between requests
+        indexed = islice(enumerate(self.metrics.timed_iter("read", songs)), start_from,
+                         start_from + limit if limit else None)
+        
+        # Exact duplicates (same normalized title, artist and body) never reach the network
+        deduplicator = Deduplicator() if dedup else None
+        
+        def pending():
+            for song_index, song in indexed:
+                self.stats["total"] += 1
+                if deduplicator and deduplicator.is_duplicate(song):
+                    continue
+                yield song_index, song
         
         if dry_run:
             print(f"\n🔍 DRY RUN MODE - No songs will actually be imported")
         
-        print(f"\n🚀 Starting import of {len(songs)} songs...")
+        print(f"\n🚀 Starting import with up to {self.workers} requests in flight...")
         print("=" * 60)
         
-        for i, song in enumerate(songs):
-            try:
-                self.import_song(song, start_from + i, dry_run)
-                
-                # Add delay between requests to be respectful to the server
-                if not dry_run and i < len(songs) - 1:
-                    time.sleep(DELAY_BETWEEN_REQUESTS)
-                    
-            except KeyboardInterrupt:
-                print(f"\n⚠️  Import interrupted by user at song #{i + 1}")
-                break
-            except Exception as e:
-                print(f"❌ Unexpected error processing song #{i + 1}: {e}")
-                self.stats["failed"] += 1
-                continue
+        started = time.monotonic()
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        # Only a window of songs is read ahead of the requests in flight
+        window = 2 * self.workers
+        completed = 0
+        try:
+            for (song_index, song), future in bounded_map(
+                    pool, lambda item: self.import_song(item[1], item[0], dry_run), pending(), window):
+                completed += 1
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"❌ Unexpected error processing song #{song_index + 1}: {e}")
+                    self.count("failed")
+                if self.quiet and completed % PROGRESS_EVERY == 0:
+                    print(f"📊 Progress: {completed} songs done, {self.stats['success']} imported")
+        except KeyboardInterrupt:
+            print(f"\n⚠️  Import interrupted by user after {completed} songs")
+        finally:
+            # Drop queued songs; requests already in flight finish first
+            pool.shutdown(wait=True, cancel_futures=True)
+        
+        if deduplicator:
+            self.stats["duplicates"] = len(deduplicator.dropped)
+            print(f"\n🧹 Dedup: {deduplicator.report()}")
         
+        elapsed = time.monotonic() - started
+        print(f"\n⏱️  {elapsed:.1f}s elapsed, {self.throttle.throttled} throttled responses, "
+              f"final concurrency {self.throttle.limit}")
+        self.metrics.print_summary("⏱️  Stage timings")
         self.print_summary(dry_run)
     
     def print_summary(self, dry_run: bool = False) -> None:
@@ -262,11 +397,20 @@ class SongImporter:
         print(f"Total songs processed: {self.stats['total']}")
         print(f"✅ Successfully imported: {self.stats['success']}")
         print(f"⚠️  Skipped: {self.stats['skipped']}")
+        print(f"🧹 Duplicates dropped before sending: {self.stats['duplicates']}")
+        print(f"⏭️  Already done (journal): {self.stats['journaled']}")
+        print(f"🔎 Found on the backend after an unconfirmed send: {self.stats['found']}")
         print(f"❌ Failed: {self.stats['failed']}")
         
         if self.stats["total"] > 0:
             success_rate = (self.stats["success"] / self.stats["total"]) * 100
             print(f"📈 Success rate: {success_rate:.1f}%")
+        
+        if self.unconfirmed:
+            print(f"\n❓ {len(self.unconfirmed)} of the failed songs got no clear answer and may have been "
+                  f"created; the next run looks them up before sending them again:")
+            for title in self.unconfirmed:
+                print(f"   - {title}")
 
 
 def main():
@@ -299,10 +443,56 @@ def main():
         "--start-from", 
         type=int, 
         default=0,
-        help="Start importing from song number N (useful for resuming)"
+        help="Start importing from song number N"
+    )
+    
+    parser.add_argument(
+        "--workers", 
+        type=int, 
+        default=MAX_IN_FLIGHT,
+        help=f"Maximum requests in flight (default {MAX_IN_FLIGHT}, reduced automatically on 429/5xx)"
+    )
+    
+    parser.add_argument(
+        "--api-url", 
+        default=PRODUCTION_API_URL,
+        help="Backend API base URL (default: production)"
+    )
+    
+    parser.add_argument(
+        "--input", 
+        default=SONGS_FILE_PATH,
+        help="Songs file to import: a JSON array or JSON Lines (.jsonl), read as a stream "
+             f"(default {os.path.basename(SONGS_FILE_PATH)})"
+    )
+    
+    parser.add_argument(
+        "--no-dedup", 
+        action="store_true",
+        help="Send exact duplicate songs too instead of dropping them before import"
+    )
+    
+    parser.add_argument(
+        "--no-journal", 
+        action="store_true",
+        help=f"Do not read or write {os.path.basename(JOURNAL_FILE_PATH)} (every song is sent)"
+    )
+    
+    parser.add_argument(
+        "--quiet", 
+        action="store_true",
+        help=f"No per-song output, progress every {PROGRESS_EVERY} songs (failures are still shown)"
+    )
+    
+    parser.add_argument(
+        "--metrics", 
+        metavar="PATH",
+        help="Write stage timings, retries and bytes at the end (.prom: Prometheus text, else JSON)"
     )
     
+    add_profile_arguments(parser)
     args = parser.parse_args()
+    start_profiling(args, "import_lacuerda")
     
     print("🎵 ChoirApp Production Song Importer")
     print("=" * 60)
@@ -316,18 +506,27 @@ def main():
             return
     
     # Initialize importer
-    importer = SongImporter(args.token, PRODUCTION_API_URL)
+    journal = None if args.no_journal else ImportJournal(JOURNAL_FILE_PATH, f"{args.api_url.rstrip('/')}/songs")
+    if journal:
+        print(f"📒 Journal {JOURNAL_FILE_PATH}: {journal.summary() or 'empty'}")
+    importer = SongImporter(args.token, args.api_url, workers=args.workers, journal=journal, quiet=args.quiet)
     
     # Load songs
-    songs = importer.load_songs()
+    songs = importer.load_songs(args.input)
     
     # Import songs
     importer.import_songs(
         songs, 
         dry_run=args.dry_run, 
         limit=args.limit, 
-        start_from=args.start_from
+        start_from=args.start_from,
+        dedup=not args.no_dedup
     )
+    if args.metrics:
+        importer.metrics.write(args.metrics)
+        print(f"📈 Metrics saved to {args.metrics}")
+    if journal:
+        journal.close()
 
 
 if __name__ == "__main__":
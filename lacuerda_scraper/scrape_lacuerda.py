@@ -1,85 +1,269 @@
-import requests
-from bs4 import BeautifulSoup
-import json
+import argparse
+import glob
+import hashlib
 import os
-import time
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from songtools import chordpro, chords, lacuerda_html, merge
+from songtools.crawlstate import CrawlState, content_hash
+from songtools.httpclient import HttpClient, ResponseCache, create_session
+from songtools.jsonl import JsonlSink, compact_jsonl
+from songtools.lacuerda_html import BACKENDS, DEFAULT_BACKEND, check_parity, extract_index_links, extract_song_fields
+from songtools.metrics import Metrics
+from songtools.profiling import add_profile_arguments, start_profiling
+from songtools.ratelimit import HostRateLimiter
+from songtools.rawstore import RawStore
 
 BASE_URL = "https://chords.lacuerda.net/mus_catolica/"
 SONG_BASE = "https://chords.lacuerda.net"
 HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; ChoirAppBot/1.0)"}
 
 OUTPUT_FILE = "lacuerda_songs.json"
+# The last fetched index page; it also gives --compact-only the index order
+INDEX_FILE = "index_debug.html"
+# Songs are appended here as they are scraped, then compacted into OUTPUT_FILE
+CHECKPOINT_FILE = "lacuerda_songs.jsonl"
+FSYNC_EVERY = 25
+# Per-URL validators and parsed records, so re-crawls only re-parse changed pages
+STATE_FILE = "lacuerda_crawl_state.sqlite"
+# Bump when parsing changes in a way the code fingerprint below cannot see
+PARSER_VERSION = "1"
+# Raw responses kept here when --cache is used, so pages can be re-parsed offline
+CACHE_DIR = "http_cache"
+# Online, cached pages older than this are fetched again (--cache-max-age); the index never comes from the cache
+CACHE_MAX_AGE_HOURS = 24.0
+# Raw <pre> text is kept here, compressed, and referenced from each record by "raw_ref"
+RAW_STORE_DIR = "raw_store"
+
+# Shared keep-alive session; main() swaps in one sized for the worker pool
+http_client = HttpClient(create_session(HEADERS))
+# HTML backend for field extraction ("lxml" when installed, else "bs4"); see --parser
+html_backend = DEFAULT_BACKEND
+
+# Crawl settings: N pages in flight, with a per-host token bucket for politeness
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 2.0
+
+# Per-stage timings (fetch, parse, convert, write) and byte counts for the run; see --metrics
+metrics = Metrics("scrape_lacuerda")
+# --quiet drops the per-song lines and reports progress every PROGRESS_EVERY songs
+quiet = False
+PROGRESS_EVERY = 100
+
+def log(message):
+    """Per-song output, dropped in quiet mode."""
+    if not quiet:
+        print(message)
+
+def parser_version():
+    """PARSER_VERSION plus a fingerprint of the parsing code, so edits re-parse stored pages."""
+    digest = hashlib.sha256(PARSER_VERSION.encode())
+    for path in (__file__, chordpro.__file__, chords.__file__, merge.__file__, lacuerda_html.__file__):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    # The backend is chosen per run (--parser) and can extract slightly different text
+    digest.update(html_backend.encode())
+    return digest.hexdigest()[:16]
 
 def get_song_links():
     print("Fetching song index...")
-    resp = requests.get(BASE_URL, headers=HEADERS)
+    # Always fetched online, so new songs are found even with --cache
+    resp = http_client.get(BASE_URL, max_age=0)
     resp.raise_for_status()
-    with open('index_debug.html', 'w', encoding='utf-8') as f:
+    with open(INDEX_FILE, 'w', encoding='utf-8') as f:
         f.write(resp.text)
-    soup = BeautifulSoup(resp.text, "html.parser")
-    links = set()
-    main_ul = soup.find('ul', id='b_main')
-    if not main_ul:
+    return song_links_from_index(resp.text)
+
+def song_links_from_index(html):
+    """Unique song URLs of an index page, in index order."""
+    hrefs = extract_index_links(html, html_backend)
+    if hrefs is None:
         print("Could not find the main song list <ul id='b_main'>.")
         return []
-    for a in main_ul.find_all('a', href=True):
-        href = a['href'].strip()
+    links = {}
+    for href in hrefs:
+        href = href.strip()
         if href and not href.startswith('javascript:'):
             # Build full URL
             url = SONG_BASE + '/mus_catolica/' + href
-            links.add(url)
+            links[url] = None  # dict keeps index order, so runs are deterministic
     links = list(links)
     print(f"Found {len(links)} song links.")
     return links
 
-def parse_song_page(url):
-    print(f"Scraping: {url}")
+def parse_song_page(url, crawl_state=None, max_age=None):
+    log(f"Scraping: {url}")
     try:
-        resp = requests.get(url, headers=HEADERS)
+        state = crawl_state.get(url) if crawl_state else None
+        if crawl_state and crawl_state.is_fresh(state, max_age):
+            log("  Fresh in crawl state, not refetching")
+            crawl_state.count("fresh")
+            return stored_song(url, state, crawl_state)
+        headers = crawl_state.conditional_headers(state) if crawl_state else None
+        resp = http_client.get(url, headers=headers)
+        if resp.status_code == 304 and state:
+            log("  Not modified (304)")
+            crawl_state.touch(url)
+            crawl_state.count("not_modified")
+            return stored_song(url, state, crawl_state)
         resp.raise_for_status()
-        soup = BeautifulSoup(resp.text, "html.parser")
-        # Title and artist extraction
-        h1 = soup.find("h1")
-        title = h1.text.strip() if h1 else "Unknown"
-        # Remove trailing 'Música Católica' from title if present
-        if title.lower().endswith("música católica"):
-            title = title[:-(len("música católica"))].strip(" -:–")
-        # Try to extract artist from <h2> if present
-        h2 = soup.find("h2")
-        if h2 and "de:" in h2.text.lower():
-            artist = h2.text.split(":", 1)[-1].strip()
-        else:
-            artist = "Música Católica"
-        # Chords/lyrics extraction - find the pre tag with the most content (actual song)
-        pres = soup.find_all("pre")
-        chords = ""
-        if pres:
-            # Find the pre tag with the most content (likely the song content)
-            longest_pre = max(pres, key=lambda p: len(p.text.strip()))
-            chords = longest_pre.text.strip()
-            print(f"  Found {len(pres)} pre tags, using one with {len(chords)} characters")
-        chordpro = to_chordpro_format(chords)
-        # Metadata (tags, source, etc.)
-        tags = []
-        for tag in soup.select("a[href^='/genero/']"):
-            tags.append(tag.text.strip())
-        if title and chordpro:
-            print(f"  Success: {title}")
-            return {
-                "title": title,
-                "artist": artist,
-                "chordpro": chordpro,
-                "tags": tags,
-                "source_url": url
-            }
-        else:
-            print(f"  Skipped: Missing title or chords")
-            return None
+        etag = resp.headers.get("ETag")
+        last_modified = resp.headers.get("Last-Modified")
+        body_hash = content_hash(resp.content)
+        if crawl_state and crawl_state.is_current(state) and state["content_hash"] == body_hash:
+            log("  Unchanged content, reusing previous result")
+            crawl_state.touch(url, etag, last_modified)
+            crawl_state.count("unchanged")
+            return state["record"]
+        song = parse_song_html(resp.text, url)
+        if crawl_state:
+            crawl_state.record(url, etag, last_modified, body_hash, song, resp.text)
+            crawl_state.count("fetched")
+        return song
     except Exception as e:
         print(f"  Error scraping {url}: {e}")
+        metrics.count("errors")
         return None
 
+def stored_song(url, state, crawl_state):
+    """The stored record of `url`, parsed again from the stored page if an older parser produced it."""
+    if crawl_state.is_current(state):
+        return state["record"]
+    log("  Parser changed, re-parsing the stored page")
+    song = parse_song_html(state["body"], url)
+    crawl_state.update_record(url, song)
+    crawl_state.count("reparsed")
+    return song
+
+def parse_song_html(html, url):
+    """Extract a song record from a laCuerda song page, or None if it has no chords."""
+    with metrics.time("parse"):
+        fields = extract_song_fields(html, html_backend)
+    # Title and artist extraction
+    title = fields["h1"].strip() if fields["h1"] is not None else "Unknown"
+    # Remove trailing 'Música Católica' from title if present
+    if title.lower().endswith("música católica"):
+        title = title[:-(len("música católica"))].strip(" -:–")
+    # Try to extract artist from <h2> if present
+    h2 = fields["h2"]
+    if h2 and "de:" in h2.lower():
+        artist = h2.split(":", 1)[-1].strip()
+    else:
+        artist = "Música Católica"
+    # Chords/lyrics extraction - find the pre tag with the most content (actual song)
+    pres = fields["pres"]
+    chords = ""
+    if pres:
+        # Find the pre tag with the most content (likely the song content)
+        longest_pre = max(pres, key=lambda p: len(p.strip()))
+        chords = longest_pre.strip()
+        log(f"  Found {len(pres)} pre tags, using one with {len(chords)} characters")
+    with metrics.time("convert"):
+        chordpro = to_chordpro_format(chords)
+    # Metadata (tags, source, etc.)
+    tags = [tag.strip() for tag in fields["tags"]]
+    if title and chordpro:
+        log(f"  Success: {title}")
+        return {
+            "title": title,
+            "artist": artist,
+            "chordpro": chordpro,
+            "tags": tags,
+            "source_url": url,
+            # Converter input, so chordpro can be regenerated without a re-crawl (python -m songtools.reconvert);
+            # main() moves it into the raw store
+            "raw_text": chords
+        }
+    else:
+        log("  Skipped: Missing title or chords")
+        return None
+
+def saved_index_order():
+    """Song URLs in the order of the saved INDEX_FILE, or [] when there is none."""
+    if not os.path.exists(INDEX_FILE):
+        return []
+    with open(INDEX_FILE, 'r', encoding='utf-8') as f:
+        return song_links_from_index(f.read())
+
+def compact_checkpoint(order):
+    """
+    Rewrite OUTPUT_FILE from the JSONL checkpoint in index order (`order` is
+    the list of song URLs). Songs missing from `order` follow, sorted by URL,
+    so the output never depends on completion order.
+    """
+    position = {url: i for i, url in enumerate(order)}
+    sort_key = lambda song: (position.get(song.get("source_url"), len(position)), song.get("source_url") or "")
+    count = compact_jsonl(CHECKPOINT_FILE, OUTPUT_FILE, sort_key=sort_key)
+    print(f"Saved {count} songs to {OUTPUT_FILE}")
+
+def run_parity_check(backend):
+    """Check that `backend` extracts the same fields as BeautifulSoup from saved pages."""
+    index_path = INDEX_FILE if os.path.exists(INDEX_FILE) else None
+    song_paths = sorted(glob.glob(os.path.join(CACHE_DIR, '*', '*.body')))
+    print(f"Checking {backend} against bs4 on {'index_debug.html and ' if index_path else ''}{len(song_paths)} cached pages...")
+    mismatches = check_parity(index_path, song_paths, backend=backend)
+    for mismatch in mismatches:
+        print(f"  MISMATCH {mismatch}")
+    print("Parity OK" if not mismatches else f"{len(mismatches)} mismatches")
+    if mismatches:
+        sys.exit(1)
+
 def main():
+    parser = argparse.ArgumentParser(description="Scrape Música Católica songs from laCuerda")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help=f"Song pages fetched concurrently (default {MAX_WORKERS})")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND,
+                        help=f"Max requests per second per host (default {REQUESTS_PER_SECOND})")
+    parser.add_argument("--compact-only", action="store_true",
+                        help=f"Only rebuild {OUTPUT_FILE} from an existing {CHECKPOINT_FILE}")
+    parser.add_argument("--full", action="store_true",
+                        help=f"Ignore {STATE_FILE} and refetch and re-parse every page")
+    parser.add_argument("--cache", action="store_true",
+                        help=f"Keep downloaded pages in {CACHE_DIR}/ and serve repeats from there")
+    parser.add_argument("--cache-max-age", type=float, default=CACHE_MAX_AGE_HOURS, metavar="HOURS",
+                        help=f"Fetch cached pages older than HOURS again (default {CACHE_MAX_AGE_HOURS:g}; "
+                             f"not used offline)")
+    parser.add_argument("--offline", action="store_true",
+                        help=f"Re-parse every page from {CACHE_DIR}/ without touching the network")
+    parser.add_argument("--parser", choices=sorted(BACKENDS), default=DEFAULT_BACKEND,
+                        help=f"HTML backend for field extraction (default {DEFAULT_BACKEND})")
+    parser.add_argument("--check-parity", action="store_true",
+                        help=f"Compare the --parser backend with bs4 on index_debug.html and {CACHE_DIR}/, then exit")
+    parser.add_argument("--skip-fresh", type=float, metavar="HOURS",
+                        help="Reuse pages fetched within HOURS without any request (resume an interrupted crawl)")
+    parser.add_argument("--inline-raw", action="store_true",
+                        help=f"Keep raw_text inside each record instead of in {RAW_STORE_DIR}/")
+    parser.add_argument("--quiet", action="store_true",
+                        help=f"No per-song output; progress every {PROGRESS_EVERY} songs")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write stage timings and counters at the end (.prom: Prometheus text, else JSON)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args, "scrape_lacuerda")
+
+    global html_backend, quiet
+    html_backend = args.parser
+    quiet = args.quiet
+
+    if args.compact_only:
+        order = saved_index_order()
+        if not order:
+            print(f"No {INDEX_FILE} to take the index order from; songs are sorted by URL")
+        compact_checkpoint(order)
+        return
+    if args.check_parity:
+        run_parity_check(args.parser)
+        return
+
+    global http_client
+    cache = ResponseCache(CACHE_DIR) if args.cache or args.offline else None
+    rate_limiter = HostRateLimiter(args.rate, capacity=max(1.0, float(args.workers)))
+    http_client = HttpClient(create_session(HEADERS, pool_size=max(1, args.workers)),
+                             cache=cache, offline=args.offline, rate_limiter=rate_limiter, metrics=metrics,
+                             max_age=args.cache_max_age * 3600)
+
     links = get_song_links()
     print(f"Preparing to scrape {len(links)} songs...")
     unique_links = []
@@ -89,126 +273,67 @@ def main():
             unique_links.append(url)
             seen.add(url)
 
-    print(f"Scraping {len(unique_links)} unique songs for testing...")
-    songs = []
-    for i, url in enumerate(unique_links):
-        song = parse_song_page(url)
-        if song:
-            songs.append(song)
-        else:
-            print(f"[SKIP] {url}")
-        # Save after every song for maximum safety
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(songs, f, ensure_ascii=False, indent=2)
-        print(f"[PROGRESS] Saved {len(songs)} songs at {i+1} of {len(unique_links)}...")
-        time.sleep(1.5)  # polite delay to avoid rate limiting
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(songs, f, ensure_ascii=False, indent=2)
-    print(f"Saved {len(songs)} songs to {OUTPUT_FILE}")
+    print(f"Scraping {len(unique_links)} unique songs with {args.workers} workers at {args.rate} req/s...")
+    # Offline runs exist to re-parse cached pages, so stored records are not reused
+    crawl_state = None if args.full or args.offline else CrawlState(STATE_FILE, parser_version())
+    max_age = args.skip_fresh * 3600 if args.skip_fresh else None
+    raw_store = None if args.inline_raw else RawStore(RAW_STORE_DIR)
+    done = 0
+    # Each song is appended to the checkpoint as soon as it is scraped, so an
+    # interrupted run keeps everything fetched so far at constant cost per song
+    with JsonlSink(CHECKPOINT_FILE, fsync_every=FSYNC_EVERY, truncate=True) as sink:
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = {
+                pool.submit(parse_song_page, url, crawl_state, max_age): url
+                for url in unique_links
+            }
+            for future in as_completed(futures):
+                url = futures[future]
+                song = future.result()
+                done += 1
+                if song:
+                    with metrics.time("write"):
+                        if raw_store:
+                            song = raw_store.externalize(song)
+                        sink.write(song)
+                else:
+                    log(f"[SKIP] {url}")
+                    metrics.count("songs_skipped")
+                if not quiet or done % PROGRESS_EVERY == 0 or done == len(unique_links):
+                    print(f"[PROGRESS] Saved {sink.count} songs at {done} of {len(unique_links)}...")
+    if crawl_state:
+        stats = crawl_state.stats
+        print(f"[STATE] {stats['fetched']} parsed, {stats['not_modified']} not modified, "
+              f"{stats['unchanged']} unchanged, {stats['fresh']} reused without a request, "
+              f"{stats['reparsed']} re-parsed for a new parser")
+        crawl_state.close()
+    if raw_store:
+        stats = raw_store.stats()
+        print(f"[RAW] {stats['blobs']} blobs in {RAW_STORE_DIR}/, "
+              f"{stats['raw_bytes']:,} bytes stored as {stats['stored_bytes']:,}")
+        raw_store.close()
+    # Completion order varies between runs; compaction restores index order
+    with metrics.time("compact"):
+        compact_checkpoint(unique_links)
+    metrics.count("songs_saved", sink.count)
+    metrics.print_summary()
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"Metrics saved to {args.metrics}")
 
 def to_chordpro_format(text):
-    """
-    Converts laCuerda two-line format to ChordPro inline format.
-    Each pair of lines: chords, lyrics -> merged to [CHORD]lyric.
-    Preserves blank lines and lines without chords.
-    Adds {start_of_verse}/{end_of_verse} markers for blocks.
-    Handles section labels like INTRO:, VERSE:, CHORUS: properly.
-    """
-    lines = text.splitlines()
-    result = []
-    i = 0
-    
-    def is_section_label(line):
-        """Check if a line is a section label like INTRO:, VERSE:, CHORUS:, etc."""
-        line = line.strip().upper()
-        section_keywords = ['INTRO:', 'VERSE:', 'CHORUS:', 'BRIDGE:', 'OUTRO:', 'CODA:', 'ESTRIBILLO:', 'VERSO:']
-        return any(line.startswith(keyword) or line == keyword.rstrip(':') for keyword in section_keywords)
-    
-    while i < len(lines):
-        current_line = lines[i].strip()
-        
-        # Skip empty lines
-        if current_line == "":
-            result.append("")
-            i += 1
-            continue
-        
-        # Check if current line is a section label
-        if is_section_label(current_line):
-            # Add section label as-is (not as a chord)
-            if not result or result[-1] == "":
-                result.append("{start_of_verse}")
-            result.append(current_line)
-            i += 1
-            continue
-        
-        # If next line exists and is not blank, and current line is not a section label
-        if i+1 < len(lines) and lines[i+1].strip() != "" and not is_section_label(lines[i+1]):
-            chords_line = lines[i]
-            lyric_line = lines[i+1]
-            
-            # Check if the chords line looks like actual chords (contains chord-like patterns)
-            if has_chord_patterns(chords_line):
-                merged = merge_chords_lyrics(chords_line, lyric_line)
-                # Start a new verse if previous line was blank or start of file
-                if not result or result[-1] == "":
-                    result.append("{start_of_verse}")
-                result.append(merged)
-                # If next next line is blank or end, close verse
-                if i+2 >= len(lines) or lines[i+2].strip() == "":
-                    result.append("{end_of_verse}")
-                i += 2
-            else:
-                # Treat as single line (not chord/lyric pair)
-                if not result or result[-1] == "":
-                    result.append("{start_of_verse}")
-                result.append(current_line)
-                if i+1 >= len(lines) or lines[i+1].strip() == "":
-                    result.append("{end_of_verse}")
-                i += 1
-        else:
-            # No chord line, just lyrics or single line
-            if not result or result[-1] == "":
-                result.append("{start_of_verse}")
-            result.append(current_line)
-            if i+1 >= len(lines) or lines[i+1].strip() == "":
-                result.append("{end_of_verse}")
-            i += 1
-    return "\n".join(result)
+    """Converts laCuerda two-line format to ChordPro inline format."""
+    return chordpro.to_chordpro_format(text, profile=chordpro.LACUERDA)
 
 def has_chord_patterns(line):
-    """Check if a line contains chord-like patterns (Spanish chord names)"""
-    import re
-    # Common Spanish chord patterns
-    chord_patterns = [
-        r'\b(DO|RE|MI|FA|SOL|LA|SI)\b',  # Basic Spanish chords
-        r'\b[A-G][#b]?m?\b',  # English chord notation (C, Dm, F#, etc.)
-        r'\b(LAm|REm|MIm|FAm|SOLm|SIm)\b',  # Minor Spanish chords
-        r'\b(DO#|RE#|FA#|SOL#|LA#)\b',  # Sharp chords
-        r'\b[A-G][#b]?(sus[24]?|maj[79]?|m[679]?|dim|aug|add[0-9])\b',  # Complex chords
-        r'/[A-G][#b]?\b'  # Slash chords like LA/DO#
-    ]
-    
-    for pattern in chord_patterns:
-        if re.search(pattern, line, re.IGNORECASE):
-            return True
-    return False
-
-def merge_chords_lyrics(chords_line, lyric_line):
+    """Check if a line is a chord line (Spanish or English chord names)"""
+    return chordpro.has_chord_patterns(line)
+
+def merge_chords_lyrics(chords_line, lyric_line, chord_spans=None):
     """
     Merges a chords line and a lyric line into ChordPro inline format.
     """
-    import re
-    # Find chord positions (non-space sequences)
-    chord_spans = [(m.start(), m.group()) for m in re.finditer(r'\S+', chords_line)]
-    lyric = lyric_line
-    offset = 0
-    for pos, chord in chord_spans:
-        # Insert chord at the right position in the lyric
-        insert_at = min(pos + offset, len(lyric))
-        lyric = lyric[:insert_at] + f'[{chord}]' + lyric[insert_at:]
-        offset += len(chord) + 2  # +2 for []
-    return lyric
+    return chordpro.merge_chords_lyrics(chords_line, lyric_line, chordpro.LACUERDA, chord_spans)
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,19 @@
 import requests
+import argparse
 import json
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from songtools.metrics import Metrics
+from songtools.profiling import add_profile_arguments, start_profiling
 
 # --- Configuration ---
 # Please ensure the backend is running and this URL is correct.
 API_BASE_URL = "http://localhost:5014/api"
 CREATE_SONG_ENDPOINT = f"{API_BASE_URL}/songs"
 SONGS_FILE_PATH = os.path.join(os.path.dirname(__file__), 'pdf_songs_full.json')
+PROGRESS_EVERY = 100  # songs between progress lines with --quiet
 
 # --- Authentication Token ---
 # IMPORTANT: You must get a JWT token by logging into the web application.
@@ -18,11 +25,13 @@ SONGS_FILE_PATH = os.path.join(os.path.dirname(__file__), 'pdf_songs_full.json')
 #    and paste ONLY the token part (the 'ey...' part) below.
 JWT_TOKEN = ""
 
-def import_songs(token):
+def import_songs(token, quiet=False, metrics=None):
     """Reads songs from the JSON file and imports them via the API."""
+    # Stage timings (read, http_post) plus bytes sent and received
+    metrics = metrics or Metrics("import_to_backend_pdf")
     print(f"Reading songs from {SONGS_FILE_PATH}...")
     try:
-        with open(SONGS_FILE_PATH, 'r', encoding='utf-8') as f:
+        with metrics.time("read"), open(SONGS_FILE_PATH, 'r', encoding='utf-8') as f:
             songs = json.load(f)
     except FileNotFoundError:
         print(f"Error: Songs file not found at {SONGS_FILE_PATH}")
@@ -56,9 +65,13 @@ def import_songs(token):
             continue
 
         try:
-            response = requests.post(CREATE_SONG_ENDPOINT, headers=headers, json=payload)
+            with metrics.time("http_post"):
+                response = requests.post(CREATE_SONG_ENDPOINT, headers=headers, json=payload)
+            metrics.count("http_post_bytes_sent", len(response.request.body or b""))
+            metrics.count("http_post_bytes_received", len(response.content))
             if response.status_code == 201:
-                print(f"({i+1}/{len(songs)}) Successfully imported '{payload['title']}' by {payload['artist']}'.")
+                if not quiet:
+                    print(f"({i+1}/{len(songs)}) Successfully imported '{payload['title']}' by {payload['artist']}'.")
                 success_count += 1
             else:
                 print(f"({i+1}/{len(songs)}) Failed to import '{payload['title']}'. Status: {response.status_code}, Response: {response.text}")
@@ -66,13 +79,24 @@ def import_songs(token):
         except requests.exceptions.RequestException as e:
             print(f"({i+1}/{len(songs)}) An error occurred while importing '{payload['title']}': {e}")
             failure_count += 1
+        if quiet and (i + 1) % PROGRESS_EVERY == 0:
+            print(f"Progress: {i + 1}/{len(songs)} songs, {success_count} imported")
 
     print("\nImport process finished.")
     print(f"Successfully imported: {success_count}")
     print(f"Failed to import: {failure_count}")
+    metrics.print_summary()
 
 def main():
     """Main function to run the import script."""
+    parser = argparse.ArgumentParser(description="Import the PDF songs into a local ChoirApp backend")
+    parser.add_argument("--quiet", action="store_true",
+                        help=f"No per-song lines; progress every {PROGRESS_EVERY} songs (failures are still shown)")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write stage timings and bytes at the end (.prom: Prometheus text, else JSON)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args, "import_to_backend_pdf")
     print("=== PDF Songs Backend Import ===")
     
     if not JWT_TOKEN or JWT_TOKEN == "PASTE_YOUR_JWT_TOKEN_HERE":
@@ -86,7 +110,11 @@ def main():
         print("5. Copy the token part from the 'Authorization: Bearer ey...' header.")
         return
 
-    import_songs(JWT_TOKEN)
+    metrics = Metrics("import_to_backend_pdf")
+    import_songs(JWT_TOKEN, quiet=args.quiet, metrics=metrics)
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"Metrics saved to {args.metrics}")
 
 if __name__ == "__main__":
     main()
@@ -16,67 +16,105 @@ Usage:
 
 Options:
     --token TOKEN   JWT token for authentication (required)
+    --api-url URL   Backend API base URL (default production; point at songtools.mockbackend to test)
+    --input PATH    Songs file, JSON array or JSON Lines (default pdf_songs_full.json)
     --dry-run       Show what would be imported without actually doing it
     --limit N       Import only N songs (useful for testing)
     --start-from N  Start importing from song number N (useful for resuming)
+    --workers N     Maximum requests in flight (default 8, reduced automatically on 429/5xx)
+    --no-journal    Do not read or write the import journal
+    --no-dedup      Send exact duplicates too (normally dropped before any request)
+    --quiet         No per-song lines; progress every 100 songs (failures are still shown)
+    --metrics PATH  Write stage timings, retries and bytes at the end (.prom: Prometheus text, else JSON)
+    --profile       Sample stacks during the run and write profile_import_pdf.collapsed for a flame graph
+                    (--profile cprofile for a deterministic .pstats profile of the main thread)
+
+Every song sent is recorded in import_journal.sqlite (payload hash, status,
+songId), so re-running after an interruption skips songs already imported
+without a request and sends the ones that failed with a 4xx again. Songs whose
+earlier request got no clear answer may exist already: they are looked up by
+title and artist first and only sent when not found (listed for checking by
+hand if the lookup fails too).
 """
 
 import requests
-import json
 import os
 import sys
 import argparse
 import time
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, Dict, Any, List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from songtools.bulkimport import (AdaptiveThrottle, bounded_map, find_song, outcome_unknown, request_not_sent,
+                                  send_with_backoff)
+from songtools.chordpro import extract_key_from_chordpro
+from songtools.dedup import Deduplicator
+from songtools.httpclient import create_session
+from songtools.importjournal import EXISTS, FAILED, IMPORTED, SENT, ImportJournal, payload_hash
+from songtools.jsonl import iter_records
+from songtools.metrics import Metrics
+from songtools.profiling import add_profile_arguments, start_profiling
 
 # --- PRODUCTION CONFIGURATION ---
 PRODUCTION_API_URL = "https://choirapp-backend-b7evgyahfthjf3aa.centralus-01.azurewebsites.net/api"
-CREATE_SONG_ENDPOINT = f"{PRODUCTION_API_URL}/songs"
 SONGS_FILE_PATH = os.path.join(os.path.dirname(__file__), 'pdf_songs_full.json')
+JOURNAL_FILE_PATH = os.path.join(os.path.dirname(__file__), 'import_journal.sqlite')
 
 # Production JWT Token will be provided via command line argument
 
 # Request configuration
 REQUEST_TIMEOUT = 30  # seconds
-DELAY_BETWEEN_REQUESTS = 1  # seconds to avoid overwhelming the server
+MAX_IN_FLIGHT = 8  # concurrent requests; halved once per window of 429/5xx answers, regrown on success
+MAX_RETRIES = 5  # per song, for 429 answers and connections that never opened (a POST is not resent otherwise)
+PROGRESS_EVERY = 100  # songs between progress lines in quiet mode
 
 class PDFSongImporter:
     """Handles the import of PDF songs to the production backend."""
     
-    def __init__(self, jwt_token: str, api_url: str):
+    def __init__(self, jwt_token: str, api_url: str, workers: int = MAX_IN_FLIGHT,
+                 journal: Optional[ImportJournal] = None, metrics: Optional[Metrics] = None,
+                 quiet: bool = False):
         self.jwt_token = jwt_token
         self.api_url = api_url
+        self.create_song_endpoint = f"{api_url.rstrip('/')}/songs"
         self.headers = {
             "Authorization": f"Bearer {jwt_token}",
             "Content-Type": "application/json",
             "User-Agent": "ChoirApp-PDF-Importer/1.0"
         }
+        self.workers = max(1, workers)
+        # One keep-alive connection per worker, shared by every request
+        self.session = create_session(self.headers, pool_size=self.workers)
+        self.throttle = AdaptiveThrottle(self.workers)
+        self.journal = journal
+        # Stage timings (read, convert, journal, http_post) plus retries and bytes
+        self.metrics = metrics or Metrics("import_pdf")
+        self.quiet = quiet
         self.stats = {
             "total": 0,
             "success": 0,
             "failed": 0,
-            "skipped": 0
+            "skipped": 0,
+            "journaled": 0,
+            "duplicates": 0
         }
+        # Titles whose POST got no clear answer (5xx, read timeout); they may exist on the backend
+        self.unconfirmed: List[str] = []
     
-    def load_songs(self) -> List[Dict[str, Any]]:
-        """Load songs from the JSON file."""
-        print(f"📖 Loading songs from {SONGS_FILE_PATH}...")
+    def load_songs(self, path: str = SONGS_FILE_PATH) -> Iterator[Dict[str, Any]]:
+        """Stream songs from a JSON array or JSONL file, one at a time."""
+        print(f"📖 Streaming songs from {path}...")
         
-        try:
-            with open(SONGS_FILE_PATH, 'r', encoding='utf-8') as f:
-                songs = json.load(f)
-            
-            print(f"✅ Successfully loaded {len(songs)} songs")
-            return songs
-            
-        except FileNotFoundError:
-            print(f"❌ Error: Songs file not found at {SONGS_FILE_PATH}")
-            sys.exit(1)
-        except json.JSONDecodeError as e:
-            print(f"❌ Error: Could not decode JSON from {SONGS_FILE_PATH}: {e}")
+        if not os.path.exists(path):
+            print(f"❌ Error: Songs file not found at {path}")
             sys.exit(1)
-        except Exception as e:
-            print(f"❌ Error loading songs: {e}")
+        
+        try:
+            yield from iter_records(path)
+        except ValueError as e:
+            print(f"❌ Error: Could not decode JSON from {path}: {e}")
             sys.exit(1)
     
     def convert_song_format(self, song: Dict[str, Any]) -> Dict[str, Any]:
@@ -95,29 +133,7 @@ class PDFSongImporter:
     
     def extract_key_from_chordpro(self, chordpro: str) -> str:
         """Try to extract the musical key from ChordPro content."""
-        if not chordpro:
-            return ""
-        
-        # Look for common key patterns in the first few lines
-        lines = chordpro.split('\n')[:10]  # Check first 10 lines
-        
-        # Common key patterns (both Spanish and international notation)
-        key_patterns = [
-            # Spanish notation
-            r'\b(DO|RE|MI|FA|SOL|LA|SI)[#b]?m?\b',
-            # International notation  
-            r'\b[A-G][#b]?m?\b'
-        ]
-        
-        import re
-        for line in lines:
-            for pattern in key_patterns:
-                matches = re.findall(pattern, line, re.IGNORECASE)
-                if matches:
-                    # Return the first chord found (likely the key)
-                    return matches[0]
-        
-        return ""
+        return extract_key_from_chordpro(chordpro)
     
     def validate_song(self, song: Dict[str, Any]) -> tuple[bool, str]:
         """Validate that a song has required fields."""
@@ -137,8 +153,12 @@ class PDFSongImporter:
         
         return True, "Valid"
     
-    def import_song(self, song: Dict[str, Any], dry_run: bool = False) -> tuple[bool, str]:
-        """Import a single song to the backend."""
+    def import_song(self, song: Dict[str, Any], dry_run: bool = False) -> tuple[Optional[bool], str]:
+        """
+        Import a single song to the backend. Returns (True, message) when it
+        was imported, (False, message) when it failed, and (None, message)
+        when the journal shows it imported already.
+        """
         
         # Validate song first
         is_valid, validation_msg = self.validate_song(song)
@@ -146,23 +166,55 @@ class PDFSongImporter:
             return False, f"Validation failed: {validation_msg}"
         
         # Convert to API format
-        payload = self.convert_song_format(song)
+        with self.metrics.time("convert"):
+            payload = self.convert_song_format(song)
+        
+        key = payload_hash(payload)
+        entry = None
+        if self.journal:
+            with self.metrics.time("journal"):
+                entry = self.journal.get(key)
+        if self.journal and self.journal.is_done(entry):
+            return None, f"Already {entry['status']} (journal): '{payload['title']}'"
         
         if dry_run:
             return True, f"DRY RUN: Would import '{payload['title']}' by {payload['artist']}"
         
+        if self.journal and self.journal.needs_check(entry):
+            # An earlier request may have created it; the backend would accept a second copy
+            try:
+                song_id = find_song(self.session, self.api_url, payload["title"], payload["artist"],
+                                    self.throttle, metrics=self.metrics, content=payload["content"],
+                                    timeout=REQUEST_TIMEOUT)
+            except (requests.exceptions.RequestException, ValueError) as e:
+                return False, self.unconfirmed_outcome(key, payload["title"], f"Lookup failed: {e}")
+            if song_id:
+                with self.metrics.time("journal"):
+                    self.journal.finish(key, IMPORTED, song_id=song_id,
+                                        message="Found by lookup after an unconfirmed send")
+                return True, f"Found '{payload['title']}' on the backend from an earlier run, not sent again"
+        
+        if self.journal:
+            with self.metrics.time("journal"):
+                self.journal.begin(key, payload["title"])
+        
         try:
-            response = requests.post(
-                CREATE_SONG_ENDPOINT,
-                headers=self.headers,
+            response = send_with_backoff(
+                self.session, "POST", self.create_song_endpoint, self.throttle,
+                max_retries=MAX_RETRIES,
+                metrics=self.metrics,
                 json=payload,
                 timeout=REQUEST_TIMEOUT
             )
             
             if response.status_code == 201:
+                self.journal_outcome(key, IMPORTED, response)
                 return True, f"Successfully imported '{payload['title']}'"
             elif response.status_code == 409:
+                self.journal_outcome(key, EXISTS, response)
                 return False, f"Song already exists: '{payload['title']}'"
+            elif outcome_unknown(response):
+                return False, self.unconfirmed_outcome(key, payload["title"], f"HTTP {response.status_code}", response)
             else:
                 error_msg = f"HTTP {response.status_code}"
                 try:
@@ -172,60 +224,130 @@ class PDFSongImporter:
                 except:
                     error_msg += f": {response.text[:200]}"
                 
+                self.journal_outcome(key, FAILED, response, error_msg)
                 return False, error_msg
                 
-        except requests.exceptions.Timeout:
-            return False, "Request timeout"
-        except requests.exceptions.ConnectionError:
-            return False, "Connection error"
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+            reason = "Request timeout" if isinstance(e, requests.exceptions.Timeout) else "Connection error"
+            if not request_not_sent(e):
+                return False, self.unconfirmed_outcome(key, payload["title"], reason)
+            self.journal_outcome(key, FAILED, message=reason)
+            return False, reason
         except requests.exceptions.RequestException as e:
+            self.journal_outcome(key, FAILED, message=str(e))
             return False, f"Request error: {str(e)}"
         except Exception as e:
+            self.journal_outcome(key, FAILED, message=str(e))
             return False, f"Unexpected error: {str(e)}"
     
-    def import_songs(self, songs: List[Dict[str, Any]], dry_run: bool = False, 
-                    limit: Optional[int] = None, start_from: int = 0) -> None:
-        """Import multiple songs with progress tracking."""
+    def unconfirmed_outcome(self, key: str, title: str, reason: str,
+                            response: Optional[requests.Response] = None) -> str:
+        """
+        Record a POST that may or may not have created the song (5xx, read
+        timeout, dropped connection). It is not resent: it is listed at the
+        end and stays "sent" in the journal, so the next run looks it up
+        before sending it again. Returns the message.
+        """
+        self.unconfirmed.append(title)
+        self.journal_outcome(key, SENT, response, f"{reason}; outcome unknown")
+        return f"{reason} - no confirmation, it may have been created; the next run looks it up first"
+    
+    def journal_outcome(self, key: str, status: str, response: Optional[requests.Response] = None,
+                        message: Optional[str] = None) -> None:
+        """Record how a sent song ended, with the songId the backend returned."""
+        if not self.journal:
+            return
+        with self.metrics.time("journal"):
+            self._journal_outcome(key, status, response, message)
+    
+    def _journal_outcome(self, key: str, status: str, response: Optional[requests.Response],
+                         message: Optional[str]) -> None:
+        song_id = None
+        if response is not None and response.status_code == 201:
+            try:
+                song_id = response.json().get("songId")
+            except ValueError:
+                pass
+        self.journal.finish(key, status, song_id=song_id,
+                            http_status=response.status_code if response is not None else None,
+                            message=message)
+    
+    def import_songs(self, songs: Iterable[Dict[str, Any]], dry_run: bool = False, 
+                    limit: Optional[int] = None, start_from: int = 0, dedup: bool = True) -> None:
+        """Import songs as a stream: read, dedup, journal check and send, with bounded read-ahead."""
         
-        # Apply start_from and limit
+        # Apply start_from and limit lazily; songs are never all in memory
         if start_from > 0:
-            songs = songs[start_from:]
             print(f"📍 Starting from song #{start_from + 1}")
         
         if limit:
-            songs = songs[:limit]
             print(f"🔢 Limiting to {limit} songs")
         
-        total_songs = len(songs)
-        self.stats["total"] = total_songs
+        # "read" is the time spent waiting on the songs file between requests
+        indexed = islice(enumerate(self.metrics.timed_iter("read", songs)), start_from,
+                         start_from + limit if limit else None)
+        
+        # Exact duplicates (same normalized title, artist and body) never reach the network
+        deduplicator = Deduplicator() if dedup else None
         
-        print(f"\n🚀 {'DRY RUN: ' if dry_run else ''}Starting import of {total_songs} songs...")
-        print(f"📡 Target: {PRODUCTION_API_URL}")
+        def pending():
+            for song_index, song in indexed:
+                self.stats["total"] += 1
+                if deduplicator and deduplicator.is_duplicate(song):
+                    continue
+                yield song_index, song
+        
+        print(f"\n🚀 {'DRY RUN: ' if dry_run else ''}Starting import...")
+        print(f"📡 Target: {self.api_url}")
+        print(f"🔀 Up to {self.workers} requests in flight")
         print("-" * 80)
         
-        for i, song in enumerate(songs, 1):
-            song_title = song.get("title", "Unknown")[:50]
-            
-            print(f"[{i:3d}/{total_songs}] Processing: {song_title}...")
-            
-            success, message = self.import_song(song, dry_run)
-            
-            if success:
-                self.stats["success"] += 1
-                print(f"    ✅ {message}")
-            else:
-                self.stats["failed"] += 1
-                print(f"    ❌ {message}")
-            
-            # Add delay between requests to avoid overwhelming the server
-            if not dry_run and i < total_songs:
-                time.sleep(DELAY_BETWEEN_REQUESTS)
-            
-            # Progress update every 10 songs
-            if i % 10 == 0:
-                success_rate = (self.stats["success"] / i) * 100
-                print(f"    📊 Progress: {i}/{total_songs} ({success_rate:.1f}% success rate)")
+        started = time.monotonic()
+        # Workers only send requests; results and stats are handled here, in completion order.
+        # Only a window of songs is read ahead of the requests in flight.
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        window = 2 * self.workers
+        i = 0
+        try:
+            for (song_index, song), future in bounded_map(
+                    pool, lambda item: self.import_song(item[1], dry_run), pending(), window):
+                success, message = future.result()
+                # Songs the journal shows as done were skipped without a request
+                if success is None:
+                    self.stats["journaled"] += 1
+                    continue
+                i += 1
+                song_title = song.get("title", "Unknown")[:50]
+                
+                # Quiet mode keeps only the failures
+                if not self.quiet or not success:
+                    print(f"[{i:3d}] #{song_index + 1} {song_title}")
+                if success:
+                    self.stats["success"] += 1
+                    if not self.quiet:
+                        print(f"    ✅ {message}")
+                else:
+                    self.stats["failed"] += 1
+                    print(f"    ❌ {message}")
+                
+                # Progress update every 10 songs (PROGRESS_EVERY when quiet)
+                if i % (PROGRESS_EVERY if self.quiet else 10) == 0:
+                    success_rate = (self.stats["success"] / i) * 100
+                    print(f"    📊 Progress: {i} sent ({success_rate:.1f}% success rate)")
+        finally:
+            # On Ctrl+C, drop queued songs; requests already in flight finish first
+            pool.shutdown(wait=True, cancel_futures=True)
+        
+        if deduplicator:
+            self.stats["duplicates"] = len(deduplicator.dropped)
+            print(f"\n🧹 Dedup: {deduplicator.report()}")
+        if self.stats["journaled"]:
+            print(f"📒 {self.stats['journaled']} songs already imported according to the journal")
         
+        elapsed = time.monotonic() - started
+        print(f"\n⏱️  {elapsed:.1f}s elapsed, {self.throttle.throttled} throttled responses, "
+              f"final concurrency {self.throttle.limit}")
+        self.metrics.print_summary("⏱️  Stage timings")
         self.print_final_stats(dry_run)
     
     def print_final_stats(self, dry_run: bool = False) -> None:
@@ -237,16 +359,24 @@ class PDFSongImporter:
         print(f"✅ Successfully imported: {self.stats['success']}")
         print(f"❌ Failed to import: {self.stats['failed']}")
         print(f"⏭️  Skipped: {self.stats['skipped']}")
+        print(f"🧹 Duplicates dropped before sending: {self.stats['duplicates']}")
+        print(f"📒 Already imported (journal): {self.stats['journaled']}")
         
         if self.stats["total"] > 0:
             success_rate = (self.stats["success"] / self.stats["total"]) * 100
             print(f"📈 Success rate: {success_rate:.1f}%")
         
+        if self.unconfirmed:
+            print(f"\n❓ {len(self.unconfirmed)} of the failed songs got no clear answer and may have been "
+                  f"created; the next run looks them up before sending them again:")
+            for title in self.unconfirmed:
+                print(f"   - {title}")
+        
         if self.stats["failed"] > 0:
             print(f"\n⚠️  {self.stats['failed']} songs failed to import.")
             if not dry_run:
                 print("   Check the error messages above for details.")
-                print("   You can resume from a specific song using --start-from N")
+                print("   Run the same command again to retry only the failed songs")
 
 def parse_arguments() -> argparse.Namespace:
     """Parse command line arguments."""
@@ -283,9 +413,54 @@ Examples:
         "--start-from",
         type=int,
         default=0,
-        help="Start importing from song number N (0-based, useful for resuming)"
+        help="Start importing from song number N (0-based)"
+    )
+    
+    parser.add_argument(
+        "--api-url",
+        default=PRODUCTION_API_URL,
+        help="Backend API base URL (default: production)"
+    )
+    
+    parser.add_argument(
+        "--input",
+        default=SONGS_FILE_PATH,
+        help="Songs file to import: a JSON array or JSON Lines (.jsonl), read as a stream "
+             f"(default {os.path.basename(SONGS_FILE_PATH)})"
+    )
+    
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Send exact duplicate songs too instead of dropping them before import"
+    )
+    
+    parser.add_argument(
+        "--no-journal",
+        action="store_true",
+        help=f"Do not read or write {os.path.basename(JOURNAL_FILE_PATH)} (every song is sent)"
+    )
+    
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=MAX_IN_FLIGHT,
+        help=f"Maximum requests in flight (default {MAX_IN_FLIGHT}, reduced automatically on 429/5xx)"
+    )
+    
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help=f"No per-song output, progress every {PROGRESS_EVERY} songs (failures are still shown)"
+    )
+    
+    parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="Write stage timings, retries and bytes at the end (.prom: Prometheus text, else JSON)"
     )
     
+    add_profile_arguments(parser)
     return parser.parse_args()
 
 def validate_token(token: str) -> bool:
@@ -312,6 +487,7 @@ def main():
     
     # Parse command line arguments
     args = parse_arguments()
+    start_profiling(args, "import_pdf")
     
     # Validate JWT token
     if not validate_token(args.token):
@@ -320,14 +496,14 @@ def main():
         sys.exit(1)
     
     # Validate file exists
-    if not os.path.exists(SONGS_FILE_PATH):
-        print(f"❌ Error: Songs file not found at {SONGS_FILE_PATH}")
+    if not os.path.exists(args.input):
+        print(f"❌ Error: Songs file not found at {args.input}")
         print("   Make sure you have run the PDF scraper first")
         sys.exit(1)
     
     # Show configuration
-    print(f"📁 Songs file: {SONGS_FILE_PATH}")
-    print(f"🌐 Production API: {PRODUCTION_API_URL}")
+    print(f"📁 Songs file: {args.input}")
+    print(f"🌐 API: {args.api_url}")
     print(f"🔑 Token: {args.token[:20]}...{args.token[-10:]}")
     
     if args.dry_run:
@@ -351,16 +527,24 @@ def main():
     
     try:
         # Create importer and load songs
-        importer = PDFSongImporter(args.token, PRODUCTION_API_URL)
-        songs = importer.load_songs()
+        journal = None if args.no_journal else ImportJournal(JOURNAL_FILE_PATH, f"{args.api_url.rstrip('/')}/songs")
+        if journal:
+            print(f"📒 Journal {JOURNAL_FILE_PATH}: {journal.summary() or 'empty'}")
+        importer = PDFSongImporter(args.token, args.api_url, workers=args.workers, journal=journal,
+                                   quiet=args.quiet)
+        songs = importer.load_songs(args.input)
         
         # Start import
         importer.import_songs(
             songs=songs,
             dry_run=args.dry_run,
             limit=args.limit,
-            start_from=args.start_from
+            start_from=args.start_from,
+            dedup=not args.no_dedup
         )
+        if args.metrics:
+            importer.metrics.write(args.metrics)
+            print(f"📈 Metrics saved to {args.metrics}")
         
     except KeyboardInterrupt:
         print("\n\n⏹️  Import interrupted by user")
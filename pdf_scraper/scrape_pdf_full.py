@@ -1,135 +1,236 @@
 import pdfplumber
-import json
+import argparse
+import hashlib
 import re
 import os
-from typing import List, Dict, Optional
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from songtools import chordpro, chords, merge
+from songtools.jsonl import JsonArrayWriter
+from songtools.metrics import Metrics
+from songtools.pagecache import PageCache, file_hash, page_content_hash
+from songtools.pdflayout import extract_layout_text, mark_separated_lines
+from songtools.profiling import add_profile_arguments, start_profiling
+from songtools.rawstore import RawStore
 
 # Configuration
 PDF_FILE_PATH = r"c:\ChoirAppV2\CANCIONERO JATARI FINAL.pdf"
 OUTPUT_FILE = "pdf_songs_full.json"
+DEBUG_FILE = "pdf_debug_full.txt"
 START_PAGE = 40  # Songs start from page 40
+# Page extraction is CPU-bound, so it is spread over worker processes
+EXTRACT_WORKERS = os.cpu_count() or 1
+CHUNKS_PER_WORKER = 4  # smaller chunks keep workers busy when some pages are slow
+# Extracted page text and parsed songs are reused from here on later runs
+CACHE_FILE = "pdf_page_cache.sqlite"
+# Raw song text is kept here, compressed, and referenced from each record by "raw_ref"
+RAW_STORE_DIR = "raw_store"
+# Bump when parsing changes in a way the code fingerprint below cannot see
+PARSER_VERSION = "1"
+# Bump when extracted page text changes shape, so cached page text is extracted again
+# (2: blank lines where the page has vertical space or a title-styled line)
+TEXT_VERSION = "2"
+# Per-stage timings (extract, parse, convert, write) for the run; see --metrics
+metrics = Metrics("scrape_pdf_full")
+# --quiet drops the per-song lines and reports progress every PROGRESS_EVERY songs
+quiet = False
+PROGRESS_EVERY = 100
+
+def log(message: str) -> None:
+    """Per-song output, dropped in quiet mode."""
+    if not quiet:
+        print(message)
+
+def parser_version() -> str:
+    """PARSER_VERSION plus a fingerprint of the parsing code, so edits invalidate cached parses."""
+    digest = hashlib.sha256(PARSER_VERSION.encode())
+    for path in (__file__, chordpro.__file__, chords.__file__, merge.__file__):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+def extract_page_text(page, layout: bool = False) -> str:
+    """
+    Plain extract_text(), or text with chords merged by glyph position when
+    `layout` is set; either way with a blank line where the page has vertical
+    space or a title-styled line.
+    """
+    if layout:
+        return extract_layout_text(page)
+    return mark_separated_lines(page.extract_text() or "", page.chars)
+
+def iter_extracted_pages(pdf_path: str, page_numbers: Iterable[int], layout: bool = False) -> Iterator[Tuple[int, str]]:
+    """Extract (page_number, text) for the given 1-based page numbers, opening the PDF once."""
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_num in page_numbers:
+            yield page_num, extract_page_text(pdf.pages[page_num - 1], layout)
+
+def extract_pages(pdf_path: str, page_numbers: List[int], layout: bool = False) -> List[Tuple[int, str]]:
+    """Worker entry point: extract a chunk of pages in one process."""
+    return list(iter_extracted_pages(pdf_path, page_numbers, layout))
+
+def page_chunks(page_numbers: List[int], chunk_count: int) -> List[List[int]]:
+    """Split page_numbers into up to chunk_count contiguous chunks."""
+    size = max(1, -(-len(page_numbers) // max(1, chunk_count)))
+    return [page_numbers[start:start + size] for start in range(0, len(page_numbers), size)]
 
-def extract_text_from_pdf(pdf_path: str) -> str:
-    """Extract all text from the PDF file starting from START_PAGE."""
+def extract_page_stream(pdf_path: str, page_numbers: List[int], workers: int = 1,
+                        layout: bool = False) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) for page_numbers in order, serially or from worker processes."""
+    if workers <= 1 or len(page_numbers) < 2:
+        yield from iter_extracted_pages(pdf_path, page_numbers, layout)
+        return
+    
+    # Each worker opens the PDF itself and extracts a contiguous chunk of pages.
+    # Only a few chunks are in flight at once, and they are yielded in page order.
+    chunks = page_chunks(page_numbers, workers * CHUNKS_PER_WORKER)
+    print(f"Extracting {len(chunks)} chunks with {workers} worker processes...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(extract_pages, pdf_path, chunk, layout))
+            if len(pending) > workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def pdf_page_hashes(pdf_path: str, cache: PageCache) -> List[Tuple[int, str]]:
+    """(page_number, content_hash) for every page from START_PAGE on."""
+    doc_hash = file_hash(pdf_path)
+    pages = cache.document_pages(doc_hash, START_PAGE)
+    if pages is not None:
+        print("PDF file unchanged since the last run, reusing its page hashes")
+        return pages
+    with pdfplumber.open(pdf_path) as pdf:
+        memo = {}  # fonts and images shared between pages are hashed once
+        pages = [(page_num, page_content_hash(pdf.pages[page_num - 1], memo))
+                 for page_num in range(START_PAGE, len(pdf.pages) + 1)]
+    cache.save_document(doc_hash, START_PAGE, pages)
+    return pages
+
+def iter_pdf_pages(pdf_path: str, workers: int = 1, cache: Optional[PageCache] = None,
+                   layout: bool = False) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for every page from START_PAGE on, in page order.
+    With a cache, only pages whose content, resources or page boxes changed are extracted again.
+    """
     print(f"Extracting text from PDF: {pdf_path}")
     print(f"Starting from page {START_PAGE}...")
     
     if not os.path.exists(pdf_path):
         raise FileNotFoundError(f"PDF file not found: {pdf_path}")
     
-    full_text = ""
-    
-    try:
+    if cache is None:
         with pdfplumber.open(pdf_path) as pdf:
             total_pages = len(pdf.pages)
-            print(f"PDF has {total_pages} pages total")
-            
-            pages_to_process = total_pages - START_PAGE + 1
-            print(f"Will process {pages_to_process} pages (from page {START_PAGE} to {total_pages})")
-            
-            pages_processed = 0
-            for page_num, page in enumerate(pdf.pages, 1):
-                if page_num < START_PAGE:
-                    continue
-                    
-                print(f"Processing page {page_num}/{total_pages}...")
-                page_text = page.extract_text()
-                if page_text:
-                    full_text += f"\n--- PAGE {page_num} ---\n"
-                    full_text += page_text + "\n"
-                    pages_processed += 1
-                    
-                # Progress indicator every 10 pages
-                if pages_processed % 10 == 0:
-                    print(f"  ✓ Processed {pages_processed} pages so far...")
-                    
-    except Exception as e:
-        print(f"Error extracting PDF text: {e}")
-        raise
-    
-    print(f"✅ Extracted {len(full_text)} characters from {pages_processed} pages")
-    return full_text
+        print(f"PDF has {total_pages} pages total")
+        print(f"Will process {total_pages - START_PAGE + 1} pages (from page {START_PAGE} to {total_pages})")
+        yield from extract_page_stream(pdf_path, list(range(START_PAGE, total_pages + 1)), workers, layout)
+        return
+    
+    # Both extraction modes share page hashes but keep separate cached text
+    pages = [(page_num, f"{page_hash}:{TEXT_VERSION}" + (":layout" if layout else ""))
+             for page_num, page_hash in pdf_page_hashes(pdf_path, cache)]
+    missing = [page_num for page_num, page_hash in pages if not cache.has_text(page_hash)]
+    print(f"{len(pages) - len(missing)} pages unchanged, extracting {len(missing)} new or changed pages")
+    extracted = extract_page_stream(pdf_path, missing, workers, layout)
+    missing = set(missing)
+    for page_num, page_hash in pages:
+        if page_num in missing:
+            _, text = next(extracted)
+            cache.put_text(page_hash, text)
+            cache.stats["text_misses"] += 1
+        else:
+            text = cache.get_text(page_hash)
+            cache.stats["text_hits"] += 1
+        yield page_num, text
 
-def identify_song_boundaries(text: str) -> List[str]:
+TITLE_PARENTHETICAL_RE = re.compile(r'\([^)]*\)')
+MIN_SONG_CHARS = 50  # shorter chunks are page furniture, not songs
+# Upper-case section labels inside a song, never titles
+SECTION_LABELS = {'CORO', 'ESTRIBILLO', 'ESTROFA', 'VERSO', 'PUENTE', 'FINAL', 'INTRO', 'BIS'}
+
+def is_title_line(lines: List[str], j: int) -> bool:
     """
-    Split the text into individual songs.
-    Based on our successful test, we'll use page-based separation as primary strategy.
+    A song title in the songbook: a short, mostly upper-case line at the top
+    of the page or after a blank line (extraction puts one where the page has
+    vertical space or a line set larger or bolder), that is not a chord line
+    or a "PUNTEO:"-style label and has lyrics (a line over 10 characters)
+    within the next three lines. Upper case alone is no signal: choruses are often
+    written in capitals. Parenthesised credits like "(J.P. Culebras)" are
+    ignored when measuring case.
     """
-    
-    # Save raw text for debugging
-    with open('pdf_debug_full.txt', 'w', encoding='utf-8') as f:
-        f.write(text)
-    print("Debug text saved to pdf_debug_full.txt")
-    
-    songs_raw = []
-    
-    # Primary strategy: Split by page boundaries (this worked well in our test)
-    pages = text.split('--- PAGE')
-    
-    for page in pages:
-        if not page.strip():
-            continue
-            
-        # Clean up page content
-        page_content = page.strip()
-        
-        # Remove page number line
-        lines = page_content.split('\n')
-        if lines and lines[0].strip().endswith('---'):
-            lines = lines[1:]
-        
-        page_text = '\n'.join(lines).strip()
+    if j > 0 and lines[j - 1].strip():
+        return False
+    line = lines[j].strip()
+    if not (3 < len(line) < 80) or line.isdigit() or line.startswith('---') or line[-1] in ',;.:':
+        return False
+    if line.upper().rstrip(':').strip() in SECTION_LABELS or chordpro.is_section_label(line):
+        return False
+    letters = [c for c in TITLE_PARENTHETICAL_RE.sub('', line) if c.isalpha()]
+    if len(letters) < 3 or sum(c.isupper() for c in letters) < 0.8 * len(letters):
+        return False
+    if has_chord_patterns(line):
+        return False
+    return any(len(lines[k].strip()) > 10 for k in range(j + 1, min(j + 4, len(lines))))
+
+def identify_song_boundaries(pages: Iterable[Tuple[int, str]], debug_file: Optional[TextIO] = None) -> Iterator[str]:
+    """
+    Split the page stream into individual songs in a single pass.
+    
+    A small state machine reads each line once. Its events are:
+    - page break: the current song ends (songs do not carry over pages);
+    - title line after lyrics on the same page: the current song ends and a
+      new one starts at the title (multi-song pages);
+    - any other line: it is added to the current song.
+    Each song is yielded exactly once, so multi-song pages no longer produce
+    the whole page plus its fragments. Page text is streamed to `debug_file`
+    when one is given.
+    """
+    current: List[str] = []
+    song_count = 0
+    title_splits = 0
+    
+    def flush() -> Optional[str]:
+        song = '\n'.join(current).strip()
+        current.clear()
+        return song if len(song) > MIN_SONG_CHARS else None
+    
+    for page_num, text in pages:
+        if debug_file:
+            debug_file.write(f"\n--- PAGE {page_num} ---\n{text}\n")
         
-        # Check if this page has substantial content (likely a song)
-        # Lowered threshold since some songs might be shorter
-        if page_text and len(page_text) > 50:
-            songs_raw.append(page_text)
-    
-    print(f"Strategy 1 - Found {len(songs_raw)} potential songs by page separation")
-    
-    # Secondary strategy: If we have pages with multiple songs, try to split them
-    additional_songs = []
-    for i, song in enumerate(songs_raw):
-        # Look for multiple song titles in a single page
-        lines = song.split('\n')
-        potential_titles = []
+        # Page break event
+        song = flush()
+        if song:
+            song_count += 1
+            yield song
         
+        lines = text.strip().split('\n')
+        has_lyrics = False
         for j, line in enumerate(lines):
-            line = line.strip()
-            # Look for lines that could be song titles (short, meaningful, often in caps)
-            if (len(line) > 3 and len(line) < 80 and 
-                not has_chord_patterns(line) and
-                not line.isdigit() and
-                not line.startswith('---')):
-                
-                # Check if this could be a title by looking at surrounding context
-                if j < len(lines) - 3:  # Make sure there's content after
-                    next_lines = lines[j+1:j+4]
-                    has_content_after = any(len(l.strip()) > 10 for l in next_lines)
-                    if has_content_after:
-                        potential_titles.append((j, line))
-        
-        # If we found multiple potential titles, try to split
-        if len(potential_titles) > 1:
-            print(f"  Found {len(potential_titles)} potential songs in page {i+1}")
-            
-            for k, (line_idx, title) in enumerate(potential_titles):
-                # Get content from this title to the next title (or end)
-                start_idx = line_idx
-                end_idx = potential_titles[k+1][0] if k+1 < len(potential_titles) else len(lines)
-                
-                song_lines = lines[start_idx:end_idx]
-                song_content = '\n'.join(song_lines).strip()
-                
-                if len(song_content) > 100:  # Minimum content threshold
-                    additional_songs.append(song_content)
-    
-    if additional_songs:
-        print(f"Strategy 2 - Found {len(additional_songs)} additional songs by multi-song page splitting")
-        songs_raw.extend(additional_songs)
-    
-    print(f"Total songs found: {len(songs_raw)}")
-    return songs_raw
+            # Title event
+            if has_lyrics and is_title_line(lines, j):
+                song = flush()
+                if song:
+                    song_count += 1
+                    title_splits += 1
+                    yield song
+                has_lyrics = False
+            elif line.strip():
+                has_lyrics = has_lyrics or bool(current)
+            current.append(line)
+    
+    song = flush()
+    if song:
+        song_count += 1
+        yield song
+    
+    print(f"Found {song_count} songs ({title_splits} split at a title inside a page)")
 
 def parse_song_content(raw_song: str, song_index: int) -> Optional[Dict]:
     """
@@ -141,7 +242,7 @@ def parse_song_content(raw_song: str, song_index: int) -> Optional[Dict]:
         return None
     
     if song_index % 10 == 0:  # Progress indicator
-        print(f"  Parsing song {song_index}...")
+        log(f"  Parsing song {song_index}...")
     
     # Try to identify the title (usually first meaningful line)
     title = None
@@ -180,7 +281,8 @@ def parse_song_content(raw_song: str, song_index: int) -> Optional[Dict]:
     song_content = '\n'.join(content_lines).strip()
     
     # Convert to ChordPro format (same logic as our successful test)
-    chordpro_content = to_chordpro_format(song_content)
+    with metrics.time("convert"):
+        chordpro_content = to_chordpro_format(song_content)
     
     # Skip songs that are too short (likely not actual songs)
     if len(chordpro_content.strip()) < 50:
@@ -191,202 +293,152 @@ def parse_song_content(raw_song: str, song_index: int) -> Optional[Dict]:
         "artist": "Cancionero Jatari",  # Default artist from PDF source
         "chordpro": chordpro_content,
         "tags": [],
-        "source": "PDF: CANCIONERO JATARI FINAL.pdf"
+        "source": "PDF: CANCIONERO JATARI FINAL.pdf",
+        # Converter input, so chordpro can be regenerated without the PDF (python -m songtools.reconvert);
+        # main() moves it into the raw store
+        "raw_text": song_content
     }
 
+def parse_song_cached(raw_song: str, song_index: int, cache: Optional[PageCache], version: str) -> Optional[Dict]:
+    """parse_song_content, reusing the stored result for the same raw text and parser version."""
+    if cache is None:
+        return parse_song_content(raw_song, song_index)
+    found, record = cache.get_parsed(raw_song, version)
+    if found:
+        return record
+    record = parse_song_content(raw_song, song_index)
+    # The "Song N" fallback title depends on position, not content, so it is not cached
+    if not (record and record["title"] == f"Song {song_index}"):
+        cache.put_parsed(raw_song, version, record)
+    return record
+
 def to_chordpro_format(text: str) -> str:
     """
-    Converts song text to ChordPro inline format.
-    This is the same logic that worked successfully in our test.
+    Converts song text to ChordPro inline format (PDF source profile).
     """
-    
-    if not text.strip():
-        return ""
-    
-    lines = text.split('\n')
-    result_lines = []
-    in_verse = False
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # Skip empty lines but preserve them for spacing
-        if not line:
-            if in_verse:
-                result_lines.append("{end_of_verse}")
-                in_verse = False
-            result_lines.append("")
-            i += 1
-            continue
-        
-        # Check if this line contains chord patterns
-        if has_chord_patterns(line):
-            # This is likely a chord line
-            if not in_verse:
-                result_lines.append("{start_of_verse}")
-                in_verse = True
-            
-            # Check if next line is lyrics (merge chord and lyric lines)
-            if i + 1 < len(lines) and lines[i + 1].strip() and not has_chord_patterns(lines[i + 1].strip()):
-                # Merge chord line with next lyric line
-                lyric_line = lines[i + 1].strip()
-                merged_line = merge_chords_lyrics(line, lyric_line)
-                result_lines.append(merged_line)
-                i += 2  # Skip both lines
-            else:
-                # Just chord line
-                chord_line = convert_chord_line(line)
-                result_lines.append(chord_line)
-                i += 1
-        else:
-            # This is likely a lyric line
-            if not in_verse:
-                result_lines.append("{start_of_verse}")
-                in_verse = True
-            
-            result_lines.append(line)
-            i += 1
-    
-    # Close final verse if needed
-    if in_verse:
-        result_lines.append("{end_of_verse}")
-    
-    return '\n'.join(result_lines)
+    return chordpro.to_chordpro_format(text, profile=chordpro.PDF)
 
 def has_chord_patterns(line: str) -> bool:
     """
-    Check if a line contains chord-like patterns.
-    Same logic as our successful test.
+    Check if a line is a chord line, using the shared chord lexicon.
     """
-    
-    # Common Spanish chord patterns
-    chord_patterns = [
-        r'\b[A-G][#b]?m?\b',  # Basic chords like Am, F#, Bb
-        r'\b(DO|RE|MI|FA|SOL|LA|SI)[#b]?m?\b',  # Spanish notation
-        r'\b(Dom|Rem|Mim|Fam|Solm|Lam|Sim)\b',  # Spanish minor chords
-        r'\b[A-G][#b]?(maj|min|sus|dim|aug)?\d?\b',  # Extended chords
-    ]
-    
-    chord_count = 0
-    for pattern in chord_patterns:
-        matches = re.findall(pattern, line, re.IGNORECASE)
-        chord_count += len(matches)
-    
-    # Consider it a chord line if it has 2+ chord patterns
-    return chord_count >= 2
+    return chordpro.has_chord_patterns(line)
 
 def merge_chords_lyrics(chords_line: str, lyric_line: str) -> str:
     """
     Merges a chords line and a lyric line into ChordPro inline format.
-    Same logic as our successful test.
     """
-    
-    # Simple approach: find chord positions and insert them into lyrics
-    result = lyric_line
-    
-    # Find all chord patterns in the chord line
-    chord_patterns = [
-        r'\b([A-G][#b]?m?)\b',
-        r'\b(DO|RE|MI|FA|SOL|LA|SI)([#b]?m?)\b',
-    ]
-    
-    chords_found = []
-    for pattern in chord_patterns:
-        for match in re.finditer(pattern, chords_line, re.IGNORECASE):
-            chord = match.group(0)
-            position = match.start()
-            chords_found.append((position, chord))
-    
-    # Sort by position
-    chords_found.sort(key=lambda x: x[0])
-    
-    # Insert chords into lyrics at approximate positions
-    if chords_found and len(lyric_line) > 0:
-        # Simple insertion at proportional positions
-        for i, (chord_pos, chord) in enumerate(reversed(chords_found)):
-            # Calculate proportional position in lyric line
-            lyric_pos = min(int((chord_pos / len(chords_line)) * len(lyric_line)), len(result))
-            result = result[:lyric_pos] + f"[{chord}]" + result[lyric_pos:]
-    
-    return result
+    return chordpro.merge_chords_lyrics(chords_line, lyric_line, chordpro.PDF)
 
 def convert_chord_line(line: str) -> str:
     """
     Convert a line with chords to ChordPro inline format.
     """
-    
-    # Wrap detected chords in brackets
-    chord_patterns = [
-        (r'\b([A-G][#b]?m?)\b', r'[\1]'),
-        (r'\b(DO|RE|MI|FA|SOL|LA|SI)([#b]?m?)\b', r'[\1\2]'),
-    ]
-    
-    result = line
-    for pattern, replacement in chord_patterns:
-        result = re.sub(pattern, replacement, result, flags=re.IGNORECASE)
-    
-    return result
+    return chordpro.convert_chord_line(line)
 
 def main():
     """Main scraping function for full PDF extraction."""
+    parser = argparse.ArgumentParser(description="Extract songs from the Cancionero Jatari PDF")
+    parser.add_argument("--pdf", default=PDF_FILE_PATH, help="Path to the songbook PDF")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS,
+                        help=f"Processes used for page extraction (default {EXTRACT_WORKERS}, 1 = serial)")
+    parser.add_argument("--layout", action="store_true",
+                        help="Align chords to lyrics from glyph coordinates instead of proportional placement")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"Extract and parse every page again, ignoring {CACHE_FILE}")
+    parser.add_argument("--debug-text", action="store_true",
+                        help=f"Also stream the extracted page text to {DEBUG_FILE}")
+    parser.add_argument("--inline-raw", action="store_true",
+                        help=f"Keep raw_text inside each record instead of in {RAW_STORE_DIR}/")
+    parser.add_argument("--quiet", action="store_true",
+                        help=f"No per-song output; progress every {PROGRESS_EVERY} songs")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write stage timings and counters at the end (.prom: Prometheus text, else JSON)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args, "scrape_pdf_full")
+    
+    global quiet
+    quiet = args.quiet
     
     print("=== PDF Song Scraper - FULL EXTRACTION ===")
-    print(f"Processing: {PDF_FILE_PATH}")
+    print(f"Processing: {args.pdf}")
     print(f"Extracting ALL songs starting from page {START_PAGE}")
     
+    debug_file = open(DEBUG_FILE, 'w', encoding='utf-8') if args.debug_text else None
+    cache = None if args.no_cache else PageCache(CACHE_FILE)
+    raw_store = None if args.inline_raw else RawStore(RAW_STORE_DIR)
+    version = parser_version()
     try:
-        # Extract text from entire PDF
-        pdf_text = extract_text_from_pdf(PDF_FILE_PATH)
-        
-        # Identify individual songs
-        raw_songs = identify_song_boundaries(pdf_text)
+        # Pages flow straight from extraction through boundary detection and
+        # parsing into the output file, so only one page is held at a time
+        pages = iter_pdf_pages(args.pdf, workers=args.workers, cache=cache, layout=args.layout)
+        # "extract" is the wait for each page: the extraction itself when serial,
+        # the part not hidden by the worker processes otherwise
+        pages = metrics.timed_iter("extract", pages)
+        raw_songs = identify_song_boundaries(pages, debug_file)
         
         print(f"\n=== PROCESSING SONGS ===")
-        print(f"Processing {len(raw_songs)} potential songs...")
         
-        # Parse each song
-        songs = []
         failed_count = 0
+        total_chars = 0
+        sample_titles = []
         
-        for i, raw_song in enumerate(raw_songs, 1):
-            parsed_song = parse_song_content(raw_song, i)
-            if parsed_song:
-                songs.append(parsed_song)
-                if i % 10 == 0:  # Progress indicator
-                    print(f"  ✓ Processed {i}/{len(raw_songs)} songs, {len(songs)} successful")
-            else:
-                failed_count += 1
-        
-        # Save results
-        print(f"\n=== SAVING RESULTS ===")
-        print(f"Saving {len(songs)} songs to {OUTPUT_FILE}...")
-        
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(songs, f, indent=2, ensure_ascii=False)
+        with JsonArrayWriter(OUTPUT_FILE) as writer:
+            for i, raw_song in enumerate(raw_songs, 1):
+                with metrics.time("parse"):
+                    parsed_song = parse_song_cached(raw_song, i, cache, version)
+                if parsed_song:
+                    with metrics.time("write"):
+                        if raw_store:
+                            parsed_song = raw_store.externalize(parsed_song)
+                        writer.write(parsed_song)
+                    total_chars += len(parsed_song['chordpro'])
+                    if len(sample_titles) < 10:
+                        sample_titles.append(parsed_song['title'])
+                    if i % (PROGRESS_EVERY if quiet else 10) == 0:  # Progress indicator
+                        print(f"  ✓ Processed {i} songs, {writer.count} successful")
+                else:
+                    failed_count += 1
+            song_count = writer.count
+        metrics.count("songs_saved", song_count)
+        metrics.count("songs_failed", failed_count)
         
         print(f"\n🎉 EXTRACTION COMPLETE! 🎉")
-        print(f"✅ Successfully extracted: {len(songs)} songs")
+        print(f"✅ Successfully extracted: {song_count} songs")
         print(f"❌ Failed to parse: {failed_count} items")
         print(f"📁 Output saved to: {OUTPUT_FILE}")
-        print(f"🔍 Debug text saved to: pdf_debug_full.txt")
+        if debug_file:
+            print(f"🔍 Debug text saved to: {DEBUG_FILE}")
+        if cache:
+            stats = cache.stats
+            print(f"♻️  Cache: {stats['text_hits']} pages reused, {stats['text_misses']} extracted; "
+                  f"{stats['parse_hits']} songs reused, {stats['parse_misses']} parsed")
+        if raw_store:
+            stats = raw_store.stats()
+            print(f"🗜️  Raw text: {stats['blobs']} blobs in {RAW_STORE_DIR}/, "
+                  f"{stats['raw_bytes']:,} bytes stored as {stats['stored_bytes']:,}")
         
         # Show statistics
-        if songs:
-            total_chars = sum(len(song['chordpro']) for song in songs)
-            avg_chars = total_chars // len(songs)
+        if song_count:
+            avg_chars = total_chars // song_count
             
             print(f"\n📊 STATISTICS:")
-            print(f"   Total songs: {len(songs)}")
+            print(f"   Total songs: {song_count}")
             print(f"   Total ChordPro content: {total_chars:,} characters")
             print(f"   Average song length: {avg_chars} characters")
             
             # Show sample titles
             print(f"\n🎵 SAMPLE SONG TITLES:")
-            for i, song in enumerate(songs[:10]):
-                print(f"   {i+1}. {song['title']}")
-            if len(songs) > 10:
-                print(f"   ... and {len(songs) - 10} more songs")
+            for i, title in enumerate(sample_titles):
+                print(f"   {i+1}. {title}")
+            if song_count > 10:
+                print(f"   ... and {song_count - 10} more songs")
+        
+        metrics.print_summary("⏱️  STAGE TIMINGS")
+        if args.metrics:
+            metrics.write(args.metrics)
+            print(f"📈 Metrics saved to {args.metrics}")
         
         print(f"\n🚀 Ready to import into ChoirApp backend!")
         
@@ -394,6 +446,13 @@ def main():
         print(f"❌ Error during scraping: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        if debug_file:
+            debug_file.close()
+        if cache:
+            cache.close()
+        if raw_store:
+            raw_store.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,6 @@
+"""
+Shared helpers for the ChoirApp song scrapers and importers.
+
+The scripts in ``lacuerda_scraper/`` and ``pdf_scraper/`` are run directly,
+so they put the repository root on ``sys.path`` before importing from here.
+"""
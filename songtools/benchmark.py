@@ -0,0 +1,241 @@
+"""
+Benchmarks for the scraping and conversion hot paths.
+
+Fixtures come from the checked-in data, so every run measures the same work:
+
+- lacuerda_songs.json / pdf_songs_full.json: the ChordPro of every song is
+  turned back into the two-line (chords above lyrics) text the converters
+  read, giving realistic converter input and chord/lyric line pairs;
+- the PDF songs are laid out on pages, one or two songs per page, for
+  identify_song_boundaries;
+- index_debug.html for the index link extraction, and laCuerda song pages
+  rebuilt around the two-line texts for parse_song_html (the parsing half of
+  parse_song_page, without the network).
+
+Each benchmark is timed over several rounds and reported as items per second
+(songs, lines or pages) at the median round time. Results can be saved as a
+baseline and compared on later runs, so a change shows up as the percentage
+by which the median time grew (+, slower) or shrank (-, faster):
+
+    python -m songtools.benchmark --save-baseline benchmark_baseline.json
+    python -m songtools.benchmark --baseline benchmark_baseline.json
+
+Timings only mean something on the machine that produced them, so a baseline
+records its host and is refused elsewhere; it is not checked in. Even on one
+host, medians of separate runs move by 20-30%, hence the default threshold.
+"""
+
+import argparse
+import contextlib
+import html
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from songtools import chordpro
+from songtools.lacuerda_html import DEFAULT_BACKEND, extract_index_links
+from songtools.profiling import add_profile_arguments, start_profiling
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+LACUERDA_SONGS = os.path.join(ROOT, "lacuerda_scraper", "lacuerda_songs.json")
+PDF_SONGS = os.path.join(ROOT, "pdf_scraper", "pdf_songs_full.json")
+INDEX_HTML = os.path.join(ROOT, "lacuerda_scraper", "index_debug.html")
+
+ROUNDS = 15
+REGRESSION_THRESHOLD = 0.35  # slower than baseline by more than this is flagged; run-to-run noise is 20-30%
+
+
+def chordpro_to_two_line(text: str) -> str:
+    """Undo inline ChordPro: every line with [chords] becomes a chord line above its lyric line."""
+    out = []
+    for line in text.split("\n"):
+        if "[" not in line:
+            out.append(line)
+            continue
+        chords_line, lyric = [], []
+        pos = 0
+        for match in chordpro.BRACKETED_RE.finditer(line):
+            lyric.append(line[pos:match.start()])
+            column = sum(map(len, lyric))
+            width = len("".join(chords_line))
+            # Keep at least one space between chords that would touch
+            chords_line.append(" " * max(column - width, 1 if chords_line else 0) + match.group(1))
+            pos = match.end()
+        lyric.append(line[pos:])
+        out.append("".join(chords_line))
+        lyric_line = "".join(lyric)
+        if lyric_line.strip():
+            out.append(lyric_line)
+    return "\n".join(out)
+
+
+def load_module(name: str, path: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Fixtures:
+    def __init__(self):
+        with open(LACUERDA_SONGS, "r", encoding="utf-8") as f:
+            self.lacuerda_songs = json.load(f)
+        with open(PDF_SONGS, "r", encoding="utf-8") as f:
+            self.pdf_songs = json.load(f)
+        with open(INDEX_HTML, "r", encoding="utf-8") as f:
+            self.index_html = f.read()
+        self.lacuerda_texts = [chordpro_to_two_line(s["chordpro"]) for s in self.lacuerda_songs]
+        self.pdf_texts = [chordpro_to_two_line(s["chordpro"]) for s in self.pdf_songs]
+        self.lines = [line for text in self.lacuerda_texts + self.pdf_texts for line in text.split("\n")]
+        self.line_pairs = []
+        for text in self.lacuerda_texts:
+            lines = text.split("\n")
+            for upper, lower in zip(lines, lines[1:]):
+                if chordpro.has_chord_patterns(upper) and lower.strip() and not chordpro.has_chord_patterns(lower):
+                    self.line_pairs.append((upper, lower))
+        self.pages = self._pages()
+        self.song_pages = [self._song_page(song, text) for song, text in zip(self.lacuerda_songs, self.lacuerda_texts)]
+
+    def _pages(self) -> List[Tuple[int, str]]:
+        """
+        Title + body per PDF song, alternating one and two songs per page, with
+        the blank line extraction puts before a title-styled line.
+        """
+        pages, current = [], []
+        for song, text in zip(self.pdf_songs, self.pdf_texts):
+            current.append(f"{song['title'].upper()}\n{text}")
+            if len(current) == 1 + len(pages) % 2:
+                pages.append((40 + len(pages), "\n\n".join(current)))
+                current = []
+        if current:
+            pages.append((40 + len(pages), "\n\n".join(current)))
+        return pages
+
+    @staticmethod
+    def _song_page(song: Dict[str, Any], text: str) -> str:
+        tags = "".join(f'<a href="/genero/{html.escape(t.lower())}">{html.escape(t)}</a>'
+                       for t in song.get("tags", []))
+        return (f"<html><head><title>{html.escape(song['title'])}</title></head><body>"
+                f"<h1>{html.escape(song['title'])} Música Católica</h1>"
+                f"<h2>de: {html.escape(song.get('artist', ''))}</h2>"
+                f"<pre>intro</pre><pre>{html.escape(text)}</pre>{tags}</body></html>")
+
+
+def build_benchmarks(fx: Fixtures) -> List[Tuple[str, str, int, Callable[[], Any]]]:
+    """(name, unit, items per call, callable) for every benchmark that can run here."""
+    benches = [
+        ("to_chordpro_format[lacuerda]", "songs", len(fx.lacuerda_texts),
+         lambda: [chordpro.to_chordpro_format(t, chordpro.LACUERDA) for t in fx.lacuerda_texts]),
+        ("to_chordpro_format[pdf]", "songs", len(fx.pdf_texts),
+         lambda: [chordpro.to_chordpro_format(t, chordpro.PDF) for t in fx.pdf_texts]),
+        ("has_chord_patterns", "lines", len(fx.lines),
+         lambda: [chordpro.has_chord_patterns(line) for line in fx.lines]),
+        ("merge_chords_lyrics", "lines", len(fx.line_pairs),
+         lambda: [chordpro.merge_chords_lyrics(c, l) for c, l in fx.line_pairs]),
+        (f"extract_index_links[{DEFAULT_BACKEND}]", "pages", 1,
+         lambda: extract_index_links(fx.index_html, DEFAULT_BACKEND)),
+    ]
+    try:
+        scraper = load_module("bench_scrape_lacuerda", os.path.join(ROOT, "lacuerda_scraper", "scrape_lacuerda.py"))
+        benches.append(("parse_song_html", "songs", len(fx.song_pages),
+                        lambda: [scraper.parse_song_html(page, "https://example.invalid/song")
+                                 for page in fx.song_pages]))
+    except ImportError as e:
+        print(f"Skipping parse_song_html: {e}")
+    try:
+        pdf = load_module("bench_scrape_pdf_full", os.path.join(ROOT, "pdf_scraper", "scrape_pdf_full.py"))
+        benches.append(("identify_song_boundaries", "pages", len(fx.pages),
+                        lambda: list(pdf.identify_song_boundaries(iter(fx.pages)))))
+    except ImportError as e:
+        print(f"Skipping identify_song_boundaries: {e}")
+    return benches
+
+
+def run_benchmark(fn: Callable[[], Any], items: int, rounds: int) -> Dict[str, float]:
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        fn()  # warm-up: regex caches, lazy imports
+        times = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - started)
+    median = statistics.median(times)
+    return {
+        "items": items,
+        "best_s": min(times),
+        "median_s": median,
+        "per_s": items / median if median else float("inf"),
+    }
+
+
+def host_info() -> Dict[str, Any]:
+    """What a baseline's timings depend on; baselines from another host are not compared."""
+    return {"node": platform.node(), "machine": platform.machine(), "processor": platform.processor(),
+            "cpus": os.cpu_count(), "python": platform.python_version()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the scraping and conversion hot paths")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help=f"Timed rounds per benchmark (default {ROUNDS})")
+    parser.add_argument("--only", help="Run only benchmarks whose name contains this text")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Save this run as a baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help=f"Fractional growth of the median time reported as a regression "
+                             f"(default {REGRESSION_THRESHOLD})")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args, "benchmark")
+
+    started = time.perf_counter()
+    fx = Fixtures()
+    print(f"Fixtures: {len(fx.lacuerda_texts)} laCuerda + {len(fx.pdf_texts)} PDF songs, "
+          f"{len(fx.lines)} lines, {len(fx.line_pairs)} chord/lyric pairs, {len(fx.pages)} pages "
+          f"({time.perf_counter() - started:.1f}s)")
+
+    baseline: Optional[Dict[str, Any]] = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("host") != host_info():
+            sys.exit(f"{args.baseline} was recorded on {saved.get('host') or 'an unknown host'}, "
+                     f"not on this one ({host_info()}); save a baseline here first")
+        baseline = saved["results"]
+
+    results = {}
+    regressions = []
+    print(f"\n{'benchmark':32} {'items':>7} {'best ms':>9} {'median ms':>10} {'rate':>16}  time vs baseline")
+    for name, unit, items, fn in build_benchmarks(fx):
+        if args.only and args.only not in name:
+            continue
+        result = run_benchmark(fn, items, max(1, args.rounds))
+        result["unit"] = unit
+        results[name] = result
+        comparison = ""
+        if baseline and name in baseline:
+            slowdown = result["median_s"] / baseline[name]["median_s"] - 1
+            comparison = f"{slowdown:+.1%}"
+            if slowdown > args.threshold:
+                comparison += "  REGRESSION"
+                regressions.append(name)
+        print(f"{name:32} {items:7d} {result['best_s'] * 1000:9.1f} {result['median_s'] * 1000:10.1f} "
+              f"{result['per_s']:10.0f} {unit}/s  {comparison}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({"host": host_info(), "rounds": args.rounds, "results": results}, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+    if regressions:
+        print(f"\n{len(regressions)} regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Concurrent request engine for the importers: a bounded number of requests in
+flight over one pooled session, with adaptive backoff when the backend pushes
+back.
+
+AdaptiveThrottle works like TCP congestion control. A throttled answer (429
+or 5xx, or a dropped connection) halves the number of requests allowed in
+flight and pauses all workers for Retry-After or an exponential delay, once
+per window: answers to requests sent before that backoff do not halve the
+limit again. Every `limit` clean answers let one more request in, up to the
+configured maximum.
+
+Only what cannot have been applied is retried. A POST creates a song and the
+backend has no duplicate check, so a POST is retried after a 429 or a
+connection that never opened, but a read timeout, a dropped connection or a
+5xx leaves its outcome unknown: the response or exception is handed back for
+the caller to record as needing a check, never resent.
+"""
+
+import email.utils
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple
+
+import requests
+from urllib3.exceptions import ConnectTimeoutError
+
+from songtools.metrics import Metrics
+
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+# Answers that say the request was not processed, so even a POST can be resent
+NOT_PROCESSED_STATUSES = {429}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+SEARCH_PAGE_SIZE = 50
+
+
+def retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    """The Retry-After header in seconds (delta or HTTP date), or None."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def request_not_sent(exc: requests.RequestException) -> bool:
+    """True when `exc` was raised before the request reached the server (refused, DNS, connect timeout)."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    reason = exc.args[0] if exc.args else None
+    reason = getattr(reason, "reason", reason)  # urllib3's MaxRetryError wraps the cause
+    # NewConnectionError and NameResolutionError are ConnectTimeoutError subclasses
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def outcome_unknown(resp: requests.Response) -> bool:
+    """True for answers after which a POST may or may not have been applied."""
+    return resp.status_code >= 500
+
+
+class AdaptiveThrottle:
+    """Caps requests in flight; shrinks the cap and pauses on throttling, grows it back on success."""
+
+    def __init__(self, max_in_flight: int, base_delay: float = 1.0, max_delay: float = 60.0):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.max_in_flight = max_in_flight
+        self.limit = max_in_flight
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.throttled = 0
+        self._epoch = 0
+        self._streak = 0
+        self._successes = 0
+        self._resume_at = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> int:
+        """Block until a request may be sent. Returns the window to pass to release()."""
+        with self._cond:
+            while True:
+                pause = self._resume_at - time.monotonic()
+                if pause <= 0 and self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return self._epoch
+                self._cond.wait(timeout=pause if pause > 0 else None)
+
+    def release(self, throttled: bool = False, retry_after: Optional[float] = None,
+                epoch: Optional[int] = None) -> None:
+        """
+        Report how the request went and free its slot. `epoch` is what
+        acquire() returned; a throttled answer to a request sent before the
+        last backoff only honours its Retry-After.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self._successes = 0
+                now = time.monotonic()
+                if epoch is None or epoch == self._epoch:
+                    self._epoch += 1
+                    self.limit = max(1, self.limit // 2)
+                    delay = retry_after if retry_after is not None else self.base_delay * 2 ** self._streak
+                    self._streak += 1
+                    self._resume_at = max(self._resume_at, now + min(self.max_delay, delay))
+                elif retry_after is not None:
+                    self._resume_at = max(self._resume_at, now + min(self.max_delay, retry_after))
+            else:
+                self._streak = 0
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_in_flight:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+
+def send_with_backoff(session: requests.Session, method: str, url: str, throttle: AdaptiveThrottle,
+                      max_retries: int = 5, metrics: Optional[Metrics] = None, stage: str = "http_post",
+                      idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+    """
+    Send one request through `throttle`, retrying up to `max_retries` times.
+    Idempotent requests (by default GET, PUT, DELETE...) are retried on
+    throttled answers and any connection error or timeout. Others, like the
+    song POST, only on a 429 and on connection errors raised before anything
+    was sent (see request_not_sent); a 5xx is returned and a read timeout or
+    dropped connection raised at once, as the request may have been applied.
+    The last throttled response is returned as-is; the last connection error
+    is raised.
+
+    With `metrics`, every attempt is timed as a `stage` event and counted in
+    <stage>_requests, <stage>_retries, <stage>_bytes_sent and
+    <stage>_bytes_received.
+    """
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    retry_statuses = THROTTLE_STATUSES if idempotent else NOT_PROCESSED_STATUSES
+    for attempt in range(max_retries + 1):
+        if attempt and metrics:
+            metrics.count(f"{stage}_retries")
+        epoch = throttle.acquire()
+        started = time.perf_counter()
+        try:
+            resp = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            throttle.release(throttled=True, epoch=epoch)
+            if metrics:
+                metrics.observe(stage, time.perf_counter() - started)
+                metrics.count(f"{stage}_connection_errors")
+            if attempt == max_retries or not (idempotent or request_not_sent(e)):
+                raise
+            continue
+        except BaseException:
+            throttle.release(epoch=epoch)
+            raise
+        if metrics:
+            metrics.observe(stage, time.perf_counter() - started)
+            metrics.count(f"{stage}_requests")
+            metrics.count(f"{stage}_bytes_sent", len(resp.request.body or b""))
+            metrics.count(f"{stage}_bytes_received", len(resp.content))
+        if resp.status_code in THROTTLE_STATUSES:
+            throttle.release(throttled=True, retry_after=retry_after_seconds(resp), epoch=epoch)
+            if metrics:
+                metrics.count(f"{stage}_throttled")
+            if attempt < max_retries and resp.status_code in retry_statuses:
+                continue
+        else:
+            throttle.release(epoch=epoch)
+        return resp
+
+
+def find_song(session: requests.Session, api_url: str, title: str, artist: Optional[str],
+              throttle: AdaptiveThrottle, metrics: Optional[Metrics] = None, content: Optional[str] = None,
+              **kwargs) -> Optional[str]:
+    """
+    songId of a song on the backend with exactly this title and artist (case
+    and surrounding spaces ignored) and, when `content` is given, this
+    content (line endings and surrounding space ignored), or None. Songbooks
+    repeat titles, so content keeps two songs named alike apart. Pages
+    through GET /songs/search, which matches the title as a substring.
+    Raises the requests exception, or HTTPError, when the lookup itself fails.
+    """
+    url = f"{api_url.rstrip('/')}/songs/search"
+    wanted = (title.strip().casefold(), (artist or "").strip().casefold())
+    wanted_content = _normalize_content(content) if content is not None else None
+    skip = 0
+    while True:
+        params = {"title": title.strip(), "artist": (artist or "").strip() or None,
+                  "skip": skip, "take": SEARCH_PAGE_SIZE}
+        resp = send_with_backoff(session, "GET", url, throttle, metrics=metrics, stage="http_lookup",
+                                 params=params, **kwargs)
+        resp.raise_for_status()
+        page = resp.json()
+        for song in page.get("songs") or []:
+            if ((song.get("title") or "").strip().casefold(), (song.get("artist") or "").strip().casefold()) != wanted:
+                continue
+            if wanted_content is None or _normalize_content(song.get("content") or "") == wanted_content:
+                return song.get("songId")
+        if not page.get("hasMore"):
+            return None
+        skip += SEARCH_PAGE_SIZE
+
+
+def _normalize_content(content: str) -> str:
+    return content.replace("\r\n", "\n").strip()
+
+
+def bounded_map(pool: Executor, fn: Callable[[Any], Any], items: Iterable[Any],
+                window: int) -> Iterator[Tuple[Any, Future]]:
+    """
+    Submit fn(item) for each item, pulling items lazily so that at most
+    `window` are pending at once. Yields (item, future) in completion order;
+    memory is bounded by the window, not by the length of `items`.
+    """
+    pending = {}
+    for item in items:
+        pending[pool.submit(fn, item)] = item
+        if len(pending) >= window:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield pending.pop(future), future
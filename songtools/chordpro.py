@@ -0,0 +1,228 @@
+"""
+ChordPro conversion shared by the scrapers and the importers.
+
+Two source profiles are supported:
+
+- ``LACUERDA``: laCuerda's two-line format, where a chord line sits above its
+  lyric line and chords are placed at the column they appear in.
+- ``PDF``: text extracted from songbook PDFs, where columns are not kept, so
+  chords are placed proportionally and lone chord lines are bracketed.
+
+Both profiles run on the same tokenizer (`songtools.chords.classify_line`)
+and merge engine (`songtools.merge`), so fixes land in one place.
+"""
+
+import re
+from typing import List, Optional
+
+from songtools.chords import (CHORD_RE, EDGE_PUNCTUATION, TOKEN_RE, LineClassification, Token, classify_line,
+                              is_chord_token)
+from songtools.merge import bracket_chords, merge_at_columns, merge_proportional
+
+LACUERDA = "lacuerda"
+PDF = "pdf"
+PROFILES = (LACUERDA, PDF)
+
+SECTION_KEYWORDS = ('INTRO:', 'VERSE:', 'CHORUS:', 'BRIDGE:', 'OUTRO:', 'CODA:', 'ESTRIBILLO:', 'VERSO:')
+
+BRACKETED_RE = re.compile(r"\[([^\[\]]+)\]")
+# originalKey has always been sent with English letters; solfège roots are converted
+ENGLISH_ROOTS = {"do": "C", "re": "D", "mi": "E", "fa": "F", "sol": "G", "la": "A", "si": "B"}
+ACCIDENTALS = {"♯": "#", "♭": "b"}
+NOT_CHORDS = LineClassification(False, [], [])
+
+
+def is_section_label(line: str) -> bool:
+    """Check if a line is a section label like INTRO:, VERSE:, CHORUS:, etc."""
+    line = line.strip().upper()
+    return any(line.startswith(keyword) or line == keyword.rstrip(':') for keyword in SECTION_KEYWORDS)
+
+
+def has_chord_patterns(line: str) -> bool:
+    """Check if a line is a chord line (Spanish or English chord names)."""
+    return classify_line(line).is_chord_line
+
+
+def merge_chords_lyrics(chords_line: str, lyric_line: str, profile: str = LACUERDA,
+                        chord_spans: Optional[List[Token]] = None) -> str:
+    """
+    Merges a chords line and a lyric line into ChordPro inline format.
+    `chord_spans` are the (position, token) pairs of the chords line when the
+    caller has already tokenized it: every token for LACUERDA, the chords for PDF.
+    """
+    if profile == LACUERDA:
+        if chord_spans is None:
+            chord_spans = [(m.start(), m.group()) for m in TOKEN_RE.finditer(chords_line)]
+        return merge_at_columns(chord_spans, lyric_line)
+    if profile == PDF:
+        if chord_spans is None:
+            chord_spans = classify_line(chords_line).chords
+        return merge_proportional(chord_spans, len(chords_line), lyric_line)
+    raise ValueError(f"Unknown source profile '{profile}', expected one of {PROFILES}")
+
+
+def convert_chord_line(line: str, chords: Optional[List[Token]] = None) -> str:
+    """Wrap every chord of a chord-only line in brackets."""
+    if chords is None:
+        chords = classify_line(line).chords
+    return bracket_chords(chords, line)
+
+
+def to_chordpro_format(text: str, profile: str = LACUERDA) -> str:
+    """Convert raw song text from the given source profile to ChordPro inline format."""
+    if profile == LACUERDA:
+        return _lacuerda_to_chordpro(text)
+    if profile == PDF:
+        return _pdf_to_chordpro(text)
+    raise ValueError(f"Unknown source profile '{profile}', expected one of {PROFILES}")
+
+
+def _lacuerda_to_chordpro(text: str) -> str:
+    """
+    Converts laCuerda two-line format to ChordPro inline format.
+    Each pair of lines: chords, lyrics -> merged to [CHORD]lyric.
+    Preserves blank lines and lines without chords.
+    Adds {start_of_verse}/{end_of_verse} markers for blocks.
+    Handles section labels like INTRO:, VERSE:, CHORUS: properly.
+    """
+    lines = text.splitlines()
+    result = []
+    i = 0
+
+    while i < len(lines):
+        current_line = lines[i].strip()
+
+        # Skip empty lines
+        if current_line == "":
+            result.append("")
+            i += 1
+            continue
+
+        # Check if current line is a section label
+        if is_section_label(current_line):
+            # Add section label as-is (not as a chord)
+            if not result or result[-1] == "":
+                result.append("{start_of_verse}")
+            result.append(current_line)
+            i += 1
+            continue
+
+        # If next line exists and is not blank, and current line is not a section label
+        if i+1 < len(lines) and lines[i+1].strip() != "" and not is_section_label(lines[i+1]):
+            chords_line = lines[i]
+            lyric_line = lines[i+1]
+
+            # Check if the chords line looks like actual chords (contains chord-like patterns)
+            classification = classify_line(chords_line)
+            if classification.is_chord_line:
+                merged = merge_at_columns(classification.tokens, lyric_line)
+                # Start a new verse if previous line was blank or start of file
+                if not result or result[-1] == "":
+                    result.append("{start_of_verse}")
+                result.append(merged)
+                # If next next line is blank or end, close verse
+                if i+2 >= len(lines) or lines[i+2].strip() == "":
+                    result.append("{end_of_verse}")
+                i += 2
+            else:
+                # Treat as single line (not chord/lyric pair)
+                if not result or result[-1] == "":
+                    result.append("{start_of_verse}")
+                result.append(current_line)
+                if i+1 >= len(lines) or lines[i+1].strip() == "":
+                    result.append("{end_of_verse}")
+                i += 1
+        else:
+            # No chord line, just lyrics or single line
+            if not result or result[-1] == "":
+                result.append("{start_of_verse}")
+            result.append(current_line)
+            if i+1 >= len(lines) or lines[i+1].strip() == "":
+                result.append("{end_of_verse}")
+            i += 1
+    return "\n".join(result)
+
+
+def _pdf_to_chordpro(text: str) -> str:
+    """
+    Converts songbook PDF text to ChordPro inline format.
+    Chord lines are merged into the following lyric line; chord lines with no
+    lyric under them are bracketed in place. Lines already merged by layout
+    extraction pass through unchanged.
+    """
+    if not text.strip():
+        return ""
+
+    lines = text.split('\n')
+    # Classify every line once; the look-ahead below reuses these results.
+    # Lines that already carry inline chords (layout extraction) are lyrics.
+    classifications = [
+        NOT_CHORDS if BRACKETED_RE.search(line) else classify_line(line.strip())
+        for line in lines
+    ]
+    result_lines = []
+    in_verse = False
+
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+
+        # Skip empty lines but preserve them for spacing
+        if not line:
+            if in_verse:
+                result_lines.append("{end_of_verse}")
+                in_verse = False
+            result_lines.append("")
+            i += 1
+            continue
+
+        if not in_verse:
+            result_lines.append("{start_of_verse}")
+            in_verse = True
+
+        classification = classifications[i]
+        if classification.is_chord_line:
+            # Check if next line is lyrics (merge chord and lyric lines)
+            if i + 1 < len(lines) and lines[i + 1].strip() and not classifications[i + 1].is_chord_line:
+                lyric_line = lines[i + 1].strip()
+                result_lines.append(merge_proportional(classification.chords, len(line), lyric_line))
+                i += 2  # Skip both lines
+            else:
+                result_lines.append(bracket_chords(classification.chords, line))
+                i += 1
+        else:
+            # This is likely a lyric line
+            result_lines.append(line)
+            i += 1
+
+    # Close final verse if needed
+    if in_verse:
+        result_lines.append("{end_of_verse}")
+
+    return '\n'.join(result_lines)
+
+
+def english_chord(chord: str) -> str:
+    """`chord` with a solfège root and accidental in English notation ("LAm7" -> "Am7", "SIb" -> "Bb")."""
+    match = CHORD_RE.fullmatch(chord)
+    if match is None:
+        return chord
+    root = match.group("root")
+    rest = chord[match.end("root"):]
+    if rest[:1] in ACCIDENTALS:
+        rest = ACCIDENTALS[rest[0]] + rest[1:]
+    return ENGLISH_ROOTS.get(root.lower(), root) + rest
+
+
+def extract_key_from_chordpro(chordpro: str) -> str:
+    """
+    Guess the song key from ChordPro content: the first bracketed chord,
+    without any slash bass, in English notation (e.g. "[LAm7/DO]" -> "Am7").
+    """
+    if not chordpro:
+        return ""
+    for match in BRACKETED_RE.finditer(chordpro):
+        chord = match.group(1).strip(EDGE_PUNCTUATION)
+        if is_chord_token(chord, strict=True):
+            return english_chord(chord.split('/', 1)[0])
+    return ""
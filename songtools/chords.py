@@ -0,0 +1,107 @@
+"""
+Chord-line classification shared by the laCuerda and PDF converters.
+
+A line is tokenized once on whitespace and every token is checked against a
+single precompiled chord lexicon:
+
+- Spanish roots DO RE MI FA SOL LA SI, in any case (``DO``, ``Sol``, ``mim``)
+- English roots A-G, upper case only (lower case ``a``/``e`` are words)
+- an optional accidental (``#``, ``b``, ``♯``, ``♭``), a quality
+  (``m``, ``min``, ``maj``, ``dim``, ``aug``, ``sus``, ``add``, ``+``, ``°``),
+  extensions such as ``7``, ``maj7``, ``sus4``, ``add9``, ``7b9``
+- an optional slash bass (``LA/DO#``, ``G/B``)
+
+Bare Spanish roots in lower or title case (``la``, ``Mi``, ``si``...) are
+everyday words, so they only count as chords on a line that already has
+unambiguous chords or consists of nothing else. So do a single bare ``A`` or
+``E`` before words (Spanish "to" and "and": "A mi Dios", "E la luz"); two of
+them on a line, or one on a line without words, are chords. A line is a chord
+line when its chords outnumber its words. The result carries the decision together with
+the token positions, so converters never scan the line a second time.
+"""
+
+import re
+from typing import List, NamedTuple, Tuple
+
+_ROOT = r"(?:(?i:DO|RE|MI|FA|SOL|LA|SI)|[A-G])"
+_ACCIDENTAL = r"(?:#|b|♯|♭)?"
+_QUALITY = r"(?:maj|min|dim|aug|sus|add|m|M|\+|°|ø)?"
+_EXTENSION = r"(?:\d{1,2}(?:(?:maj|sus|add|b|#|\+|-)\d{1,2})*)?"
+_SUFFIX = _QUALITY + _EXTENSION + r"(?:(?:sus|add)\d{1,2})?"
+
+CHORD_RE = re.compile(
+    rf"(?P<root>{_ROOT}){_ACCIDENTAL}(?P<suffix>{_SUFFIX})(?:/{_ROOT}{_ACCIDENTAL})?"
+)
+TOKEN_RE = re.compile(r"\S+")
+# Tokens that say nothing either way: bar lines, repeat marks, dashes, "INTRO:"-style labels
+NEUTRAL_RE = re.compile(r"^(?:[|/\-–—.:*~]+|\(?(?:x\d+|\d+x|bis)\)?|[^\W\d_]+:)$", re.IGNORECASE)
+# Brackets and trailing punctuation a chord may be wrapped in: "(DO)", "SOL,"
+EDGE_PUNCTUATION = "()[]{},;.|*"
+
+WEAK_WORDS = frozenset({"do", "re", "mi", "fa", "sol", "la", "si",
+                        "Do", "Re", "Mi", "Fa", "Sol", "La", "Si"})
+# English roots that are also Spanish words ("a", "e"): weak alone before words, chords otherwise
+WEAK_ENGLISH_ROOTS = frozenset({"A", "E"})
+
+Token = Tuple[int, str]
+
+
+class LineClassification(NamedTuple):
+    """
+    `tokens` holds every non-space token of the line as (position, token);
+    `chords` the chord ones, with surrounding punctuation such as "(DO)" trimmed.
+    """
+
+    is_chord_line: bool
+    tokens: List[Token]
+    chords: List[Token]
+
+
+def is_chord_token(token: str, strict: bool = False) -> bool:
+    """
+    True when `token` (without surrounding punctuation) is a chord in the lexicon.
+    With `strict`, bare lower/title-case Spanish roots ("la", "Mi") do not count.
+    """
+    return _chord_strength(token.strip(EDGE_PUNCTUATION)) > (1 if strict else 0)
+
+
+def _chord_strength(token: str) -> int:
+    """2 for an unambiguous chord, 1 for a bare lower/title-case Spanish root, 0 otherwise."""
+    if not token or CHORD_RE.fullmatch(token) is None:
+        return 0
+    return 1 if token in WEAK_WORDS else 2
+
+
+def classify_line(line: str) -> LineClassification:
+    """Tokenize `line` once and decide whether it is a chord line."""
+    tokens: List[Token] = []
+    strong: List[Token] = []
+    weak: List[Token] = []
+    english: List[Token] = []
+    words = 0
+    for match in TOKEN_RE.finditer(line):
+        token = match.group()
+        tokens.append((match.start(), token))
+        core = token.strip(EDGE_PUNCTUATION)
+        strength = _chord_strength(core)
+        if core in WEAK_ENGLISH_ROOTS:
+            english.append((match.start() + token.index(core), core))
+        elif strength == 2:
+            strong.append((match.start() + token.index(core), core))
+        elif strength == 1:
+            weak.append((match.start() + token.index(core), core))
+        elif core and not NEUTRAL_RE.match(token):
+            words += 1
+
+    if len(english) >= 2 or (english and not words):
+        strong = sorted(strong + english)
+    elif english:
+        weak = sorted(weak + english)
+    if strong:
+        chords = sorted(strong + weak) if weak else strong
+        is_chord_line = len(chords) > words
+    else:
+        # Only "la mi re"-style lines with no words at all count as chords
+        chords = weak if len(weak) >= 2 and words == 0 else []
+        is_chord_line = bool(chords)
+    return LineClassification(is_chord_line, tokens, chords if is_chord_line else [])
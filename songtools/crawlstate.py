@@ -0,0 +1,139 @@
+"""
+Persisted per-URL crawl state for incremental re-crawls.
+
+Each fetched URL gets a row with its fetch time, validators (ETag and
+Last-Modified), a hash of the response body, the body itself (compressed),
+the record parsed from it and the version of the parser that produced that
+record. The next crawl sends conditional GETs and reuses the stored record
+when the server answers 304 or the body hash has not changed; when the parser
+version differs, the stored body is parsed again instead. Rows written
+before bodies were kept cannot be re-parsed, so their pages are fetched in
+full once.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_state (
+    source_url    TEXT PRIMARY KEY,
+    fetched_at    REAL NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    content_hash  TEXT,
+    record_json   TEXT,
+    parser_version TEXT,
+    body          BLOB
+)
+"""
+# Columns added after the first release, with their types, for older state files
+ADDED_COLUMNS = (("parser_version", "TEXT"), ("body", "BLOB"))
+
+
+def content_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+class CrawlState:
+    """SQLite-backed store keyed by source_url, safe to share between threads."""
+
+    def __init__(self, path: str, parser_version: Optional[str] = None):
+        self.path = path
+        self.parser_version = parser_version
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(crawl_state)")}
+        for name, kind in ADDED_COLUMNS:
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE crawl_state ADD COLUMN {name} {kind}")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.stats = {"fetched": 0, "not_modified": 0, "unchanged": 0, "fresh": 0, "reparsed": 0}
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at, etag, last_modified, content_hash, record_json, parser_version, body "
+                "FROM crawl_state WHERE source_url = ?", (url,)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "fetched_at": row[0],
+            "etag": row[1],
+            "last_modified": row[2],
+            "content_hash": row[3],
+            "record": json.loads(row[4]) if row[4] else None,
+            "parser_version": row[5],
+            "body": zlib.decompress(row[6]).decode("utf-8") if row[6] else None,
+        }
+
+    def is_current(self, state: Optional[Dict[str, Any]]) -> bool:
+        """True when the stored record was parsed by this parser version."""
+        return bool(state) and state["parser_version"] == self.parser_version
+
+    def is_reusable(self, state: Optional[Dict[str, Any]]) -> bool:
+        """True when a record for the current parser can be had without the response body."""
+        return self.is_current(state) or bool(state and state["body"] is not None)
+
+    def conditional_headers(self, state: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Request headers that let the server answer 304 Not Modified."""
+        headers = {}
+        if self.is_reusable(state):
+            if state["etag"]:
+                headers["If-None-Match"] = state["etag"]
+            if state["last_modified"]:
+                headers["If-Modified-Since"] = state["last_modified"]
+        return headers
+
+    def is_fresh(self, state: Optional[Dict[str, Any]], max_age: Optional[float]) -> bool:
+        """True when `state` was fetched less than `max_age` seconds ago."""
+        return bool(self.is_reusable(state) and max_age and time.time() - state["fetched_at"] < max_age)
+
+    def record(self, url: str, etag: Optional[str], last_modified: Optional[str],
+               body_hash: Optional[str], record: Optional[Dict[str, Any]], body: Optional[str] = None) -> None:
+        record_json = json.dumps(record, ensure_ascii=False) if record is not None else None
+        compressed = zlib.compress(body.encode("utf-8")) if body is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO crawl_state "
+                "(source_url, fetched_at, etag, last_modified, content_hash, record_json, parser_version, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, time.time(), etag, last_modified, body_hash, record_json, self.parser_version, compressed),
+            )
+            self._conn.commit()
+
+    def update_record(self, url: str, record: Optional[Dict[str, Any]]) -> None:
+        """Replace the stored record of `url` with one parsed by the current parser version."""
+        record_json = json.dumps(record, ensure_ascii=False) if record is not None else None
+        with self._lock:
+            self._conn.execute(
+                "UPDATE crawl_state SET record_json = ?, parser_version = ? WHERE source_url = ?",
+                (record_json, self.parser_version, url),
+            )
+            self._conn.commit()
+
+    def touch(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        """Mark `url` as revalidated now, keeping stored validators unless new ones are given."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE crawl_state SET fetched_at = ?, "
+                "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) "
+                "WHERE source_url = ?",
+                (time.time(), etag, last_modified, url),
+            )
+            self._conn.commit()
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,56 @@
+"""
+Exact-duplicate detection for scraped songs, run before anything is sent.
+
+Songs are compared on a normalized title, artist and ChordPro body: Unicode
+NFKC, case-folded, whitespace collapsed inside lines and blank lines
+dropped. Two songs with the same normalized fields are the same request as
+far as the backend is concerned, so only the first one is kept.
+"""
+
+import hashlib
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, Iterator, List
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    lines = (WHITESPACE_RE.sub(" ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def song_key(song: Dict[str, Any]) -> str:
+    """Hash of the normalized title, artist and ChordPro body."""
+    parts = [normalize_text(song.get(field, "")) for field in ("title", "artist", "chordpro")]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class Deduplicator:
+    """Drops songs whose song_key was already seen, remembering what each drop duplicated."""
+
+    def __init__(self):
+        self.first_title: Dict[str, str] = {}
+        self.seen = 0
+        self.dropped: List[Dict[str, str]] = []
+
+    def is_duplicate(self, song: Dict[str, Any]) -> bool:
+        self.seen += 1
+        key = song_key(song)
+        if key in self.first_title:
+            self.dropped.append({"title": song.get("title", ""), "duplicate_of": self.first_title[key]})
+            return True
+        self.first_title[key] = song.get("title", "")
+        return False
+
+    def filter(self, songs: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Yield the songs that are not duplicates, lazily."""
+        for song in songs:
+            if not self.is_duplicate(song):
+                yield song
+
+    def report(self) -> str:
+        kept = self.seen - len(self.dropped)
+        return (f"{self.seen} songs, {kept} unique, {len(self.dropped)} exact duplicates dropped "
+                f"({len(self.dropped)} requests saved)")
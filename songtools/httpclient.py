@@ -0,0 +1,163 @@
+"""
+Shared HTTP layer for the scrapers: one pooled keep-alive session, compressed
+transfer negotiation and an optional on-disk response cache keyed by URL.
+
+With a cache directory, pages that were downloaded once can be parsed again
+with no network access at all (``offline=True``), which is how converter
+changes are tried against real pages. Online, a cached copy is only served
+while it is younger than the client's ``max_age`` (or the per-call one), and
+never for a conditional GET: a request carrying If-None-Match or
+If-Modified-Since is asking the server whether the page changed, so it always
+goes out.
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+try:
+    import brotli  # noqa: F401  (urllib3 decodes "br" only when this is installed)
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+
+
+def create_session(headers: Optional[Dict[str, str]] = None, pool_size: int = 10) -> requests.Session:
+    """A Session whose connection pool can keep `pool_size` connections per host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+class CachedResponse:
+    """The subset of requests.Response the scrapers use, rebuilt from the cache."""
+
+    from_cache = True
+
+    def __init__(self, url: str, status_code: int, headers: Dict[str, str], content: bytes, encoding: str):
+        self.url = url
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.encoding = encoding
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error (cached) for url: {self.url}")
+
+
+class ResponseCache:
+    """Stores successful response bodies on disk as <sha256(url)>.body + .json metadata."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".body", base + ".json"
+
+    def get(self, url: str, max_age: Optional[float] = None) -> Optional[CachedResponse]:
+        """The cached response for `url`, or None; with `max_age`, entries older than that many seconds miss."""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if max_age is not None and time.time() - meta.get("fetched_at", 0) >= max_age:
+                return None
+            with open(body_path, "rb") as f:
+                content = f.read()
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return CachedResponse(url, meta["status_code"], meta["headers"], content, meta["encoding"])
+
+    def put(self, url: str, resp: requests.Response) -> None:
+        body_path, meta_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        meta = {
+            "url": url,
+            "status_code": resp.status_code,
+            "headers": dict(resp.headers),
+            "encoding": resp.encoding or resp.apparent_encoding,
+            "fetched_at": time.time(),
+        }
+        # Body first, metadata last: a half-written entry is treated as a miss
+        with open(body_path + ".tmp", "wb") as f:
+            f.write(resp.content)
+        os.replace(body_path + ".tmp", body_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + ".tmp", meta_path)
+
+
+class HttpClient:
+    """
+    GETs through a shared session, the response cache and a rate limiter.
+    With `metrics`, network GETs are timed as "fetch" and rate limiter waits
+    as "rate_wait", and bytes and cache hits are counted. Cached copies older
+    than `max_age` seconds are fetched again (None: no expiry); offline, any
+    cached copy is served.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, cache: Optional[ResponseCache] = None,
+                 offline: bool = False, rate_limiter=None, timeout: float = 30, metrics=None,
+                 max_age: Optional[float] = None):
+        if offline and cache is None:
+            raise ValueError("offline mode needs a response cache")
+        self.session = session or create_session()
+        self.cache = cache
+        self.offline = offline
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.metrics = metrics
+        self.max_age = max_age
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, max_age: Optional[float] = None):
+        """GET `url`; `max_age` overrides the client's cache max age for this call (0: always fetch online)."""
+        if self.cache:
+            revalidating = any(name.lower() in CONDITIONAL_HEADERS for name in headers or {})
+            if self.offline:
+                cached = self.cache.get(url)
+            elif revalidating:
+                cached = None
+            else:
+                cached = self.cache.get(url, self.max_age if max_age is None else max_age)
+            if cached is not None:
+                if self.metrics:
+                    self.metrics.count("fetch_cache_hits")
+                    self.metrics.count("fetch_bytes", len(cached.content))
+                return cached
+            if self.offline:
+                raise requests.ConnectionError(f"Offline and not in cache: {url}")
+        # Only real network requests count against the per-host rate limit
+        started = time.perf_counter()
+        if self.rate_limiter:
+            self.rate_limiter.acquire(url)
+        fetch_started = time.perf_counter()
+        resp = self.session.get(url, headers=headers, timeout=self.timeout)
+        if self.metrics:
+            self.metrics.observe("rate_wait", fetch_started - started)
+            self.metrics.observe("fetch", time.perf_counter() - fetch_started)
+            self.metrics.count("fetch_requests")
+            self.metrics.count("fetch_bytes", len(resp.content))
+        if self.cache and resp.status_code == 200:
+            self.cache.put(url, resp)
+        return resp
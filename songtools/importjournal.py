@@ -0,0 +1,127 @@
+"""
+Local journal of songs sent to a backend, for resuming an import without
+duplicates.
+
+Every song is keyed by the API it was sent to and a hash of the exact payload.
+A row is written as "sent" before the request goes out and updated with the
+outcome when a definite answer arrives. On the next run, songs already
+"imported" (or reported as existing) are skipped without a request, and songs
+that failed with a definite answer (a 4xx) are sent again.
+
+The backend has no duplicate check, so a song whose request may have been
+applied is never simply resent: a row still "sent" (cut off mid-flight, or
+answered with a 5xx or a timeout) or a failure without a 4xx answer
+`needs_check`, and the importers look the song up by title and artist before
+sending it again.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS import_journal (
+    target       TEXT NOT NULL,
+    payload_hash TEXT NOT NULL,
+    title        TEXT,
+    status       TEXT NOT NULL,
+    song_id      TEXT,
+    http_status  INTEGER,
+    message      TEXT,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    updated_at   REAL NOT NULL,
+    PRIMARY KEY (target, payload_hash)
+)
+"""
+
+SENT = "sent"
+IMPORTED = "imported"
+EXISTS = "exists"
+FAILED = "failed"
+# Outcomes that need no further request
+DONE_STATUSES = (IMPORTED, EXISTS)
+
+
+def payload_hash(payload: Dict[str, Any]) -> str:
+    """Stable hash of an API payload, independent of key order."""
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ImportJournal:
+    """SQLite-backed journal for one target API, safe to share between threads."""
+
+    def __init__(self, path: str, target: str):
+        self.path = path
+        self.target = target
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, song_id, http_status, message, attempts, updated_at "
+                "FROM import_journal WHERE target = ? AND payload_hash = ?", (self.target, key)
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "status": row[0],
+            "song_id": row[1],
+            "http_status": row[2],
+            "message": row[3],
+            "attempts": row[4],
+            "updated_at": row[5],
+        }
+
+    def is_done(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return bool(entry and entry["status"] in DONE_STATUSES)
+
+    def needs_check(self, entry: Optional[Dict[str, Any]]) -> bool:
+        """True when an earlier request for `entry` may have created the song without confirming it."""
+        if not entry:
+            return False
+        if entry["status"] == SENT:
+            return True
+        return entry["status"] == FAILED and (entry["http_status"] is None or entry["http_status"] >= 500)
+
+    def begin(self, key: str, title: str) -> None:
+        """Record that a request for `key` is about to be sent."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO import_journal (target, payload_hash, title, status, attempts, updated_at) "
+                "VALUES (?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (target, payload_hash) DO UPDATE SET "
+                "status = excluded.status, attempts = attempts + 1, updated_at = excluded.updated_at",
+                (self.target, key, title, SENT, time.time()),
+            )
+            self._conn.commit()
+
+    def finish(self, key: str, status: str, song_id: Optional[str] = None,
+               http_status: Optional[int] = None, message: Optional[str] = None) -> None:
+        """Record the outcome of the request for `key`."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE import_journal SET status = ?, song_id = ?, http_status = ?, message = ?, updated_at = ? "
+                "WHERE target = ? AND payload_hash = ?",
+                (status, song_id, http_status, message, time.time(), self.target, key),
+            )
+            self._conn.commit()
+
+    def summary(self) -> Dict[str, int]:
+        """Row count per status for this target."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM import_journal WHERE target = ? GROUP BY status", (self.target,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,217 @@
+"""
+Append-only JSON Lines checkpoint files.
+
+Scrapers append one record per line as they go, so the cost of saving a song
+does not grow with the number already saved. `compact_jsonl` turns a
+checkpoint into the indented JSON array the importers read.
+
+The readers are streaming: `iter_records` yields songs one at a time from
+either a JSONL file or a JSON array, so memory stays flat however large the
+song file is.
+"""
+
+import json
+import os
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# A number or true/false/null runs up to the next separator; the decoder alone
+# would read "1" out of a buffer holding "1." when the file says "1.5"
+SCALAR_RE = re.compile(r"[^\s,\]]*")
+
+
+class JsonlSink:
+    """Appends records to a JSONL file, fsyncing every `fsync_every` records."""
+
+    def __init__(self, path: str, fsync_every: int = 25, truncate: bool = False):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.count = 0
+        self._unsynced = 0
+        self._file = open(path, "w" if truncate else "a", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Flushing every line means a crashed process loses nothing; fsync is batched
+        self._file.flush()
+        self.count += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self) -> None:
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self) -> "JsonlSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield records from a JSONL file, ignoring a torn last line left by a crash."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if next(f, None) is not None:
+                    raise
+                print(f"Ignoring incomplete last line in {path}")
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+        state = "start"  # start -> first -> (item -> sep -> next)*
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos == len(buf):
+                if eof:
+                    raise ValueError(f"Truncated JSON array in {path}")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = chunk, 0
+                continue
+            c = buf[pos]
+            if state == "start":
+                if c != "[":
+                    raise ValueError(f"{path} does not contain a JSON array")
+                pos += 1
+                state = "first"
+                continue
+            if state == "sep":
+                if c == "]":
+                    return
+                if c != ",":
+                    raise ValueError(f"Expected ',' or ']' at offset {pos} of the buffer in {path}")
+                pos += 1
+                state = "next"
+                continue
+            if state == "first" and c == "]":
+                return
+            scalar_end = SCALAR_RE.match(buf, pos).end() if c not in '{["' else None
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                item, end = None, None
+            if scalar_end is not None and end is not None and end != scalar_end:
+                end = None  # "1.x": only part of the token is a value
+            # An item running up to the end of the buffer may be cut short; a scalar is
+            # only complete once the separator after it has been read
+            if end is None or ((end == len(buf) or scalar_end == len(buf)) and not eof):
+                if eof:
+                    raise ValueError(f"Invalid JSON item in {path}")
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield item
+            pos = end
+            state = "sep"
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream records from a .jsonl file or a JSON array file."""
+    if path.endswith(".jsonl"):
+        return read_jsonl(path)
+    return iter_json_array(path)
+
+
+def write_json_atomic(records: List[Dict[str, Any]], path: str) -> None:
+    """Write `records` as an indented JSON array, replacing `path` in one step."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def compact_jsonl(jsonl_path: str, json_path: str,
+                  sort_key: Optional[Callable[[Dict[str, Any]], Any]] = None) -> int:
+    """Compact a JSONL checkpoint into a JSON array file. Returns the record count."""
+    records = list(read_jsonl(jsonl_path))
+    if sort_key:
+        records.sort(key=sort_key)
+    write_json_atomic(records, json_path)
+    return len(records)
+
+
+class JsonArrayWriter:
+    """
+    Streams records into a file laid out exactly like json.dump(records, f, indent=2).
+
+    Records go to `path` + ".tmp", which replaces `path` in one step on
+    close(), as in write_json_atomic. Leaving the with-block through an
+    exception calls abort() instead, so the previous file stays as it was.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.count = 0
+        self._file = open(self.tmp_path, "w", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        text = json.dumps(record, ensure_ascii=False, indent=2)
+        self._file.write("[\n" if self.count == 0 else ",\n")
+        self._file.write("\n".join("  " + line for line in text.split("\n")))
+        self.count += 1
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.write("\n]" if self.count else "[]")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        """Drop what was written and leave `path` untouched."""
+        if not self._file.closed:
+            self._file.close()
+            os.remove(self.tmp_path)
+
+    def __enter__(self) -> "JsonArrayWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class JsonlWriter(JsonArrayWriter):
+    """Like JsonArrayWriter, but one compact record per line (the format read_jsonl reads)."""
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.count += 1
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.tmp_path, self.path)
+
+
+def open_writer(path: str) -> JsonArrayWriter:
+    """A JsonlWriter for .jsonl paths and a JsonArrayWriter otherwise, matching iter_records."""
+    return JsonlWriter(path) if path.endswith(".jsonl") else JsonArrayWriter(path)
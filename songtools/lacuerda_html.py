@@ -0,0 +1,124 @@
+"""
+Field extraction for laCuerda pages with pluggable HTML backends.
+
+The scraper only needs a handful of elements from each page: the song links
+in ``<ul id="b_main">`` on the index, and the first ``<h1>``/``<h2>``, every
+``<pre>`` and the ``/genero/`` links on a song page. The ``lxml`` backend
+reads them with XPath over libxml2's tree, several times faster than building
+a BeautifulSoup tree with ``html.parser``; ``bs4`` is the original path and
+the reference for `check_parity`.
+
+Line breaks: libxml2 turns ``\r\n`` and a lone ``\r`` into ``\n`` while
+parsing, as the HTML spec's input preprocessing does, but ``html.parser``
+keeps them, so a page saved with CRLF line endings gave a different ``<pre>``
+text (and raw_text) per backend. The bs4 backend now normalizes line breaks
+the same way before parsing, and both backends return ``\n`` only.
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import lxml.html
+    HAVE_LXML = True
+except ImportError:
+    HAVE_LXML = False
+
+DEFAULT_BACKEND = "lxml" if HAVE_LXML else "bs4"
+
+
+def _normalize_newlines(html: str) -> str:
+    return html.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _bs4_index_links(html: str) -> Optional[List[str]]:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(_normalize_newlines(html), "html.parser")
+    main_ul = soup.find('ul', id='b_main')
+    if not main_ul:
+        return None
+    return [a['href'] for a in main_ul.find_all('a', href=True)]
+
+
+def _bs4_song_fields(html: str) -> Dict:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(_normalize_newlines(html), "html.parser")
+    h1 = soup.find("h1")
+    h2 = soup.find("h2")
+    return {
+        "h1": h1.text if h1 else None,
+        "h2": h2.text if h2 else None,
+        "pres": [pre.text for pre in soup.find_all("pre")],
+        "tags": [a.text for a in soup.select("a[href^='/genero/']")],
+    }
+
+
+def _lxml_tree(html: str):
+    # Parse bytes so documents carrying an encoding declaration are accepted
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    return lxml.html.document_fromstring(html.encode("utf-8"), parser=parser)
+
+
+def _lxml_index_links(html: str) -> Optional[List[str]]:
+    tree = _lxml_tree(html)
+    main_ul = tree.xpath("(//ul[@id='b_main'])[1]")
+    if not main_ul:
+        return None
+    return main_ul[0].xpath(".//a[@href]/@href")
+
+
+def _lxml_song_fields(html: str) -> Dict:
+    tree = _lxml_tree(html)
+    h1 = tree.xpath("(//h1)[1]")
+    h2 = tree.xpath("(//h2)[1]")
+    return {
+        "h1": h1[0].text_content() if h1 else None,
+        "h2": h2[0].text_content() if h2 else None,
+        "pres": [pre.text_content() for pre in tree.iter("pre")],
+        "tags": [a.text_content() for a in tree.xpath("//a[starts-with(@href, '/genero/')]")],
+    }
+
+
+BACKENDS = {
+    "bs4": (_bs4_index_links, _bs4_song_fields),
+    "lxml": (_lxml_index_links, _lxml_song_fields),
+}
+
+
+def _backend(name: Optional[str]):
+    name = name or DEFAULT_BACKEND
+    if name == "lxml" and not HAVE_LXML:
+        raise ValueError("The lxml backend needs the lxml package installed")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown HTML backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]
+
+
+def extract_index_links(html: str, backend: Optional[str] = None) -> Optional[List[str]]:
+    """Raw hrefs of the song list on the index page, or None if the list is missing."""
+    return _backend(backend)[0](html)
+
+
+def extract_song_fields(html: str, backend: Optional[str] = None) -> Dict:
+    """Texts of the first h1/h2, all pre blocks and the /genero/ links of a song page."""
+    return _backend(backend)[1](html)
+
+
+def check_parity(index_path: Optional[str], song_paths: Iterable[str],
+                 backend: str = DEFAULT_BACKEND, reference: str = "bs4") -> List[str]:
+    """Compare `backend` against `reference` on saved pages. Returns one message per mismatch."""
+    mismatches = []
+    if index_path:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        if extract_index_links(html, backend) != extract_index_links(html, reference):
+            mismatches.append(f"{index_path}: index links differ")
+    for path in song_paths:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            html = f.read()
+        got = extract_song_fields(html, backend)
+        expected = extract_song_fields(html, reference)
+        for field in expected:
+            if got[field] != expected[field]:
+                mismatches.append(f"{os.path.basename(path)}: '{field}' differs")
+    return mismatches
@@ -0,0 +1,134 @@
+"""
+Load-test driver for the production importers, run against songtools.mockbackend.
+
+For each --workers value a fresh mock backend is started in-process, the
+chosen importer is pointed at it and a fixed slice of songs is imported. The
+driver reports throughput, request latency percentiles and how often the
+backend pushed back, so concurrency and retry settings can be tuned without
+touching a real backend. Like the real one, the mock accepts a song it already
+has, so "duplicates" counts the extra copies a run created (resent requests,
+or duplicates in the input with --no-dedup):
+
+    python -m songtools.loadtest --importer pdf --limit 200 --workers 1,4,8,16 --throttle-rate 0.05
+"""
+
+import argparse
+import importlib.util
+import io
+import json
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+from typing import Any, Dict, List
+
+from songtools.mockbackend import add_config_arguments, config_from_args, start_in_thread
+from songtools.profiling import add_profile_arguments, start_profiling
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+IMPORTERS = {
+    "lacuerda": (os.path.join(ROOT, "lacuerda_scraper", "import_to_production.py"), "SongImporter"),
+    "pdf": (os.path.join(ROOT, "pdf_scraper", "import_to_production.py"), "PDFSongImporter"),
+}
+
+
+def load_importer(name: str):
+    """The importer module and class for `name`; both scripts share a module name, so load by path."""
+    path, class_name = IMPORTERS[name]
+    spec = importlib.util.spec_from_file_location(f"{name}_import_to_production", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module, getattr(module, class_name)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_once(importer_name: str, workers: int, limit: int, input_path: str,
+             args: argparse.Namespace) -> Dict[str, Any]:
+    module, importer_class = load_importer(importer_name)
+    server, api_url = start_in_thread(config_from_args(args))
+    try:
+        importer = importer_class("load.test.token", api_url, workers=workers, quiet=not args.verbose)
+        latencies: List[float] = []
+        importer.session.hooks["response"].append(
+            lambda resp, *a, **kw: latencies.append(resp.elapsed.total_seconds()))
+        output = sys.stdout if args.verbose else io.StringIO()
+        started = time.perf_counter()
+        with redirect_stdout(output):
+            importer.import_songs(importer.load_songs(input_path), limit=limit, dedup=not args.no_dedup)
+        elapsed = time.perf_counter() - started
+        served = dict(server.state.counts)
+    finally:
+        server.shutdown()
+        server.server_close()
+    latencies.sort()
+    stats = importer.stats
+    return {
+        "workers": workers,
+        "songs": stats["total"],
+        "imported": stats["success"],
+        "failed": stats["failed"],
+        "duplicates": served.get("duplicates_created", 0),
+        "requests": len(latencies),
+        "throttled": importer.throttle.throttled,
+        "final_concurrency": importer.throttle.limit,
+        "elapsed_s": round(elapsed, 3),
+        "songs_per_s": round(stats["total"] / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        "served": served,
+    }
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    columns = ["workers", "songs", "imported", "failed", "duplicates", "requests", "throttled",
+               "elapsed_s", "songs_per_s", "p50_ms", "p90_ms", "p99_ms", "max_ms"]
+    widths = [max(len(c), *(len(str(r[c])) for r in results)) for c in columns]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[c]).rjust(w) for c, w in zip(columns, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test an importer against the mock backend")
+    parser.add_argument("--importer", choices=sorted(IMPORTERS), default="pdf")
+    parser.add_argument("--input", help="Songs file (default: the importer's own songs file)")
+    parser.add_argument("--limit", type=int, default=200, help="Songs imported per run (default 200)")
+    parser.add_argument("--workers", default="1,4,8,16",
+                        help="Comma-separated concurrency levels to compare (default 1,4,8,16)")
+    parser.add_argument("--no-dedup", action="store_true", help="Disable client-side dedup in the importer")
+    parser.add_argument("--verbose", action="store_true", help="Show the importer's own output")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    add_config_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args, "loadtest")
+
+    input_path = args.input or load_importer(args.importer)[0].SONGS_FILE_PATH
+    levels = [int(w) for w in args.workers.split(",") if w.strip()]
+    print(f"Importing {args.limit} songs from {input_path} with the {args.importer} importer; "
+          f"mock latency {args.latency}s+{args.jitter}s, 429 {args.throttle_rate:.0%}, "
+          f"500 {args.error_rate:.0%}, injected 409 {args.conflict_rate:.0%}")
+    results = []
+    for workers in levels:
+        result = run_once(args.importer, workers, args.limit, input_path, args)
+        print(f"  workers={workers}: {result['songs_per_s']} songs/s, p99 {result['p99_ms']} ms")
+        results.append(result)
+    print()
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Single-pass merging of a chord line into a lyric line as ChordPro.
+
+Both functions take the chord positions already found by
+`songtools.chords.classify_line` and build the merged line with one
+``str.join``, so a line with k chords costs O(n + k) instead of one
+slice-and-concatenate per chord.
+"""
+
+from typing import Iterable, List, Tuple
+
+Token = Tuple[int, str]
+
+
+def _emit(placements: Iterable[Token], lyric: str) -> str:
+    """Join `lyric` with each chord inserted at its (non-decreasing) lyric index."""
+    parts: List[str] = []
+    prev = 0
+    for at, chord in placements:
+        if at < prev:
+            at = prev
+        parts.append(lyric[prev:at])
+        parts.append(f"[{chord}]")
+        prev = at
+    parts.append(lyric[prev:])
+    return "".join(parts)
+
+
+def merge_at_columns(chords: Iterable[Token], lyric: str) -> str:
+    """
+    Insert each chord at the lyric column it sits above (laCuerda two-line format).
+    Chords past the end of the lyric are appended after it, in order.
+    """
+    end = len(lyric)
+    return _emit(((pos if pos < end else end, chord) for pos, chord in chords), lyric)
+
+
+def merge_proportional(chords: Iterable[Token], chords_width: int, lyric: str) -> str:
+    """
+    Insert each chord at the same relative position in the lyric as in a chord
+    line `chords_width` characters wide (text extracted from PDFs, where columns
+    do not line up).
+    """
+    end = len(lyric)
+    if not end or not chords_width:
+        return lyric
+    return _emit(((min(int((pos / chords_width) * end), end), chord) for pos, chord in chords), lyric)
+
+
+def bracket_chords(chords: Iterable[Token], line: str) -> str:
+    """Wrap each chord token of `line` in brackets, leaving the rest untouched."""
+    parts: List[str] = []
+    prev = 0
+    for pos, chord in chords:
+        parts.append(line[prev:pos])
+        parts.append(f"[{chord}]")
+        prev = pos + len(chord)
+    parts.append(line[prev:])
+    return "".join(parts)
@@ -0,0 +1,190 @@
+"""
+Per-stage timings and counters for the scraper and importer pipelines.
+
+A Metrics object collects, for one run:
+
+- a latency histogram per stage ("fetch", "parse", "convert", "write",
+  "http_post", "tag_post", ...), fed with `with metrics.time(stage):` or
+  observe();
+- plain counters (bytes fetched and sent, retries, cache hits, ...), fed with
+  count().
+
+Stages are timed on every thread that runs them, so with a worker pool the
+time summed over a stage can exceed the wall time of the run; stages can also
+nest (a song's "convert" is part of its "parse"). Recording is a
+perf_counter pair and a short lock per event, cheap enough to leave on.
+
+At the end of a run, print_summary() shows where the time went and write()
+saves everything, as Prometheus text format when the path ends in ".prom"
+(for node_exporter's textfile collector) and as JSON otherwise.
+"""
+
+import bisect
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Upper bounds in seconds, from a cached page parse to a slow backend call
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROMETHEUS_PREFIX = "choirapp"
+
+
+class Histogram:
+    """Observation counts per latency bucket, plus count, sum and max."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.bounds = list(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last slot: above the largest bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets, interpolating linearly inside one as Prometheus does."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(self.max, lower + (upper - lower) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+    def labels(self) -> List[str]:
+        """Bucket upper bounds as Prometheus "le" labels."""
+        return [f"{bound:g}" for bound in self.bounds] + ["+Inf"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 6),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5) * 1000, 3),
+            "p95_ms": round(self.quantile(0.95) * 1000, 3),
+            "p99_ms": round(self.quantile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "buckets": dict(zip(self.labels(), self.counts)),
+        }
+
+
+class Metrics:
+    """Stage histograms and counters for one run, safe to share between threads."""
+
+    def __init__(self, run: str, buckets=LATENCY_BUCKETS):
+        self.run = run
+        self.buckets = buckets
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {}
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Time the body of a with-block as one `stage` event (also when it raises)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def timed_iter(self, stage: str, items: Iterable[Any]) -> Iterator[Any]:
+        """Yield from `items`, timing each wait for the next item as a `stage` event."""
+        iterator = iter(items)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe(stage, time.perf_counter() - started)
+            yield item
+
+    def count(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "run": self.run,
+                "started_at": self.started_at,
+                "elapsed_s": round(self.elapsed(), 3),
+                "stages": {name: h.to_dict() for name, h in self.stages.items()},
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self) -> str:
+        run = self.run.replace("\\", "\\\\").replace('"', '\\"')
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_stage_seconds Time spent per pipeline stage",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, h in sorted(self.stages.items()):
+                labels = f'run="{run}",stage="{stage}"'
+                cumulative = 0
+                for le, n in zip(h.labels(), h.counts):
+                    cumulative += n
+                    lines.append(f'{PROMETHEUS_PREFIX}_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"{PROMETHEUS_PREFIX}_stage_seconds_sum{{{labels}}} {h.total:.6f}")
+                lines.append(f"{PROMETHEUS_PREFIX}_stage_seconds_count{{{labels}}} {h.count}")
+            for name, value in sorted(self.counters.items()):
+                metric = f"{PROMETHEUS_PREFIX}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f'{metric}{{run="{run}"}} {value:g}')
+        metric = f"{PROMETHEUS_PREFIX}_run_seconds"
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f'{metric}{{run="{run}"}} {self.elapsed():.3f}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str) -> None:
+        """Save as Prometheus text (".prom") or JSON, replacing `path` in one step."""
+        data = self.to_prometheus() if path.endswith(".prom") else json.dumps(self.snapshot(), indent=2)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def summary_lines(self) -> List[str]:
+        elapsed = self.elapsed()
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda item: -item[1].total)
+            counters = sorted(self.counters.items())
+        lines = [f"{'stage':12} {'count':>7} {'total s':>9} {'% wall':>7} {'mean ms':>9} "
+                 f"{'p95 ms':>9} {'max ms':>9}"]
+        for name, h in stages:
+            lines.append(f"{name:12} {h.count:7d} {h.total:9.2f} {h.total / elapsed:7.0%} "
+                         f"{h.total / h.count * 1000:9.1f} {h.quantile(0.95) * 1000:9.1f} {h.max * 1000:9.1f}")
+        if counters:
+            lines.append("  ".join(f"{name}={value:,g}" for name, value in counters))
+        return lines
+
+    def print_summary(self, title: Optional[str] = None) -> None:
+        print(f"\n{title or 'Stage timings'} ({self.elapsed():.1f}s wall; stages run concurrently can exceed 100%)")
+        for line in self.summary_lines():
+            print(f"  {line}")
@@ -0,0 +1,245 @@
+"""
+Stand-in for the ChoirApp song API, for exercising the importers offline.
+
+Implements the routes the importers use:
+
+    GET  /api/health
+    GET  /api/songs/search          ?title=&artist=&skip=&take=, substring matches, paged
+    POST /api/songs                 201 {"songId": ...}, also for a song it already has
+    POST /api/songs/{id}/tags       204, 404 for an unknown song
+
+Every POST can be delayed and made to fail: `latency` seconds plus uniform
+`jitter`, then a 429 (with Retry-After) with probability `throttle_rate`, a
+500 with `error_rate` and a 409 with `conflict_rate`. Like the real backend,
+POST /api/songs has no duplicate check: a second song with the same title,
+artist and content is created too, and counted as "duplicates_created"
+(songbooks do repeat titles, so title and artist alone would count distinct
+songs). A Bearer token is
+required unless `require_auth` is off. GET /api/mock/stats returns the
+request counters.
+
+    python -m songtools.mockbackend --port 5099 --latency 0.05 --throttle-rate 0.05
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+from typing import Any, Dict, Optional
+
+TAGS_PATH_RE = re.compile(r"^/api/songs/([^/]+)/tags/?$")
+
+
+class MockConfig:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, conflict_rate: float = 0.0, retry_after: float = 1.0,
+                 require_auth: bool = True, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.conflict_rate = conflict_rate
+        self.retry_after = retry_after
+        self.require_auth = require_auth
+        self.seed = seed
+
+
+class MockState:
+    """Songs, tags and counters shared by the handler threads."""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.songs: Dict[str, Dict[str, Any]] = {}
+        self.song_keys: Dict[tuple, int] = {}  # (title, artist, content) -> copies created
+        self.tags: Dict[str, set] = {}
+        self.counts: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def count(self, key: str) -> None:
+        with self.lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def roll(self, rate: float) -> bool:
+        with self.lock:
+            return rate > 0 and self.random.random() < rate
+
+    def delay(self) -> float:
+        with self.lock:
+            return self.config.latency + (self.random.uniform(0, self.config.jitter) if self.config.jitter else 0)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: MockState  # set on the subclass built by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, body: Any = None, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.state.count(f"status_{status}")
+
+    def read_json(self) -> Optional[Dict[str, Any]]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"null")
+        except ValueError:
+            return None
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        if path == "/api/health":
+            self.send_json(200, {"status": "Healthy"})
+        elif path == "/api/songs/search":
+            self.search_songs(parse_qs(self.path.split("?", 1)[1] if "?" in self.path else ""))
+        elif path == "/api/mock/stats":
+            with self.state.lock:
+                stats = dict(self.state.counts, songs=len(self.state.songs))
+            self.send_json(200, stats)
+        else:
+            self.send_json(404, {"message": "Not found"})
+
+    def do_POST(self):
+        state = self.state
+        config = state.config
+        body = self.read_json()
+        state.count("requests")
+        time.sleep(state.delay())
+        if config.require_auth and not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            self.send_json(401, {"message": "Unauthorized"})
+            return
+        if state.roll(config.throttle_rate):
+            self.send_json(429, {"message": "Too many requests"}, {"Retry-After": f"{config.retry_after:g}"})
+            return
+        if state.roll(config.error_rate):
+            self.send_json(500, {"message": "Injected server error"})
+            return
+        path = self.path.split("?", 1)[0]
+        tags_match = TAGS_PATH_RE.match(path)
+        if path.rstrip("/") == "/api/songs":
+            self.create_song(body)
+        elif tags_match:
+            self.add_tag(tags_match.group(1), body)
+        else:
+            self.send_json(404, {"message": "Not found"})
+
+    def create_song(self, body: Optional[Dict[str, Any]]) -> None:
+        state = self.state
+        if not isinstance(body, dict) or not (body.get("title") or "").strip() or not (body.get("content") or "").strip():
+            self.send_json(400, {"message": "Title and content are required"})
+            return
+        if state.roll(state.config.conflict_rate):
+            self.send_json(409, {"message": "Injected conflict"})
+            return
+        key = (body["title"].strip().lower(), (body.get("artist") or "").strip().lower(), body["content"].strip())
+        song_id = str(uuid.uuid4())
+        with state.lock:
+            copies = state.song_keys.get(key, 0)
+            state.song_keys[key] = copies + 1
+            state.songs[song_id] = body
+            state.tags[song_id] = {t.strip().lower() for t in body.get("tags") or [] if t.strip()}
+        if copies:
+            state.count("duplicates_created")
+        self.send_json(201, {"songId": song_id})
+
+    def search_songs(self, query: Dict[str, list]) -> None:
+        state = self.state
+        state.count("searches")
+        if state.config.require_auth and not (self.headers.get("Authorization") or "").startswith("Bearer "):
+            self.send_json(401, {"message": "Unauthorized"})
+            return
+        title = (query.get("title") or [""])[0].strip().lower()
+        artist = (query.get("artist") or [""])[0].strip().lower()
+        skip = int((query.get("skip") or ["0"])[0])
+        take = int((query.get("take") or ["50"])[0])
+        with state.lock:
+            matches = [dict(song, songId=song_id) for song_id, song in state.songs.items()
+                       if title in song["title"].lower() and artist in (song.get("artist") or "").lower()]
+        self.send_json(200, {"songs": matches[skip:skip + take], "totalCount": len(matches),
+                             "skip": skip, "take": take, "hasMore": skip + take < len(matches)})
+
+    def add_tag(self, song_id: str, body: Optional[Dict[str, Any]]) -> None:
+        state = self.state
+        tag = (body or {}).get("tagName", "") if isinstance(body, dict) else ""
+        if not tag.strip():
+            self.send_json(400, {"message": "tagName is required"})
+            return
+        with state.lock:
+            tags = state.tags.get(song_id)
+            if tags is not None:
+                tags.add(tag.strip().lower())
+        if tags is None:
+            self.send_json(404, {"message": "Song not found"})
+            return
+        self.send_json(204)
+
+
+def make_server(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """A ready-to-serve mock backend; port 0 picks a free port (see server.server_address)."""
+    handler = type("BoundMockHandler", (MockHandler,), {"state": MockState(config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.state = handler.state
+    return server
+
+
+def start_in_thread(config: MockConfig, host: str = "127.0.0.1", port: int = 0):
+    """Serve in a daemon thread; returns (server, api_url)."""
+    server = make_server(config, host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/api"
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every POST (default 0.05)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="Extra uniform random seconds (default 0.02)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a 500 answer")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Probability of a 429 answer")
+    parser.add_argument("--conflict-rate", type=float, default=0.0, help="Probability of an injected 409 answer")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--no-auth", action="store_true", help="Accept requests without a Bearer token")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible failure injection")
+
+
+def config_from_args(args: argparse.Namespace) -> MockConfig:
+    return MockConfig(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                      throttle_rate=args.throttle_rate, conflict_rate=args.conflict_rate,
+                      retry_after=args.retry_after, require_auth=not args.no_auth, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock ChoirApp song API for import testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5099)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    server = make_server(config_from_args(args), args.host, args.port)
+    host, port = server.server_address[:2]
+    print(f"Mock ChoirApp API on http://{host}:{port}/api (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served: {json.dumps(server.state.counts)}")
+
+
+if __name__ == "__main__":
+    main()
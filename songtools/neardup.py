@@ -0,0 +1,236 @@
+"""
+Near-duplicate song detection across sources with MinHash and LSH.
+
+The same hymn often shows up in the laCuerda and PDF feeds with a slightly
+different title, chord spelling (LA vs A) or spacing. Songs are compared on
+their lyrics only: chords, directives and accents are stripped and the words
+are cut into overlapping word shingles. Each shingle set is summarised by a
+MinHash signature, and the signatures are split into LSH bands so that only
+songs sharing a band are ever compared. Candidate pairs are then confirmed
+with the exact Jaccard similarity of their shingle sets.
+
+Run as a script to get merge suggestions before import:
+
+    python -m songtools.neardup lacuerda_scraper/lacuerda_songs.json pdf_scraper/pdf_songs_full.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+import sys
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from songtools.chords import CHORD_RE
+from songtools.profiling import add_profile_arguments, start_profiling
+
+SHINGLE_SIZE = 3  # words per shingle
+NUM_PERM = 128  # MinHash signature length
+BANDS = 32  # LSH bands of NUM_PERM // BANDS rows; candidate threshold ~ (1/BANDS) ** (1/rows)
+THRESHOLD = 0.5  # minimum Jaccard similarity reported
+OUTPUT_FILE = "near_duplicates.json"
+
+# Mersenne prime for the universal hash family h(x) = (a*x + b) mod P
+MERSENNE_PRIME = (1 << 61) - 1
+SEED = 1
+
+BRACKETED_RE = re.compile(r"\[[^\]]*\]")
+DIRECTIVE_RE = re.compile(r"\{[^}]*\}")
+NON_WORD_RE = re.compile(r"[^\w\s]")
+WORD_RE = re.compile(r"[^\W\d_]+")
+
+
+def lyric_words(chordpro: str) -> List[str]:
+    """The lyric words of a ChordPro song: no chords, directives, accents or case."""
+    text = DIRECTIVE_RE.sub(" ", BRACKETED_RE.sub("", chordpro or ""))
+    words = []
+    for line in text.splitlines():
+        tokens = line.split()
+        # Two-line chord rows that were never merged are not lyrics either
+        if tokens and all(CHORD_RE.fullmatch(token) for token in tokens):
+            continue
+        words.extend(tokens)
+    text = unicodedata.normalize("NFKD", " ".join(words).casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return WORD_RE.findall(NON_WORD_RE.sub(" ", text))
+
+
+def shingles(words: List[str], size: int = SHINGLE_SIZE) -> Set[int]:
+    """64-bit hashes of every run of `size` consecutive words (the whole text if shorter)."""
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = (" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return {struct.unpack("<Q", hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest())[0] for g in grams}
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """NUM_PERM seeded universal hash functions; same seed, same signatures."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = SEED):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+                       for _ in range(num_perm)]
+
+    def signature(self, shingle_set: Set[int]) -> Tuple[int, ...]:
+        values = list(shingle_set)
+        return tuple(min((a * x + b) % MERSENNE_PRIME for x in values) for a, b in self.params)
+
+
+class LSHIndex:
+    """Buckets signatures by band; items sharing any bucket are candidate pairs."""
+
+    def __init__(self, num_perm: int = NUM_PERM, bands: int = BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+
+    def add(self, item: int, signature: Tuple[int, ...]) -> None:
+        for band in range(self.bands):
+            start = band * self.rows
+            self.buckets[(band, signature[start:start + self.rows])].append(item)
+
+    def candidate_pairs(self) -> Set[Tuple[int, int]]:
+        pairs = set()
+        for items in self.buckets.values():
+            if len(items) > 1:
+                for i, a in enumerate(items):
+                    for b in items[i + 1:]:
+                        pairs.add((a, b) if a < b else (b, a))
+        return pairs
+
+
+def find_near_duplicates(songs: List[Dict[str, Any]], threshold: float = THRESHOLD,
+                         cross_source_only: bool = False) -> List[Tuple[int, int, float]]:
+    """
+    (i, j, similarity) for every pair of `songs` whose lyric shingles have a
+    Jaccard similarity of at least `threshold`. Each song may carry a
+    "_source" key; with `cross_source_only`, pairs from one source are ignored.
+    """
+    hasher = MinHasher()
+    index = LSHIndex()
+    shingle_sets = []
+    for i, song in enumerate(songs):
+        shingle_set = shingles(lyric_words(song.get("chordpro", "")))
+        shingle_sets.append(shingle_set)
+        if shingle_set:
+            index.add(i, hasher.signature(shingle_set))
+    pairs = []
+    for a, b in sorted(index.candidate_pairs()):
+        if cross_source_only and songs[a].get("_source") == songs[b].get("_source"):
+            continue
+        similarity = jaccard(shingle_sets[a], shingle_sets[b])
+        if similarity >= threshold:
+            pairs.append((a, b, similarity))
+    return pairs
+
+
+def clusters(pairs: Iterable[Tuple[int, int, float]]) -> List[List[int]]:
+    """Connected groups of song indexes (union-find over the pairs)."""
+    parent: Dict[int, int] = {}
+
+    def find(x: int) -> int:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b, _ in pairs:
+        parent[find(a)] = find(b)
+    groups: Dict[int, List[int]] = defaultdict(list)
+    for x in list(parent):
+        groups[find(x)].append(x)
+    return sorted(sorted(group) for group in groups.values())
+
+
+def keep_score(song: Dict[str, Any]) -> Tuple[int, int]:
+    """Prefer the version with the most chords, then the longest body."""
+    body = song.get("chordpro", "")
+    return len(BRACKETED_RE.findall(body)), len(body)
+
+
+def merge_suggestions(songs: List[Dict[str, Any]], pairs: List[Tuple[int, int, float]]) -> List[Dict[str, Any]]:
+    similarity = {(a, b): s for a, b, s in pairs}
+
+    def describe(i: int) -> Dict[str, Any]:
+        song = songs[i]
+        return {"source": song.get("_source"), "index": song.get("_index"),
+                "title": song.get("title"), "artist": song.get("artist")}
+
+    suggestions = []
+    for group in clusters(pairs):
+        keep = max(group, key=lambda i: keep_score(songs[i]))
+        duplicates = []
+        for i in group:
+            if i != keep:
+                entry = describe(i)
+                pair = (min(i, keep), max(i, keep))
+                entry["similarity"] = round(similarity[pair], 3) if pair in similarity else None
+                duplicates.append(entry)
+        suggestions.append({"keep": describe(keep), "merge": duplicates})
+    return suggestions
+
+
+def load_sources(paths: List[str]) -> List[Dict[str, Any]]:
+    songs = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for i, song in enumerate(json.load(f)):
+                song = dict(song)
+                song["_source"] = os.path.basename(path)
+                song["_index"] = i
+                songs.append(song)
+    return songs
+
+
+def main():
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    default_sources = [os.path.join(root, "lacuerda_scraper", "lacuerda_songs.json"),
+                       os.path.join(root, "pdf_scraper", "pdf_songs_full.json")]
+    parser = argparse.ArgumentParser(description="Suggest merges for near-duplicate songs across song files")
+    parser.add_argument("files", nargs="*", default=default_sources,
+                        help="Scraped song JSON files (default: the laCuerda and PDF outputs)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help=f"Minimum lyric Jaccard similarity (default {THRESHOLD})")
+    parser.add_argument("--cross-source", action="store_true",
+                        help="Only report pairs that come from different files")
+    parser.add_argument("--output", default=OUTPUT_FILE,
+                        help=f"Where to write the merge suggestions (default {OUTPUT_FILE})")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args, "neardup")
+
+    songs = load_sources(args.files)
+    print(f"Indexing {len(songs)} songs from {len(args.files)} files "
+          f"({NUM_PERM} hashes, {BANDS} bands of {NUM_PERM // BANDS})...")
+    pairs = find_near_duplicates(songs, threshold=args.threshold, cross_source_only=args.cross_source)
+    suggestions = merge_suggestions(songs, pairs)
+    for suggestion in suggestions:
+        keep = suggestion["keep"]
+        print(f"KEEP  {keep['title']} [{keep['source']} #{keep['index']}]")
+        for dup in suggestion["merge"]:
+            similarity = f"{dup['similarity']:.2f}" if dup["similarity"] is not None else "via group"
+            print(f"  ~ {similarity}  {dup['title']} [{dup['source']} #{dup['index']}]")
+    merged = sum(len(s["merge"]) for s in suggestions)
+    print(f"{len(pairs)} similar pairs, {len(suggestions)} groups, {merged} songs could be merged away")
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(suggestions, f, ensure_ascii=False, indent=2)
+    print(f"Saved merge suggestions to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
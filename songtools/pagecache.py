@@ -0,0 +1,183 @@
+"""
+Page-level cache for incremental PDF re-extraction.
+
+Extracted text is stored under a hash of each page's content streams, the
+resources they draw with (fonts, XObjects, ...) and its page boxes, so only
+pages whose content changed go through pdfplumber's text extraction again. When the PDF file itself is unchanged, its page hashes are reused too
+and the PDF is not opened at all. Parsed songs are stored under a hash of
+their raw text plus a parser version, so a parser change re-parses every
+song without re-extracting anything.
+"""
+
+import hashlib
+import json
+import sqlite3
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    file_hash   TEXT NOT NULL,
+    first_page  INTEGER NOT NULL,
+    page_hashes TEXT NOT NULL,
+    PRIMARY KEY (file_hash, first_page)
+);
+CREATE TABLE IF NOT EXISTS page_text (
+    page_hash TEXT PRIMARY KEY,
+    text      TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS parsed_songs (
+    text_hash      TEXT NOT NULL,
+    parser_version TEXT NOT NULL,
+    record_json    TEXT NOT NULL,
+    PRIMARY KEY (text_hash, parser_version)
+);
+"""
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def page_content_hash(page, memo: Optional[Dict[int, bytes]] = None) -> str:
+    """
+    Hash of what a pdfplumber page's text depends on, without layout analysis:
+    its decoded content streams, its resolved /Resources (a swapped font
+    changes the text a show-text operator yields even when the content stream
+    is byte-identical) and its MediaBox, CropBox and rotation. Indirect objects
+    are shared between pages, so pass the same `memo` dict for every page of a
+    document to hash each font file or image once.
+    """
+    from pdfminer.pdftypes import resolve1
+
+    obj = page.page_obj
+    memo = {} if memo is None else memo
+    digest = hashlib.sha256()
+    for stream in obj.contents:
+        digest.update(resolve1(stream).get_data())
+    digest.update(b"\0resources\0")
+    digest.update(_walk_pdf_object(obj.resources, memo, set())[0])
+    digest.update(repr((obj.mediabox, obj.cropbox, obj.rotate)).encode())
+    return digest.hexdigest()
+
+
+def _walk_pdf_object(obj, memo: Dict[int, bytes], active: Set[int]) -> Tuple[bytes, bool]:
+    """
+    (digest, closed) of a PDF object with indirect references followed. A
+    reference back into the current path hashes as its object number; such a
+    digest depends on where the walk started, so it is not `closed` and not
+    memoized.
+    """
+    from pdfminer.psparser import PSLiteral
+    from pdfminer.pdftypes import PDFObjRef, PDFStream
+
+    if isinstance(obj, PDFObjRef):
+        if obj.objid in memo:
+            return memo[obj.objid], True
+        if obj.objid in active:
+            return b"ref:%d" % obj.objid, False
+        active.add(obj.objid)
+        try:
+            value = obj.resolve()
+        except Exception:
+            value = None  # a dangling reference reads as null, as pdfminer itself does
+        result, closed = _walk_pdf_object(value, memo, active)
+        active.discard(obj.objid)
+        if closed:
+            memo[obj.objid] = result
+        return result, closed
+    digest = hashlib.sha256()
+    closed = True
+    if isinstance(obj, PDFStream):
+        digest.update(b"stream")
+        children = [obj.attrs]
+        digest.update(obj.get_rawdata() or b"")
+    elif isinstance(obj, dict):
+        digest.update(b"dict")
+        children = []
+        for key in sorted(obj, key=str):
+            digest.update(str(key).encode("utf-8", "surrogateescape"))
+            children.append(obj[key])
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b"list")
+        children = obj
+    else:
+        children = []
+        if isinstance(obj, PSLiteral):
+            digest.update(b"name:" + str(obj.name).encode("utf-8", "surrogateescape"))
+        elif isinstance(obj, bytes):
+            digest.update(b"bytes:" + obj)
+        else:
+            digest.update(repr(obj).encode("utf-8", "surrogateescape"))
+    for child in children:
+        child_digest, child_closed = _walk_pdf_object(child, memo, active)
+        digest.update(child_digest)
+        closed = closed and child_closed
+    return digest.digest(), closed
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """SQLite store for page hashes, extracted page text and parsed songs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(SCHEMA)
+        self.stats = {"text_hits": 0, "text_misses": 0, "parse_hits": 0, "parse_misses": 0}
+
+    def document_pages(self, doc_hash: str, first_page: int) -> Optional[List[Tuple[int, str]]]:
+        """(page_number, page_hash) pairs recorded for this exact file, if any."""
+        row = self._conn.execute(
+            "SELECT page_hashes FROM documents WHERE file_hash = ? AND first_page = ?",
+            (doc_hash, first_page),
+        ).fetchone()
+        return [tuple(pair) for pair in json.loads(row[0])] if row else None
+
+    def save_document(self, doc_hash: str, first_page: int, pages: List[Tuple[int, str]]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents (file_hash, first_page, page_hashes) VALUES (?, ?, ?)",
+            (doc_hash, first_page, json.dumps(pages)),
+        )
+        self._conn.commit()
+
+    def has_text(self, page_hash: str) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM page_text WHERE page_hash = ?", (page_hash,)
+        ).fetchone() is not None
+
+    def get_text(self, page_hash: str) -> Optional[str]:
+        row = self._conn.execute("SELECT text FROM page_text WHERE page_hash = ?", (page_hash,)).fetchone()
+        return row[0] if row else None
+
+    def put_text(self, page_hash: str, text: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO page_text (page_hash, text) VALUES (?, ?)", (page_hash, text))
+        self._conn.commit()
+
+    def get_parsed(self, raw_text: str, parser_version: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Returns (found, record); a stored record may be None for text that did not parse."""
+        row = self._conn.execute(
+            "SELECT record_json FROM parsed_songs WHERE text_hash = ? AND parser_version = ?",
+            (text_hash(raw_text), parser_version),
+        ).fetchone()
+        if row is None:
+            self.stats["parse_misses"] += 1
+            return False, None
+        self.stats["parse_hits"] += 1
+        return True, json.loads(row[0])
+
+    def put_parsed(self, raw_text: str, parser_version: str, record: Optional[Dict[str, Any]]) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO parsed_songs (text_hash, parser_version, record_json) VALUES (?, ?, ?)",
+            (text_hash(raw_text), parser_version, json.dumps(record, ensure_ascii=False)),
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
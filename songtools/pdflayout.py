@@ -0,0 +1,168 @@
+"""
+Layout-aware text extraction for songbook PDFs.
+
+``page.extract_text()`` collapses the spacing above each lyric, so the text
+pipeline can only place chords proportionally. Here the page's glyphs
+(``page.chars``) are grouped into lines once, and every chord of a chord line
+is placed above the lyric glyph whose centre is at or right of the chord's
+left edge (a bisect over that line's sorted glyph centres). Chord/lyric
+pairs come out already merged as ChordPro (``[DO]Hola``); chord lines with
+no lyric under them, and all other lines, are returned as plain text.
+
+Neither mode keeps vertical space, and pdfplumber reports no type styles in
+text, yet both are what sets a song title apart from an upper-case chorus
+line. So both modes put a blank line before every line that follows extra
+vertical space (a blank line on the page) or is set larger or bolder than the
+page's body text (`separated_lines`).
+"""
+
+from bisect import bisect_left
+from collections import Counter
+from statistics import median
+from typing import Any, Dict, List, Tuple
+
+from songtools.chords import classify_line
+from songtools.merge import merge_at_columns
+
+X_TOLERANCE = 3  # same gap pdfplumber's extract_text() turns into a space
+Y_TOLERANCE = 3  # glyphs whose tops differ by less than this share a line
+TITLE_SIZE_RATIO = 1.15  # a line this much larger than the body text is set as a title
+BLANK_LINE_RATIO = 1.5  # a gap above a line this much wider than the usual line pitch is a blank line
+
+Char = Dict[str, Any]
+
+
+class LayoutLine:
+    """A text line with the x extent of every character of `text`."""
+
+    __slots__ = ("text", "x0", "centers", "top", "bottom")
+
+    def __init__(self, text: str, x0: List[float], centers: List[float], top: float, bottom: float):
+        self.text = text
+        self.x0 = x0
+        self.centers = centers
+        self.top = top
+        self.bottom = bottom
+
+
+def group_lines(chars: List[Char], y_tolerance: float = Y_TOLERANCE) -> List[List[Char]]:
+    """Cluster glyphs into lines by their top coordinate, top to bottom."""
+    lines: List[List[Char]] = []
+    line_top = None
+    for char in sorted(chars, key=lambda c: (round(c["top"], 1), c["x0"])):
+        if line_top is None or char["top"] - line_top > y_tolerance:
+            lines.append([])
+            line_top = char["top"]
+        lines[-1].append(char)
+    return lines
+
+
+def build_line(chars: List[Char], x_tolerance: float = X_TOLERANCE) -> LayoutLine:
+    """Join one line's glyphs left to right, inserting a space wherever there is a gap."""
+    chars = sorted(chars, key=lambda c: c["x0"])
+    text: List[str] = []
+    x0: List[float] = []
+    centers: List[float] = []
+    prev_x1 = None
+    for char in chars:
+        if char["text"].isspace():
+            continue
+        if prev_x1 is not None and char["x0"] - prev_x1 > x_tolerance:
+            text.append(" ")
+            x0.append(prev_x1)
+            centers.append((prev_x1 + char["x0"]) / 2)
+        text.append(char["text"])
+        x0.append(char["x0"])
+        centers.append((char["x0"] + char["x1"]) / 2)
+        prev_x1 = char["x1"]
+    top = min((c["top"] for c in chars), default=0.0)
+    bottom = max((c["bottom"] for c in chars), default=0.0)
+    return LayoutLine("".join(text), x0, centers, top, bottom)
+
+
+def merge_by_position(chord_line: LayoutLine, chords: List[Tuple[int, str]], lyric_line: LayoutLine) -> str:
+    """Insert each chord before the first lyric glyph centred at or right of the chord's left edge."""
+    placements = [(bisect_left(lyric_line.centers, chord_line.x0[pos]), chord) for pos, chord in chords]
+    return merge_at_columns(placements, lyric_line.text)
+
+
+def _is_bold(char: Char) -> bool:
+    return "bold" in str(char.get("fontname", "")).lower()
+
+
+def separated_lines(grouped: List[List[Char]]) -> List[bool]:
+    """
+    For each line of `grouped` (from group_lines), whether it is set apart
+    from the line above: by a gap wider than the page's usual line pitch, or
+    by a larger size or a bold face when the page's body text (the style most
+    glyphs use) is neither.
+    """
+    glyphs = [c for line in grouped for c in line]
+    if not glyphs:
+        return []
+    body_size = Counter(round(c["size"], 1) for c in glyphs).most_common(1)[0][0]
+    body_bold = sum(map(_is_bold, glyphs)) * 2 > len(glyphs)
+    tops = [min(c["top"] for c in line) for line in grouped]
+    gaps = [below - above for above, below in zip(tops, tops[1:])]
+    pitch = Counter(round(gap, 1) for gap in gaps).most_common(1)[0][0] if gaps else 0.0
+    separated = []
+    for i, line in enumerate(grouped):
+        larger = median(c["size"] for c in line) >= body_size * TITLE_SIZE_RATIO
+        bolder = not body_bold and sum(map(_is_bold, line)) * 2 > len(line)
+        spaced = i > 0 and gaps[i - 1] > pitch * BLANK_LINE_RATIO
+        separated.append(larger or bolder or spaced)
+    return separated
+
+
+def _with_blank_lines(texts: List[str], separated: List[bool]) -> str:
+    out: List[str] = []
+    for text, blank_before in zip(texts, separated):
+        if blank_before and out and out[-1].strip():
+            out.append("")
+        out.append(text)
+    return "\n".join(out)
+
+
+def mark_separated_lines(text: str, chars: List[Char], y_tolerance: float = Y_TOLERANCE) -> str:
+    """
+    `text` (extract_text() of the page with these glyphs) with a blank line
+    before every separated line. Relies on extract_text() finding the same
+    lines as group_lines, which it does with the same tolerance; when the
+    line counts differ the text is returned unchanged.
+    """
+    glyphs = [c for c in chars if not c["text"].isspace()]
+    grouped = group_lines(glyphs, y_tolerance)
+    texts = text.split("\n")
+    if len(texts) != len(grouped):
+        return text
+    return _with_blank_lines(texts, separated_lines(grouped))
+
+
+def layout_text(chars: List[Char], x_tolerance: float = X_TOLERANCE, y_tolerance: float = Y_TOLERANCE) -> str:
+    """
+    Page text with chord lines merged into the lyric line below them by glyph
+    position, and a blank line before every separated line.
+    """
+    grouped = group_lines(chars, y_tolerance)
+    lines = [build_line(line, x_tolerance) for line in grouped]
+    separated = separated_lines(grouped)
+    classifications = [classify_line(line.text) for line in lines]
+    out: List[str] = []
+    out_separated: List[bool] = []
+    i = 0
+    while i < len(lines):
+        line, classification = lines[i], classifications[i]
+        out_separated.append(separated[i])
+        if (classification.is_chord_line and i + 1 < len(lines)
+                and lines[i + 1].text.strip() and not classifications[i + 1].is_chord_line):
+            out.append(merge_by_position(line, classification.chords, lines[i + 1]))
+            i += 2
+        else:
+            out.append(line.text)
+            i += 1
+    return _with_blank_lines(out, out_separated)
+
+
+def extract_layout_text(page) -> str:
+    """layout_text for a pdfplumber page."""
+    return layout_text(page.chars)
@@ -0,0 +1,200 @@
+"""
+--profile support for the scraper, importer and songtools entry points.
+
+Two modes:
+
+- "sample" (the default): a background thread snapshots every thread's stack
+  every --profile-interval seconds and writes them as collapsed stacks
+  (<prefix>.collapsed), the input format of flamegraph.pl, inferno and
+  speedscope. The cost is one stack walk per thread per sample, independent
+  of how many calls the program makes, so it can stay on for a production
+  import. Samples are wall-clock: time blocked on HTTP or a lock shows up
+  too. Pool threads idling for work are left out.
+- "cprofile": deterministic cProfile of the main thread, saved as
+  <prefix>.pstats. Exact call counts, but a much higher overhead.
+
+Each entry point calls add_profile_arguments(parser) and, after parsing,
+start_profiling(args, name); results are written when the process exits and
+a short report is printed, including the share of time spent in the usual
+hot spots (HOT_FRAMES). Code running in worker processes is not seen, so
+profile extraction with --workers 1.
+
+    python pdf_scraper/scrape_pdf_full.py --workers 1 --profile
+    flamegraph.pl profile_scrape_pdf_full.collapsed > flame.svg
+"""
+
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import re
+import sys
+import sysconfig
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+STDLIB = os.path.normpath(sysconfig.get_paths()["stdlib"])
+MODES = ("sample", "cprofile")
+DEFAULT_INTERVAL = 0.01  # seconds between samples
+TOP_FUNCTIONS = 15
+# Frame-label prefixes reported separately: converter, chord-line detection, chord/lyric merge,
+# PDF extraction, HTTP
+HOT_FRAMES = (
+    "songtools.chordpro:to_chordpro_format",
+    "songtools.chords:classify_line",
+    "songtools.merge:merge_at_columns",
+    "pdfplumber",
+    "requests.sessions:request",
+)
+# A pool thread whose stack is only these modules under its _worker loop is waiting for work
+IDLE_MODULES = ("threading", "queue")
+
+
+def frame_label(filename: str, name: str) -> str:
+    """module:function, with the module dotted from site-packages, the standard library or the repo root."""
+    path = os.path.normpath(filename)
+    if "site-packages" in path:
+        module = path.split("site-packages", 1)[1].lstrip(os.sep)
+    elif path.startswith(STDLIB + os.sep):
+        module = os.path.relpath(path, STDLIB)
+    elif path.startswith(ROOT + os.sep):
+        module = os.path.relpath(path, ROOT)
+    else:
+        module = os.path.basename(path)
+    module = re.sub(r"\.py$", "", module).replace(os.sep, ".").replace("__init__", "").rstrip(".")
+    return f"{module}:{name}"
+
+
+class SamplingProfiler:
+    """Collects collapsed stacks of every thread from a background thread."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.stacks: Counter = Counter()  # (thread label, code objects root first) -> samples
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                codes = []
+                while frame is not None:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                if self._is_idle(codes):
+                    continue
+                # Numbered threads share one label ("ThreadPoolExecutor-0_3" -> "ThreadPoolExecutor"),
+                # so the stacks of a pool merge
+                thread = re.sub(r"[-_]\d+", "", names.get(ident, "thread"))
+                codes.reverse()
+                self.stacks[(thread, tuple(codes))] += 1
+            self.samples += 1
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = frame_label(code.co_filename, code.co_name)
+        return label
+
+    def _is_idle(self, codes: List) -> bool:
+        for code in codes:  # leaf first
+            label = self._label(code)
+            if label.startswith("concurrent.futures.thread:_worker"):
+                return True
+            if label.split(":", 1)[0] not in IDLE_MODULES:
+                return False
+        return False
+
+    def collapsed(self) -> List[Tuple[str, int]]:
+        return [(";".join([thread] + [self._label(code) for code in codes]), count)
+                for (thread, codes), count in self.stacks.most_common()]
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.collapsed():
+                f.write(f"{stack} {count}\n")
+
+    def report(self, top: int = TOP_FUNCTIONS) -> str:
+        total = sum(self.stacks.values())
+        if not total:
+            return "No samples collected"
+        inclusive: Counter = Counter()
+        own: Counter = Counter()
+        hot: Counter = Counter()
+        for stack, count in self.collapsed():
+            frames = stack.split(";")[1:]
+            for label in set(frames):
+                inclusive[label] += count
+            own[frames[-1]] += count
+            for prefix in HOT_FRAMES:
+                if any(label.startswith(prefix) for label in frames):
+                    hot[prefix] += count
+        lines = [f"{total} thread samples over {self.samples} ticks of {self.interval * 1000:g} ms",
+                 f"{'incl %':>7} {'self %':>7}  function"]
+        for label, count in inclusive.most_common(top):
+            lines.append(f"{count / total:7.1%} {own[label] / total:7.1%}  {label}")
+        lines.append("Hot spots (inclusive):")
+        for prefix in HOT_FRAMES:
+            lines.append(f"{hot[prefix] / total:7.1%}  {prefix}")
+        return "\n".join(lines)
+
+
+def add_profile_arguments(parser) -> None:
+    parser.add_argument("--profile", nargs="?", const="sample", choices=MODES,
+                        help="Profile the run: 'sample' (default, low overhead, collapsed stacks "
+                             "for flame graphs) or 'cprofile' (main thread, .pstats)")
+    parser.add_argument("--profile-output", metavar="PREFIX",
+                        help="Profile file prefix (default profile_<entry point>)")
+    parser.add_argument("--profile-interval", type=float, default=DEFAULT_INTERVAL,
+                        help=f"Seconds between stack samples in sample mode (default {DEFAULT_INTERVAL})")
+
+
+def start_profiling(args, name: str):
+    """Start the profiler chosen by --profile, if any; results are written at exit."""
+    mode = getattr(args, "profile", None)
+    if not mode:
+        return None
+    prefix = getattr(args, "profile_output", None) or f"profile_{name}"
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        atexit.register(_finish_cprofile, profiler, prefix + ".pstats")
+    else:
+        profiler = SamplingProfiler(max(0.001, getattr(args, "profile_interval", DEFAULT_INTERVAL)))
+        profiler.start()
+        atexit.register(_finish_sampling, profiler, prefix + ".collapsed")
+    return profiler
+
+
+def _finish_sampling(profiler: SamplingProfiler, path: str) -> None:
+    profiler.stop()
+    profiler.write_collapsed(path)
+    print(f"\nProfile: {profiler.report()}")
+    print(f"Collapsed stacks written to {path} (flamegraph.pl, inferno or speedscope)")
+
+
+def _finish_cprofile(profiler: cProfile.Profile, path: str) -> None:
+    profiler.disable()
+    profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    print(f"\nProfile:{out.getvalue()}")
+    print(f"cProfile stats written to {path} (python -m pstats, snakeviz)")
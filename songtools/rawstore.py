@@ -0,0 +1,150 @@
+"""
+Compressed, content-addressed store for the raw text behind each song.
+
+Song records keep only a "raw_ref" (the sha256 of the raw text); the text
+itself lives in a store directory:
+
+    raw.pack          compressed blobs, appended one after another
+    raw_index.sqlite  raw_ref -> (offset, length, codec, raw size)
+
+Blobs are zstd-compressed when the optional `zstandard` package is installed
+and zlib-compressed otherwise; the codec is recorded per blob, so a store can
+hold both. Identical texts are stored once. Reads go through a read-only
+mmap of the pack file, so looking up one record decompresses only that blob.
+"""
+
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PACK_FILE = "raw.pack"
+INDEX_FILE = "raw_index.sqlite"
+DEFAULT_CODEC = "zstd" if zstandard else "zlib"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    raw_ref  TEXT PRIMARY KEY,
+    offset   INTEGER NOT NULL,
+    length   INTEGER NOT NULL,
+    codec    TEXT NOT NULL,
+    raw_size INTEGER NOT NULL
+)
+"""
+
+
+def raw_ref(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def decompress(blob: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This raw store has zstd blobs; install the zstandard package to read them")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+class RawStore:
+    """Append-only blob store keyed by raw_ref, safe to share between threads."""
+
+    def __init__(self, directory: str, codec: str = DEFAULT_CODEC):
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("zstd codec needs the zstandard package")
+        self.directory = directory
+        self.codec = codec
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, INDEX_FILE), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._pack_path = os.path.join(directory, PACK_FILE)
+        self._pack = open(self._pack_path, "ab")
+        self._map: Optional[mmap.mmap] = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, ref: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM blobs WHERE raw_ref = ?", (ref,)).fetchone() is not None
+
+    def put(self, text: str) -> str:
+        """Store `text` unless it is already there; returns its raw_ref."""
+        ref = raw_ref(text)
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM blobs WHERE raw_ref = ?", (ref,)).fetchone():
+                return ref
+            data = text.encode("utf-8")
+            blob = compress(data, self.codec)
+            offset = self._pack.seek(0, os.SEEK_END)
+            # Blob first, index row second: a crash in between only leaves unreferenced bytes
+            self._pack.write(blob)
+            self._pack.flush()
+            self._conn.execute(
+                "INSERT INTO blobs (raw_ref, offset, length, codec, raw_size) VALUES (?, ?, ?, ?, ?)",
+                (ref, offset, len(blob), self.codec, len(data)),
+            )
+            self._conn.commit()
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        """The raw text for `ref`, or None when it is not in the store."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT offset, length, codec FROM blobs WHERE raw_ref = ?", (ref,)
+            ).fetchone()
+            if not row:
+                return None
+            offset, length, codec = row
+            if self._map is None or offset + length > len(self._map):
+                self._remap()
+            blob = self._map[offset:offset + length]
+        return decompress(blob, codec).decode("utf-8")
+
+    def _remap(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        with open(self._pack_path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def externalize(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Move a record's "raw_text" into the store, leaving its "raw_ref"."""
+        if record.get("raw_text") is None:
+            return record
+        record = dict(record)
+        record["raw_ref"] = self.put(record.pop("raw_text"))
+        return record
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            blobs, raw_size, stored = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(length), 0) FROM blobs"
+            ).fetchone()
+        return {"blobs": blobs, "raw_bytes": raw_size, "stored_bytes": stored}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._pack.close()
+            self._conn.close()
+
+    def __enter__(self) -> "RawStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,163 @@
+"""
+Regenerate the chordpro field of a scraped song file from its raw text.
+
+The scrapers keep the converter input of every song, either inline as
+"raw_text" or as a "raw_ref" into the compressed raw store next to the song
+file (songtools.rawstore). After a
+change to songtools.chordpro, this command re-runs to_chordpro_format over
+the whole corpus in a process pool, without re-crawling laCuerda or
+re-reading the PDF, writes a new song file and reports what changed:
+
+    python -m songtools.reconvert lacuerda_scraper/lacuerda_songs.json --diff changes.diff
+
+Records are streamed in and out, and sent to the pool in chunks, so memory
+stays flat on large files and output order matches the input. The output has
+the input's format: JSON Lines for a .jsonl input, a JSON array otherwise.
+"""
+
+import argparse
+import difflib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from songtools import chordpro
+from songtools.jsonl import iter_records, open_writer
+from songtools.profiling import add_profile_arguments, start_profiling
+from songtools.rawstore import RawStore
+
+CHUNK_SIZE = 64  # records per pool task
+WORKERS = os.cpu_count() or 1
+CHANGED_SHOWN = 20  # changed titles listed in the summary
+RAW_STORE_DIR = "raw_store"  # default: next to the input file
+
+# Each pool process opens the raw store once and reads blobs through its mmap
+_worker_stores: Dict[str, RawStore] = {}
+
+
+def profile_for(record: Dict[str, Any]) -> str:
+    """laCuerda records carry their page URL; everything else came from the PDF."""
+    return chordpro.LACUERDA if record.get("source_url") else chordpro.PDF
+
+
+def convert_chunk(chunk: List[Tuple[Optional[str], Optional[str], str]],
+                  store_dir: Optional[str]) -> List[Optional[str]]:
+    """Pool worker: (raw_text, raw_ref, profile) to ChordPro, None where no raw text is available."""
+    store = None
+    if store_dir and os.path.isdir(store_dir):
+        store = _worker_stores.get(store_dir)
+        if store is None:
+            store = _worker_stores[store_dir] = RawStore(store_dir)
+    results = []
+    for raw, ref, profile in chunk:
+        if raw is None and ref and store:
+            raw = store.get(ref)
+        results.append(chordpro.to_chordpro_format(raw, profile=profile) if raw is not None else None)
+    return results
+
+
+def chunked(records: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def reconvert(input_path: str, output_path: str, workers: int = WORKERS, chunk_size: int = CHUNK_SIZE,
+              diff_path: Optional[str] = None, store_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Write `output_path` with regenerated chordpro fields; returns the change summary."""
+    summary = {"records": 0, "changed": 0, "unchanged": 0, "no_raw_text": 0,
+               "lines_added": 0, "lines_removed": 0, "changed_titles": []}
+    diff_file = open(diff_path, "w", encoding="utf-8") if diff_path else None
+    try:
+        with open_writer(output_path) as writer, ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = chunked(iter(iter_records(input_path)), chunk_size)
+            # Chunks are submitted lazily, at most 2 x workers ahead; results are written in input order
+            # Only raw_refs cross the process boundary for externalized records
+            pending = ((chunk, pool.submit(convert_chunk,
+                                           [(r.get("raw_text"), r.get("raw_ref"), profile_for(r)) for r in chunk],
+                                           store_dir))
+                       for chunk in chunks)
+            window = []
+            for item in pending:
+                window.append(item)
+                if len(window) < 2 * workers:
+                    continue
+                _write_chunk(*window.pop(0), writer, summary, diff_file)
+            for item in window:
+                _write_chunk(*item, writer, summary, diff_file)
+    finally:
+        if diff_file:
+            diff_file.close()
+    return summary
+
+
+def _write_chunk(chunk, future, writer, summary, diff_file) -> None:
+    for record, new in zip(chunk, future.result()):
+        summary["records"] += 1
+        if new is None:
+            summary["no_raw_text"] += 1
+        elif new == record.get("chordpro", ""):
+            summary["unchanged"] += 1
+        else:
+            old_lines = record.get("chordpro", "").splitlines()
+            new_lines = new.splitlines()
+            diff = list(difflib.unified_diff(old_lines, new_lines, "old", "new", lineterm="", n=1))
+            summary["changed"] += 1
+            summary["lines_added"] += sum(1 for l in diff if l.startswith("+") and not l.startswith("+++"))
+            summary["lines_removed"] += sum(1 for l in diff if l.startswith("-") and not l.startswith("---"))
+            summary["changed_titles"].append(record.get("title", ""))
+            if diff_file:
+                diff_file.write(f"=== #{summary['records'] - 1} {record.get('title', '')}\n")
+                diff_file.write("\n".join(diff) + "\n")
+            record = dict(record, chordpro=new)
+        writer.write(record)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate chordpro from raw_text for a whole song file")
+    parser.add_argument("input", help="Scraped song file (JSON array or JSONL)")
+    parser.add_argument("--output", help="New song file (default: <input>.reconverted.json, or .jsonl for a .jsonl input)")
+    parser.add_argument("--in-place", action="store_true", help="Replace the input file when done")
+    parser.add_argument("--workers", type=int, default=WORKERS, help=f"Conversion processes (default {WORKERS})")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help=f"Records per pool task (default {CHUNK_SIZE})")
+    parser.add_argument("--diff", metavar="PATH", help="Write a unified diff of every changed song")
+    parser.add_argument("--raw-store", metavar="DIR",
+                        help=f"Raw store holding the records' raw_ref blobs (default: {RAW_STORE_DIR}/ next to the input)")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args, "reconvert")
+
+    is_jsonl = args.input.endswith(".jsonl")
+    output = args.output or os.path.splitext(args.input)[0] + (".reconverted.jsonl" if is_jsonl else ".reconverted.json")
+    if args.in_place and output.endswith(".jsonl") != is_jsonl:
+        parser.error("--in-place needs an --output in the same format as the input (.jsonl or JSON array)")
+    started = time.perf_counter()
+    store_dir = args.raw_store or os.path.join(os.path.dirname(os.path.abspath(args.input)), RAW_STORE_DIR)
+    summary = reconvert(args.input, output, max(1, args.workers), max(1, args.chunk_size), args.diff, store_dir)
+    elapsed = time.perf_counter() - started
+
+    print(f"Reconverted {summary['records']} records in {elapsed:.1f}s with {args.workers} workers")
+    print(f"  changed:   {summary['changed']} (+{summary['lines_added']} / -{summary['lines_removed']} lines)")
+    print(f"  unchanged: {summary['unchanged']}")
+    if summary["no_raw_text"]:
+        print(f"  no raw text (kept as is; re-scrape once to capture it): {summary['no_raw_text']}")
+    for title in summary["changed_titles"][:CHANGED_SHOWN]:
+        print(f"    ~ {title}")
+    if summary["changed"] > CHANGED_SHOWN:
+        print(f"    ... and {summary['changed'] - CHANGED_SHOWN} more")
+    if args.diff:
+        print(f"Diff written to {args.diff}")
+    if args.in_place:
+        os.replace(output, args.input)
+        output = args.input
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from songtools.bulkimport import AdaptiveThrottle, request_not_sent, send_with_backoff
+
+
+class FakeSession:
+    """Plays back one outcome per request: a status code or an exception to raise."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        resp = requests.Response()
+        resp.status_code = outcome
+        resp._content = b"{}"
+        resp.request = requests.Request(method, url).prepare()
+        return resp
+
+
+def refused():
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.ConnectionError(MaxRetryError(None, "/songs", reason=reason))
+
+
+def reset():
+    return requests.ConnectionError(ProtocolError("Connection aborted.", ConnectionResetError()))
+
+
+def send(session, method="POST"):
+    return send_with_backoff(session, method, "http://backend/songs", AdaptiveThrottle(4, base_delay=0))
+
+
+@pytest.mark.parametrize("status", [500, 502, 503, 504])
+def test_post_is_not_resent_after_a_5xx(status):
+    session = FakeSession(status, 201)
+    assert send(session).status_code == status
+    assert session.calls == 1
+
+
+def test_post_is_resent_after_a_429():
+    session = FakeSession(429, 429, 201)
+    assert send(session).status_code == 201
+    assert session.calls == 3
+
+
+@pytest.mark.parametrize("error", [requests.ReadTimeout(), reset()])
+def test_post_is_not_resent_when_it_may_have_arrived(error):
+    session = FakeSession(error, 201)
+    with pytest.raises(type(error)):
+        send(session)
+    assert session.calls == 1
+    assert not request_not_sent(error)
+
+
+@pytest.mark.parametrize("error", [requests.ConnectTimeout(), refused()])
+def test_post_is_resent_when_it_never_left(error):
+    session = FakeSession(error, 201)
+    assert send(session).status_code == 201
+    assert session.calls == 2
+    assert request_not_sent(error)
+
+
+def test_get_is_resent_after_a_5xx_or_timeout():
+    session = FakeSession(503, requests.ReadTimeout(), 200)
+    assert send(session, "GET").status_code == 200
+    assert session.calls == 3
+
+
+def test_throttle_backs_off_once_per_window():
+    throttle = AdaptiveThrottle(8, base_delay=0)
+    epochs = [throttle.acquire() for _ in range(8)]
+    for epoch in epochs:
+        throttle.release(throttled=True, epoch=epoch)
+    assert throttle.limit == 4
+    assert throttle.throttled == 8
+    # A request sent after the backoff starts a new window
+    throttle.release(throttled=True, epoch=throttle.acquire())
+    assert throttle.limit == 2
@@ -0,0 +1,55 @@
+import pytest
+
+from songtools.chordpro import extract_key_from_chordpro
+from songtools.chords import classify_line
+
+
+@pytest.mark.parametrize("line", [
+    "A mi Dios",
+    "E la luz",
+    "A la Virgen",
+    "A ti Señor",
+    "la vida es bella",
+    "Mi alma canta",
+])
+def test_lyric_lines(line):
+    result = classify_line(line)
+    assert not result.is_chord_line
+    assert result.chords == []
+
+
+@pytest.mark.parametrize("line, chords", [
+    ("A", ["A"]),
+    ("INTRO: E", ["E"]),
+    ("A   E", ["A", "E"]),
+    ("A  D  E", ["A", "D", "E"]),
+    ("A               E         D-Bm        E", ["A", "E", "E"]),
+    ("E   A   D", ["E", "A", "D"]),
+    ("A  mi", ["A", "mi"]),
+    ("LA   MI   RE", ["LA", "MI", "RE"]),
+    ("(DO)  SOL,  LAm7/DO", ["DO", "SOL", "LAm7/DO"]),
+])
+def test_chord_lines(line, chords):
+    result = classify_line(line)
+    assert result.is_chord_line
+    assert [chord for _, chord in result.chords] == chords
+    assert all(line[pos:pos + len(chord)] == chord for pos, chord in result.chords)
+
+
+def test_bracketed_a_is_still_a_key():
+    assert extract_key_from_chordpro("{start_of_verse}\n[A]Hola [E]mundo") == "A"
+
+
+@pytest.mark.parametrize("chordpro, key", [
+    ("[LAm7/DO]Te alabo", "Am7"),
+    ("[SOL]Canta [RE]alegre", "G"),
+    ("[Dom]Señor", "Cm"),
+    ("[SIb]Gloria", "Bb"),
+    ("[FA♯m]Luz", "F#m"),
+    ("[la]vida [MI]mía", "E"),  # a bare lower-case root is a word, not the key
+    ("[F#m/C#]Holy", "F#m"),
+    ("[Dm]Kyrie", "Dm"),
+    ("Sin acordes", ""),
+])
+def test_original_key_is_sent_in_english_notation(chordpro, key):
+    assert extract_key_from_chordpro(chordpro) == key
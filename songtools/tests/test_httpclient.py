@@ -0,0 +1,74 @@
+import json
+
+import pytest
+import requests
+
+from songtools.httpclient import HttpClient, ResponseCache
+
+URL = "https://acordes.lacuerda.net/mus_catolica/pescador.shtml"
+
+
+class FakeSession:
+    """Answers every GET with 200 and a numbered body, recording the headers sent."""
+
+    def __init__(self):
+        self.sent = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.sent.append(dict(headers or {}))
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.url = url
+        resp.encoding = "utf-8"
+        resp._content = f"page {len(self.sent)}".encode()
+        return resp
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / "http_cache"))
+
+
+def age_entry(cache, url, seconds):
+    meta_path = cache._paths(url)[1]
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    meta["fetched_at"] -= seconds
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def test_fresh_copies_are_served_and_old_ones_fetched_again(cache):
+    session = FakeSession()
+    client = HttpClient(session, cache=cache, max_age=3600)
+    assert client.get(URL).text == "page 1"
+    assert client.get(URL).text == "page 1"
+    age_entry(cache, URL, 7200)
+    assert client.get(URL).text == "page 2"
+    assert len(session.sent) == 2
+
+
+def test_max_age_zero_always_fetches(cache):
+    session = FakeSession()
+    client = HttpClient(session, cache=cache)
+    client.get(URL)
+    assert client.get(URL, max_age=0).text == "page 2"
+    assert client.get(URL).text == "page 2"  # no expiry by default
+
+
+@pytest.mark.parametrize("header", ["If-None-Match", "If-Modified-Since"])
+def test_conditional_gets_bypass_the_cache(cache, header):
+    session = FakeSession()
+    client = HttpClient(session, cache=cache)
+    client.get(URL)
+    assert client.get(URL, headers={header: '"v1"'}).text == "page 2"
+    assert session.sent[-1] == {header: '"v1"'}
+
+
+def test_offline_serves_any_cached_copy(cache):
+    HttpClient(FakeSession(), cache=cache).get(URL)
+    age_entry(cache, URL, 10 ** 6)
+    offline = HttpClient(FakeSession(), cache=cache, offline=True, max_age=1)
+    assert offline.get(URL, max_age=0).text == "page 1"
+    with pytest.raises(requests.ConnectionError):
+        offline.get(URL + "?other")
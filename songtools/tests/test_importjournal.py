@@ -0,0 +1,81 @@
+import pytest
+import requests
+
+from songtools.bulkimport import AdaptiveThrottle, find_song
+from songtools.importjournal import EXISTS, FAILED, IMPORTED, SENT, ImportJournal
+from songtools.mockbackend import MockConfig, start_in_thread
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = ImportJournal(str(tmp_path / "journal.sqlite"), "http://backend/api/songs")
+    yield journal
+    journal.close()
+
+
+@pytest.fixture
+def backend():
+    server, api_url = start_in_thread(MockConfig())
+    session = requests.Session()
+    session.headers["Authorization"] = "Bearer test"
+    yield server, api_url, session
+    session.close()
+    server.shutdown()
+
+
+def entry_after(journal, status, http_status=None):
+    journal.begin("key", "Pescador de hombres")
+    if status != SENT:
+        journal.finish("key", status, http_status=http_status)
+    return journal.get("key")
+
+
+@pytest.mark.parametrize("status, http_status, expected", [
+    (SENT, None, True),          # cut off mid-request, or answered 5xx / timed out
+    (FAILED, None, True),        # network error after the request may have left
+    (FAILED, 503, True),
+    (FAILED, 400, False),        # rejected: safe to send again
+    (IMPORTED, 201, False),
+    (EXISTS, 409, False),
+])
+def test_needs_check_only_when_the_song_may_exist(journal, status, http_status, expected):
+    assert journal.needs_check(entry_after(journal, status, http_status)) is expected
+
+
+def test_needs_check_without_an_entry(journal):
+    assert not journal.needs_check(journal.get("missing"))
+
+
+def post(session, api_url, title, artist, content="{title: x}"):
+    resp = session.post(f"{api_url}/songs", json={"title": title, "artist": artist, "content": content})
+    assert resp.status_code == 201
+    return resp.json()["songId"]
+
+
+def test_find_song_matches_title_and_artist_exactly(backend):
+    server, api_url, session = backend
+    song_id = post(session, api_url, "Pescador de Hombres", "Cesáreo Gabaráin")
+    post(session, api_url, "Pescador de hombres (versión 2)", "Cesáreo Gabaráin")
+    post(session, api_url, "Pescador de hombres", "Otro autor")
+    throttle = AdaptiveThrottle(1, base_delay=0)
+    assert find_song(session, api_url, " pescador de hombres", "CESÁREO GABARÁIN", throttle) == song_id
+    assert find_song(session, api_url, "Pescador", "Cesáreo Gabaráin", throttle) is None
+
+
+def test_find_song_pages_through_results(backend, monkeypatch):
+    server, api_url, session = backend
+    monkeypatch.setattr("songtools.bulkimport.SEARCH_PAGE_SIZE", 2)
+    for i in range(5):
+        post(session, api_url, f"Aleluya {i}", "Anónimo")
+    song_id = post(session, api_url, "Aleluya", "Anónimo")
+    assert find_song(session, api_url, "Aleluya", "Anónimo", AdaptiveThrottle(1, base_delay=0)) == song_id
+    assert server.state.counts["searches"] == 3
+
+
+def test_find_song_tells_songs_with_the_same_title_apart_by_content(backend):
+    server, api_url, session = backend
+    post(session, api_url, "DO SOL", "Cancionero Jatari", "[C]Primera")
+    second = post(session, api_url, "DO SOL", "Cancionero Jatari", "[G]Segunda\r\n")
+    throttle = AdaptiveThrottle(1, base_delay=0)
+    assert find_song(session, api_url, "DO SOL", "Cancionero Jatari", throttle, content="[G]Segunda\n") == second
+    assert find_song(session, api_url, "DO SOL", "Cancionero Jatari", throttle, content="[D]Tercera") is None
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from songtools.jsonl import JsonArrayWriter, iter_json_array
+
+CHUNK_SIZES = [1, 2, 3, 5, 7, 64, 1 << 16]
+
+DOCUMENTS = [
+    "[1.5]",
+    "[1.5, -2e10, 3E-2, 0, 10]",
+    " [ true ,false,null , 12345678901234567890 ] ",
+    '[{"title": "Ave María", "n": 1.25}, "[1, 2]", [], {}, [1.5, [2.75]]]',
+    '["a\\"b", "\\u00e1\\n", -0.5]',
+    "[]",
+    "[\n  7\n]",
+]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("text", DOCUMENTS)
+def test_items_match_json_load(tmp_path, text, chunk_size):
+    path = tmp_path / "songs.json"
+    path.write_text(text, encoding="utf-8")
+    assert list(iter_json_array(str(path), chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_writer_output_reads_back(tmp_path, chunk_size):
+    records = [{"title": f"Canción {i}", "page": i * 1.5, "tags": ["Entrada"] * (i % 3)} for i in range(20)]
+    path = tmp_path / "songs.json"
+    with JsonArrayWriter(str(path)) as writer:
+        for record in records:
+            writer.write(record)
+    assert list(iter_json_array(str(path), chunk_size)) == json.loads(path.read_text(encoding="utf-8")) == records
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 1 << 16])
+@pytest.mark.parametrize("text", ["[1.5", "[1.5,", "[1.x]", "[tru]", '[{"a": 1]'])
+def test_invalid_arrays_raise(tmp_path, text, chunk_size):
+    path = tmp_path / "songs.json"
+    path.write_text(text, encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(path), chunk_size))
+
+
+def test_writer_keeps_the_old_file_when_interrupted(tmp_path):
+    path = tmp_path / "songs.json"
+    path.write_text('[{"title": "old"}]', encoding="utf-8")
+    with pytest.raises(RuntimeError):
+        with JsonArrayWriter(str(path)) as writer:
+            writer.write({"title": "new"})
+            raise RuntimeError("extraction failed")
+    assert json.loads(path.read_text(encoding="utf-8")) == [{"title": "old"}]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["songs.json"]
@@ -0,0 +1,83 @@
+"""
+Parity of the lxml and bs4 backends on laCuerda song pages.
+
+Pages are rebuilt from every song in lacuerda_songs.json the way the
+benchmark does, and the records parse_song_html makes from them must be equal
+field by field whichever backend extracted the HTML. The saved index page
+must give the same links from both backends.
+"""
+
+import json
+import os
+
+import pytest
+
+from songtools import lacuerda_html
+from songtools.benchmark import INDEX_HTML, LACUERDA_SONGS, ROOT, Fixtures, chordpro_to_two_line, load_module
+
+pytestmark = pytest.mark.skipif(not lacuerda_html.HAVE_LXML, reason="lxml is not installed")
+
+TAGS = ("Alabanza", "Comunión", "Entrada", "María")
+
+
+@pytest.fixture(scope="module")
+def scraper():
+    module = load_module("test_scrape_lacuerda", os.path.join(ROOT, "lacuerda_scraper", "scrape_lacuerda.py"))
+    module.quiet = True
+    return module
+
+
+@pytest.fixture(scope="module")
+def pages():
+    with open(LACUERDA_SONGS, "r", encoding="utf-8") as f:
+        songs = json.load(f)
+    pages = []
+    for i, song in enumerate(songs):
+        # The checked-in songs have no tags; give some of them one or two so the /genero/ links are compared too
+        song = dict(song, tags=list(TAGS[i % len(TAGS):i % len(TAGS) + i % 3]))
+        pages.append((song["source_url"], Fixtures._song_page(song, chordpro_to_two_line(song["chordpro"]))))
+    return pages
+
+
+def parse(scraper, html, url, backend):
+    scraper.html_backend = backend
+    return scraper.parse_song_html(html, url)
+
+
+def test_records_match_on_every_song(scraper, pages):
+    mismatches = []
+    for url, html in pages:
+        got = parse(scraper, html, url, "lxml")
+        expected = parse(scraper, html, url, "bs4")
+        if got is None or expected is None:
+            if got != expected:
+                mismatches.append(f"{url}: only one backend returned a record")
+            continue
+        assert set(got) == set(expected)
+        mismatches.extend(f"{url}: '{field}' differs" for field in expected if got[field] != expected[field])
+    assert not mismatches, "\n".join(mismatches[:20])
+
+
+def test_tags_are_extracted(scraper, pages):
+    url, html = next((url, html) for url, html in pages if "/genero/" in html)
+    assert parse(scraper, html, url, "lxml")["tags"] == parse(scraper, html, url, "bs4")["tags"] != []
+
+
+@pytest.mark.parametrize("newline", ["\r\n", "\r"])
+def test_pre_line_breaks_are_normalized(scraper, pages, newline):
+    url, html = pages[0]
+    crlf_html = html.replace("\n", newline)
+    lxml_record = parse(scraper, crlf_html, url, "lxml")
+    bs4_record = parse(scraper, crlf_html, url, "bs4")
+    assert lxml_record == bs4_record
+    assert "\r" not in bs4_record["raw_text"]
+    assert bs4_record == parse(scraper, html, url, "bs4")
+
+
+def test_saved_index_links_match():
+    with open(INDEX_HTML, "r", encoding="utf-8") as f:
+        html = f.read()
+    links = lacuerda_html.extract_index_links(html, "lxml")
+    assert links  # the saved page has the song list
+    assert links == lacuerda_html.extract_index_links(html, "bs4")
+    assert lacuerda_html.check_parity(INDEX_HTML, [], "lxml") == []
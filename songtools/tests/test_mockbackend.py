@@ -0,0 +1,33 @@
+import requests
+
+from songtools.mockbackend import MockConfig, start_in_thread
+
+
+def post_song(api_url, title, artist="Anónimo", content="{title: x}"):
+    return requests.post(f"{api_url}/songs", headers={"Authorization": "Bearer test"},
+                         json={"title": title, "artist": artist, "content": content}, timeout=5)
+
+
+def test_repeated_songs_are_created_like_the_real_backend():
+    server, api_url = start_in_thread(MockConfig())
+    try:
+        first = post_song(api_url, "Alma misionera")
+        second = post_song(api_url, " alma MISIONERA ")
+        assert first.status_code == second.status_code == 201
+        assert first.json()["songId"] != second.json()["songId"]
+        assert len(server.state.songs) == 2
+        assert server.state.counts["duplicates_created"] == 1
+        # Same title and artist, different song
+        assert post_song(api_url, "Alma misionera", content="[C]Otra letra").status_code == 201
+        assert server.state.counts["duplicates_created"] == 1
+    finally:
+        server.shutdown()
+
+
+def test_409_only_when_injected():
+    server, api_url = start_in_thread(MockConfig(conflict_rate=1.0))
+    try:
+        assert post_song(api_url, "Alma misionera").status_code == 409
+        assert not server.state.songs
+    finally:
+        server.shutdown()
@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+from songtools.pagecache import page_content_hash
+
+pdfplumber = pytest.importorskip("pdfplumber")
+
+
+def build_pdf(lines):
+    """
+    A minimal uncompressed PDF, one text line per page. Every page shares one
+    Helvetica font and the page tree's MediaBox, so each appears once in the
+    file and can be edited in place.
+    """
+    pages = []
+    for i, line in enumerate(lines):
+        stream = f"BT /F1 12 Tf 10 800 Td ({line}) Tj ET".encode("latin-1")
+        pages.append(f"<< /Type /Page /Parent 2 0 R /Resources 4 0 R /Contents {6 + 2 * i} 0 R >>".encode())
+        pages.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+    kids = " ".join(f"{5 + 2 * i} 0 R" for i in range(len(lines)))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {len(lines)} /MediaBox [0 0 595.28 841.89] >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Font << /F1 3 0 R >> >>",
+    ] + pages
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+@pytest.fixture(scope="module")
+def pdf_bytes():
+    return build_pdf(["SOL  RE  MI", "Alabar\\351"])
+
+
+def page_hashes(data, memo=None):
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        return [page_content_hash(page, memo) for page in pdf.pages]
+
+
+def edited(data, old, new):
+    # Same length, so the cross-reference offsets stay valid
+    assert len(old) == len(new) and data.count(old) == 1
+    return data.replace(old, new)
+
+
+def test_same_document_same_hashes(pdf_bytes):
+    assert page_hashes(pdf_bytes) == page_hashes(pdf_bytes) == page_hashes(pdf_bytes, memo={})
+
+
+def test_font_change_changes_hash(pdf_bytes):
+    # Byte-identical content streams drawn with another font
+    swapped = edited(pdf_bytes, b"/BaseFont /Helvetica", b"/BaseFont /Symbol   ")
+    before, after = page_hashes(pdf_bytes), page_hashes(swapped)
+    assert all(a != b for a, b in zip(before, after))
+
+
+def test_mediabox_change_changes_hash(pdf_bytes):
+    resized = edited(pdf_bytes, b"/MediaBox [0 0 595.28 841.89]", b"/MediaBox [0 0 595.28 842.00]")
+    assert all(a != b for a, b in zip(page_hashes(pdf_bytes), page_hashes(resized)))
@@ -0,0 +1,79 @@
+"""
+Song splitting of scrape_pdf_full against the checked-in pdf_songs_full.json.
+
+Pages are laid out as the benchmark does (one or two songs per page, with the
+blank line extraction puts before a title-styled line) and split again.
+Some stored titles are lyric or chord lines left by older splitting ("QUE VEA
+QUE ME MIRAS CON PASIÓN,", "DO SOL"); those are expected to stay unsplit.
+"""
+
+import os
+from collections import Counter
+
+import pytest
+
+from songtools import chordpro
+from songtools.benchmark import ROOT, Fixtures, load_module
+from songtools.pdflayout import mark_separated_lines
+
+
+@pytest.fixture(scope="module")
+def scraper():
+    module = load_module("test_scrape_pdf_full", os.path.join(ROOT, "pdf_scraper", "scrape_pdf_full.py"))
+    module.quiet = True
+    return module
+
+
+@pytest.fixture(scope="module")
+def fixtures():
+    return Fixtures()
+
+
+def is_junk_title(title):
+    return title[-1] in ",;.:" or chordpro.has_chord_patterns(title)
+
+
+def test_splits_only_at_titles(scraper, fixtures):
+    titles = [song["title"].upper() for song in fixtures.pdf_songs]
+    songs = list(scraper.identify_song_boundaries(iter(fixtures.pages)))
+    firsts = [song.split("\n", 1)[0].strip() for song in songs]
+    # Every song starts at a title, in order: no split at an upper-case chorus or "PUNTEO:" line
+    it = iter(titles)
+    assert all(first in it for first in firsts), "a song was split away from its title"
+    missed = list((Counter(titles) - Counter(firsts)).elements())
+    assert all(is_junk_title(title) for title in missed), missed
+    assert len(songs) + len(missed) == len(titles)
+
+
+@pytest.mark.parametrize("line", ["PUNTEO:", "SI NO FUERA POR TU GRACIA Y POR TU AMOR"])
+def test_upper_case_lines_inside_a_song_are_not_titles(scraper, line):
+    lines = ["RE           LA           SOL", line, "y por tu amor yo viviré", "siempre junto a ti, Señor"]
+    assert not scraper.is_title_line(lines, 1)
+    lines.insert(1, "")
+    assert scraper.is_title_line(lines, 2) == (not line.endswith(":"))
+
+
+def char(text, x0, top, size=10.0, fontname="Helvetica"):
+    return {"text": text, "x0": x0, "x1": x0 + size * 0.6, "top": top, "bottom": top + size,
+            "size": size, "fontname": fontname}
+
+
+def page_chars(lines):
+    """Glyphs for (text, top, style) lines."""
+    return [char(c, 10 + i * 6, top, **style) for text, top, style in lines for i, c in enumerate(text)]
+
+
+def test_separated_lines_get_a_blank_line():
+    chars = page_chars([
+        ("la vida es bella", 10, {}),
+        ("GRANDE", 22, {"size": 14.0}),
+        ("NEGRITA", 34, {"fontname": "Helvetica-Bold"}),
+        ("CORO EN MAYUSCULAS", 46, {}),
+        ("tras un espacio", 70, {}),
+        ("y sigue", 82, {}),
+    ])
+    text = "\n".join(["la vida es bella", "GRANDE", "NEGRITA", "CORO EN MAYUSCULAS", "tras un espacio", "y sigue"])
+    assert mark_separated_lines(text, chars) == (
+        "la vida es bella\n\nGRANDE\n\nNEGRITA\nCORO EN MAYUSCULAS\n\ntras un espacio\ny sigue")
+    # Lines that extract_text() clustered differently are left alone
+    assert mark_separated_lines("la vida es bella", chars) == "la vida es bella"
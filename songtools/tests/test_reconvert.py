@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from songtools.benchmark import LACUERDA_SONGS, ROOT, chordpro_to_two_line
+from songtools.jsonl import iter_records
+
+
+@pytest.fixture
+def records():
+    with open(LACUERDA_SONGS, "r", encoding="utf-8") as f:
+        songs = json.load(f)[:5]
+    # Stale chordpro, so every record changes when reconverted
+    return [dict(song, raw_text=chordpro_to_two_line(song["chordpro"]), chordpro="") for song in songs]
+
+
+def run(*args):
+    return subprocess.run([sys.executable, "-m", "songtools.reconvert", *args, "--workers", "1"],
+                          cwd=ROOT, capture_output=True, text=True)
+
+
+@pytest.mark.parametrize("name", ["songs.jsonl", "songs.json"])
+def test_in_place_keeps_the_input_format(tmp_path, records, name):
+    path = tmp_path / name
+    if name.endswith(".jsonl"):
+        path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+    else:
+        path.write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+    result = run(str(path), "--in-place")
+    assert result.returncode == 0, result.stderr
+    converted = list(iter_records(str(path)))
+    assert [r["title"] for r in converted] == [r["title"] for r in records]
+    assert all(r["chordpro"] for r in converted)
+    assert os.listdir(tmp_path) == [name]
+
+
+def test_in_place_rejects_an_output_in_another_format(tmp_path, records):
+    path = tmp_path / "songs.jsonl"
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+    before = path.read_text(encoding="utf-8")
+    result = run(str(path), "--in-place", "--output", str(tmp_path / "songs.json"))
+    assert result.returncode != 0
+    assert path.read_text(encoding="utf-8") == before